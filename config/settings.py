@@ -48,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
+    'core.audit.AuditMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -81,7 +84,7 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 import dj_database_url
-from decouple import config
+from decouple import Csv, config
 
 DATABASES = {
     "default": dj_database_url.config(
@@ -89,7 +92,69 @@ DATABASES = {
     )
 }
 
+# Read replicas, e.g. DATABASE_REPLICA_URLS=postgres://replica1/db,postgres://replica2/db.
+# Safe requests read from them; a user who writes reads from the primary for
+# REPLICA_PIN_SECONDS afterwards (core.routers).
+DATABASE_REPLICAS = []
+for index, url in enumerate(config("DATABASE_REPLICA_URLS", default="", cast=Csv())):
+    alias = f"replica{index}"
+    DATABASES[alias] = {**dj_database_url.parse(url), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)
+
+
+# Cache
+# Shared between workers in production (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache)
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default=""),
+    }
+}
 
+# Project membership lookups (core.membership)
+MEMBERSHIP_CACHE_SIZE = 10000
+MEMBERSHIP_CACHE_LOCAL_TTL = 5
+MEMBERSHIP_CACHE_TIMEOUT = 300
+
+# Users resolved from JWTs (core.authentication), same two cache tiers.
+AUTH_USER_CACHE_SIZE = 10000
+AUTH_USER_CACHE_LOCAL_TTL = 5
+AUTH_USER_CACHE_TIMEOUT = 300
+
+
+# Request metrics served at /metrics (core.metrics). Slower requests are logged
+# with their queries; an empty value turns the log off.
+METRICS_SLOW_REQUEST_MS = config(
+    "METRICS_SLOW_REQUEST_MS", default="500", cast=lambda value: int(value) if value else None
+)
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+
+# Due-date reminders (manage.py send_reminders, core.reminders): assignees get a
+# digest REMINDER_LEAD_HOURS before a task is due and once it is overdue.
+REMINDER_LEAD_HOURS = config("REMINDER_LEAD_HOURS", default=24, cast=int)
+REMINDER_LOOKBACK_DAYS = config("REMINDER_LOOKBACK_DAYS", default=7, cast=int)
+
+# ModelBackend with the async login's password checks on their own threads.
+AUTHENTICATION_BACKENDS = ["core.backends.ModelBackend"]
+# Threads hashing passwords for the async login (core.backends).
+PASSWORD_HASH_WORKERS = config("PASSWORD_HASH_WORKERS", default=4, cast=int)
+
+# Project change feeds (core.events). LocalEventBackend wakes streams in the
+# same process; with several workers PollingEventBackend re-reads the event
+# table every EVENTS_POLL_INTERVAL seconds instead.
+EVENTS_BACKEND = config("EVENTS_BACKEND", default="core.events.LocalEventBackend")
+EVENTS_POLL_INTERVAL = 2
+EVENTS_HEARTBEAT = 15
+EVENTS_MAX_SECONDS = 300
+EVENTS_COMMIT_WINDOW = 10
+
+# Login OTPs (core.otp_store). CacheOTPStore needs CACHE_BACKEND to be shared
+# between workers; DatabaseOTPStore works anywhere (purge with `purge_otps`).
+OTP_STORE = config("OTP_STORE", default="core.otp_store.DatabaseOTPStore")
+OTP_TTL = 300
+OTP_MAX_ATTEMPTS = 5
 
 
 # Password validation
@@ -144,13 +209,13 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_FILTER_BACKENDS': (
-        'rest_framework.filters.SearchFilter',
+        'core.search.FullTextSearchFilter',
         'rest_framework.filters.OrderingFilter',
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
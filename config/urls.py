@@ -23,6 +23,8 @@ from drf_yasg import openapi
 
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from core.metrics import metrics_view
+
 schema_view = get_schema_view(
    openapi.Info(
       title="Task Manager API",
@@ -40,6 +42,7 @@ urlpatterns = [
     path("", lambda request: redirect("/swagger/", permanent=False)),  # 👈 redirect root → Swagger
     path('admin/', admin.site.urls),
     path('api/', include('core.urls')),
+    path('metrics', metrics_view, name='metrics'),
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
@@ -1,7 +1,22 @@
 from django.contrib import admin
-from .models import User, Project, Task, Comment
+from .models import User, Project, Task, Comment, AuditLog
 
 admin.site.register(User)
 admin.site.register(Project)
 admin.site.register(Task)
 admin.site.register(Comment)
+
+
+@admin.register(AuditLog)
+class AuditLogAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'actor_id', 'project_id', 'model', 'object_id', 'action']
+    list_filter = ['model', 'action']
+    search_fields = ['=project__id', '=actor__id', '=object_id']
+    # The table is large; skip the unfiltered COUNT(*) on every page.
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,114 @@
+"""
+Async counterparts of ``LoginView`` and ``VerifyOTPView`` for ASGI workers.
+
+A login goes through ``django.contrib.auth.aauthenticate``, so every
+configured backend is tried and failures send ``user_login_failed``; the
+project's ``ModelBackend`` (core.backends) hashes on a dedicated thread pool.
+With ``DatabaseOTPStore``, OTP checks use the async ORM. Issuing a code
+does not: the code and its outbox email must commit together, and the async
+ORM can't hold a transaction across awaits, so ``generate_otp`` runs in one
+synchronous transaction on a worker thread. Sending the email is already off
+the request path (core.outbox).
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import events
+from .authentication import CachedJWTAuthentication
+from .membership import is_project_member
+from .models import User
+from .otp_store import OTPError, get_otp_store
+from .utils import generate_otp
+
+
+def _payload(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST.dict()
+
+
+def _missing(data, *fields):
+    return {field: ["This field is required."] for field in fields if data.get(field) in (None, '')}
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    data = _payload(request)
+    if errors := _missing(data, 'username', 'password'):
+        return JsonResponse(errors, status=400)
+    user = await aauthenticate(request, username=data['username'], password=data['password'])
+    if user is None:
+        return JsonResponse({'non_field_errors': ["Invalid username or password."]}, status=400)
+    await sync_to_async(generate_otp)(user)
+    return JsonResponse({'user_id': user.pk, 'message': "OTP sent to your email"})
+
+
+@csrf_exempt
+@require_POST
+async def verify_otp(request):
+    data = _payload(request)
+    if errors := _missing(data, 'user_id', 'code'):
+        return JsonResponse(errors, status=400)
+    try:
+        user_id = int(data['user_id'])
+    except (TypeError, ValueError):
+        return JsonResponse({'user_id': ["A valid integer is required."]}, status=400)
+    try:
+        await get_otp_store().averify(user_id, data['code'])
+        user = await User.objects.aget(pk=user_id)
+    except (OTPError, User.DoesNotExist) as exc:
+        message = str(exc) if isinstance(exc, OTPError) else "Invalid OTP"
+        return JsonResponse({'non_field_errors': [message]}, status=400)
+    # for_user writes an OutstandingToken row when the blacklist app is installed.
+    refresh = await sync_to_async(RefreshToken.for_user)(user)
+    return JsonResponse({'refresh': str(refresh), 'access': str(refresh.access_token)})
+
+
+@require_GET
+async def project_events(request, project_id):
+    """
+    ``text/event-stream`` of task and comment changes in a project the caller
+    belongs to. Resumes after the ``Last-Event-ID`` header (or
+    ``?last_event_id=``) when given, otherwise starts from now. A resumed
+    stream may repeat recent events; clients skip ids they have seen.
+    """
+    try:
+        authenticated = await sync_to_async(CachedJWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as exc:
+        # InvalidToken carries a dict with the per-token messages.
+        detail = exc.detail if isinstance(exc.detail, dict) else {'detail': str(exc.detail)}
+        return JsonResponse(detail, status=401)
+    if authenticated is None:
+        return JsonResponse({'detail': "Authentication credentials were not provided."}, status=401)
+    user = authenticated[0]
+
+    async def still_allowed():
+        return await sync_to_async(is_project_member)(user, project_id)
+
+    if not await still_allowed():
+        return JsonResponse({'detail': "You must be a member of the project."}, status=403)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        after_id = int(last_event_id) if last_event_id else await events.alatest_id(project_id)
+    except ValueError:
+        return JsonResponse({'detail': "Last-Event-ID must be an event id."}, status=400)
+
+    response = StreamingHttpResponse(
+        events.stream(project_id, after_id, still_allowed, resume=bool(last_event_id)), content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,189 @@
+"""
+Field-level audit trail of projects, tasks, comments and memberships.
+
+Signal handlers (core.signals) and the bulk task operations turn each write
+into an ``AuditLog`` entry holding only the fields that changed, diffed
+against the values the instance was loaded with (``LoadedValuesMixin``).
+Entries wait for their transaction to commit, so rolled-back changes leave no
+trace, and are then collected by the current ``batch()``: ``AuditMiddleware``
+wraps each request in one, so a request's whole trail is written by a single
+``bulk_create`` as it finishes. Outside a batch, entries are written as their
+transaction commits.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.timezone import is_aware, now
+
+from .models import AuditLog, Comment, Project, Task, membership
+
+MODELS = {Project: 'project', Task: 'task', Comment: 'comment', membership: 'membership'}
+# Bookkeeping columns that are not anyone's change.
+EXCLUDED = {'version', 'path', 'open_blockers', 'updated_at'}
+BATCH_SIZE = 1000
+
+_batch = ContextVar('audit_batch', default=None)
+_request = ContextVar('audit_request', default=None)
+
+
+def period_of(moment):
+    """``moment``'s partition, its month in UTC as ``YYYYMM``, whatever offset it carries."""
+    if is_aware(moment):
+        moment = moment.astimezone(timezone.utc)
+    return moment.year * 100 + moment.month
+
+
+def _actor_id():
+    # DRF copies the user it authenticated onto the Django request.
+    user = getattr(_request.get(), 'user', None)
+    return user.pk if user is not None and user.is_authenticated else None
+
+
+def _project_id(instance):
+    if isinstance(instance, Project):
+        return instance.pk
+    if isinstance(instance, Comment):
+        if Comment.task.is_cached(instance):
+            return instance.task.project_id
+        return Task.objects.filter(pk=instance.task_id).values_list('project_id', flat=True).first()
+    return instance.project_id
+
+
+def _fields(instance, update_fields=None):
+    return [
+        field for field in instance._meta.concrete_fields
+        if not field.primary_key and field.name not in EXCLUDED
+        and (update_fields is None or field.name in update_fields or field.attname in update_fields)
+    ]
+
+
+def remember(instance):
+    """Load the stored values of an instance that wasn't read from the database, before it is saved."""
+    if instance.pk is None or hasattr(instance, '_loaded_values'):
+        return
+    names = [field.attname for field in _fields(instance)]
+    row = type(instance)._base_manager.using(DEFAULT_DB_ALIAS).filter(pk=instance.pk).values_list(*names).first()
+    instance._loaded_values = dict(zip(names, row)) if row else {}
+
+
+def diff(instance, created=False, update_fields=None):
+    """``{field: [old, new]}`` for the fields a save changed; the instance then counts as loaded with its new values."""
+    # Deferred fields aren't in __dict__ and weren't saved.
+    current = {
+        field: instance.__dict__[field.attname]
+        for field in _fields(instance, update_fields) if field.attname in instance.__dict__
+    }
+    loaded = getattr(instance, '_loaded_values', {})
+    changes = {}
+    for field, value in current.items():
+        if created:
+            if value not in (None, ''):
+                changes[field.name] = [None, value]
+        elif field.attname in loaded and loaded[field.attname] != value:
+            changes[field.name] = [loaded[field.attname], value]
+    instance._loaded_values = {**loaded, **{field.attname: value for field, value in current.items()}}
+    return changes
+
+
+def entry(instance, action, changes, project_id=None):
+    moment = now()
+    return AuditLog(
+        period=period_of(moment),
+        created_at=moment,
+        actor_id=_actor_id(),
+        project_id=project_id if project_id is not None else _project_id(instance),
+        model=MODELS[type(instance)],
+        object_id=instance.pk,
+        action=action,
+        changes=changes,
+    )
+
+
+def saved(instance, created, update_fields=None):
+    """The entry for a save, or None when it changed nothing."""
+    changes = diff(instance, created, update_fields)
+    if not changes:
+        return None
+    return entry(instance, 'created' if created else 'updated', changes)
+
+
+def deleted(instance):
+    changes = {
+        field.name: [instance.__dict__[field.attname], None]
+        for field in _fields(instance) if field.attname in instance.__dict__
+    }
+    return entry(instance, 'deleted', changes)
+
+
+def record(entries):
+    """Queue entries to be written once the current transaction commits."""
+    entries = [entry for entry in entries if entry is not None]
+    if entries:
+        transaction.on_commit(lambda: _collect(entries))
+
+
+def _collect(entries):
+    pending = _batch.get()
+    if pending is None:
+        AuditLog.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+    else:
+        pending.extend(entries)
+
+
+@contextmanager
+def batch():
+    """Hold the entries committed inside the block and write them with one ``bulk_create`` at the end."""
+    pending = []
+    token = _batch.set(pending)
+    try:
+        yield
+    finally:
+        _batch.reset(token)
+        if pending:
+            AuditLog.objects.bulk_create(pending, batch_size=BATCH_SIZE)
+
+
+def purge(before_period, chunk_size=1000):
+    """Delete the periods before ``before_period`` (YYYYMM), in chunks; returns the number of rows."""
+    total = 0
+    while True:
+        ids = list(AuditLog.objects.filter(period__lt=before_period).values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        total += AuditLog.objects.filter(pk__in=ids).delete()[0]
+
+
+class AuditMiddleware:
+    """Names the request's user as the actor of its changes and writes its trail in one batch."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            with batch():
+                return self.get_response(request)
+        finally:
+            _request.reset(token)
+
+    async def __acall__(self, request):
+        pending = []
+        request_token, batch_token = _request.set(request), _batch.set(pending)
+        try:
+            return await self.get_response(request)
+        finally:
+            _batch.reset(batch_token)
+            _request.reset(request_token)
+            if pending:
+                await AuditLog.objects.abulk_create(pending, batch_size=BATCH_SIZE)
@@ -0,0 +1,126 @@
+"""
+JWT authentication that resolves the token's user without a query.
+
+simplejwt's ``JWTAuthentication`` loads the user row on every request. Here
+the row's column values go through a per-process LRU and then the shared
+Django cache, keyed by the user's generation; saving or deleting the user
+bumps the generation, so edits, deactivation and password changes apply on
+the next request (other workers' local copies live at most
+``AUTH_USER_CACHE_LOCAL_TTL`` seconds). Writes made with ``QuerySet.update()``
+skip the signals and must call ``invalidate_user`` themselves. Rows are always
+read from the primary; once the user is known, the rest of a safe request may
+read from a replica (core.routers).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from . import routers
+from .cache import LocalLRUCache, MISSING
+from .models import User
+
+_local = LocalLRUCache(
+    maxsize=getattr(settings, 'AUTH_USER_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_LOCAL_TTL', 5),
+)
+SHARED_TIMEOUT = getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300)
+# What authentication, permission checks and a rendered ``request.user``
+# read; the rest, the password hash above all, stays deferred and is never cached.
+FIELDS = ['id', 'username', 'email', 'phone_number', 'is_active', 'is_staff', 'is_superuser']
+
+
+def _generation_key(user_id):
+    return f'authuser:v:{user_id}'
+
+
+def _generation(user_id):
+    # Seeded from the clock, as in core.membership.
+    return cache.get_or_set(_generation_key(user_id), lambda: time.time_ns(), None)
+
+
+def _load(user_id):
+    row = User.objects.using(DEFAULT_DB_ALIAS).filter(pk=user_id).values_list(*FIELDS, 'password').first()
+    if row is None:
+        return None
+    # Only the digest simplejwt's revocation claim carries is kept, not the hash.
+    *values, password = row
+    return (*values, get_md5_hash_password(password) if api_settings.CHECK_REVOKE_TOKEN else None)
+
+
+def _row(user_id):
+    """The user's ``FIELDS`` values followed by the password digest, or None if there is no such user."""
+    row = _local.get(user_id)
+    if row is not MISSING:
+        return row
+    shared_key = f'authuser:{user_id}:{_generation(user_id)}'
+    row = cache.get(shared_key, MISSING)
+    if row is MISSING:
+        row = _load(user_id)
+        cache.set(shared_key, row, SHARED_TIMEOUT)
+    _local.set(user_id, row)
+    return row
+
+
+def get_cached_user(user_id):
+    """A fresh ``User`` instance for ``user_id`` built from cached values, or None."""
+    row = _row(user_id)
+    if row is None:
+        return None
+    *values, password_digest = row
+    user = User.from_db(router.db_for_read(User), FIELDS, values)
+    user._password_digest = password_digest
+    return user
+
+
+def _invalidate(user_id):
+    _local.delete(user_id)
+    try:
+        cache.incr(_generation_key(user_id))
+    except ValueError:
+        pass
+
+
+def invalidate_user(user_id):
+    """Drop cached values for ``user_id`` now and again once the transaction commits."""
+    _invalidate(user_id)
+    transaction.on_commit(lambda: _invalidate(user_id))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    ``JWTAuthentication`` with the user looked up through ``get_cached_user``.
+    Assumes the default ``USER_ID_FIELD``, the primary key.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            routers.route_reads(result[0].pk)
+        return result
+
+    def get_user(self, validated_token):
+        try:
+            user_id = User._meta.pk.to_python(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, ValidationError) as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user._password_digest:
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
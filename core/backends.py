@@ -0,0 +1,46 @@
+"""
+Authentication backend for the async login (core.async_views).
+
+Django's ``ModelBackend.aauthenticate`` checks the password inline. Here the
+hash check runs on a small dedicated thread pool rather than on the event
+loop or on the one thread ``sync_to_async`` funnels ORM work through. The
+sync path is Django's own.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import backends
+from django.contrib.auth.hashers import check_password, make_password
+
+from .models import User
+
+_hashers = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 4),
+    thread_name_prefix='password-hash',
+)
+
+
+async def run_hasher(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(_hashers, func, *args)
+
+
+class ModelBackend(backends.ModelBackend):
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        An unknown username still costs one hash, so response times don't
+        reveal which accounts exist. Outdated hashes are left for the sync
+        login to upgrade.
+        """
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await User._default_manager.aget_by_natural_key(username)
+        except User.DoesNotExist:
+            await run_hasher(make_password, password)
+            return None
+        if await run_hasher(check_password, password, user.password) and self.user_can_authenticate(user):
+            return user
+        return None
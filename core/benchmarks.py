@@ -0,0 +1,340 @@
+"""
+Endpoint benchmarks run through ``manage.py benchmark``.
+
+Each scenario seeds its own data inside a transaction that the command rolls
+back, so benchmarks can be pointed at a development database safely. Results
+can be checked against the query counts recorded in
+``benchmark_baselines.json`` and, on the machine that recorded them, against
+its p95 latencies too.
+"""
+import asyncio
+import json
+import math
+import random
+import time
+from pathlib import Path
+
+from asgiref.sync import async_to_sync
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import RefreshToken
+from taggit.models import Tag, TaggedItem
+
+from . import tagindex
+from .authentication import CachedJWTAuthentication
+from .models import User, Project, Task
+from .otp_store import get_otp_store
+from .pagination import KeysetPagination
+from .seed import PASSWORD, seed_dataset
+from .serializers import TaskSerializer
+
+SCENARIOS = {}
+BASELINES_PATH = Path(__file__).with_name('benchmark_baselines.json')
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def percentile(timings, fraction):
+    """Nearest-rank percentile of sorted ``timings``."""
+    return timings[max(0, math.ceil(fraction * len(timings)) - 1)]
+
+
+def measure(func, repeat=5, setup=None):
+    """
+    Call ``func`` ``repeat`` times, each after an untimed ``setup()`` if given;
+    return the last call's query count and wall times in ms.
+    """
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        queries = len(ctx.captured_queries)
+    timings.sort()
+    return {
+        'queries': queries,
+        'min_ms': round(timings[0], 2),
+        'median_ms': round(timings[len(timings) // 2], 2),
+        'p50_ms': round(percentile(timings, 0.50), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'max_ms': round(timings[-1], 2),
+    }
+
+
+def throughput(result, count):
+    """Add requests per second, from the median time of a batch of ``count`` requests."""
+    result['per_second'] = round(count / (result['median_ms'] / 1000), 1)
+    return result
+
+
+def load_baselines(path=BASELINES_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(scenario_name, results, path=BASELINES_PATH):
+    baselines = load_baselines(path)
+    baselines[scenario_name] = {
+        label: {'queries': result['queries'], 'p95_ms': result['p95_ms']}
+        for label, result in results.items()
+    }
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def check_baselines(results, baselines, tolerance=None):
+    """
+    Messages for every result over its baseline: any extra query and, unless
+    ``tolerance`` is None, a p95 more than ``tolerance`` (a fraction) slower.
+    Timings only compare on the machine that recorded the baselines.
+    """
+    failures = []
+    for label, baseline in baselines.items():
+        result = results.get(label)
+        if result is None:
+            failures.append(f"{label}: no result")
+            continue
+        if result['queries'] > baseline['queries']:
+            failures.append(f"{label}: {result['queries']} queries, baseline {baseline['queries']}")
+        if tolerance is None:
+            continue
+        limit = round(baseline['p95_ms'] * (1 + tolerance), 2)
+        if result['p95_ms'] > limit:
+            failures.append(f"{label}: p95 {result['p95_ms']}ms, limit {limit}ms")
+    return failures
+
+
+def seed_tasks(n_tasks, n_users=20, n_tags=30, tags_per_task=3):
+    users = User.objects.bulk_create(
+        User(username=f'bench{i}', email=f'bench{i}@example.com', phone_number='')
+        for i in range(n_users)
+    )
+    project = Project.objects.create(name='Benchmark', owner=users[0])
+    project.members.add(*users)
+    tasks = Task.objects.bulk_create(
+        Task(
+            project=project,
+            title=f'Task {i}',
+            assignee=random.choice(users),
+            status=random.choice(Task.STATUS_CHOICES)[0],
+            priority=random.choice(Task.PRIORITY_CHOICES)[0],
+        )
+        for i in range(n_tasks)
+    )
+    tags = Tag.objects.bulk_create(Tag(name=f'tag{i}', slug=f'tag{i}') for i in range(n_tags))
+    content_type = ContentType.objects.get_for_model(Task)
+    TaggedItem.objects.bulk_create(
+        TaggedItem(tag=tag, content_type=content_type, object_id=task.pk)
+        for task in tasks
+        for tag in random.sample(tags, tags_per_task)
+    )
+    tagindex.rebuild([project.pk])
+    return project, users
+
+
+@scenario('task-list')
+def task_list(stdout, tasks=1000, repeat=5, **options):
+    project, users = seed_tasks(tasks)
+    client = APIClient()
+    client.force_authenticate(users[0])
+
+    page_size = min(tasks, KeysetPagination.max_page_size)
+
+    def naive():
+        TaskSerializer(Task.objects.all()[:page_size], many=True).data
+
+    def endpoint():
+        response = client.get(f'/api/tasks/?page_size={page_size}')
+        assert response.status_code == 200, response.status_code
+
+    return {
+        f'Task.objects.all()[:{page_size}] + TaskSerializer': measure(naive, repeat),
+        f'GET /api/tasks/?page_size={page_size}': measure(endpoint, repeat),
+    }
+
+
+@scenario('task-bulk')
+def task_bulk(stdout, tasks=1000, repeat=3, **options):
+    owner = User.objects.create(username='bench-owner', email='bench-owner@example.com', phone_number='')
+    project = Project.objects.create(name='Benchmark', owner=owner)
+    client = APIClient()
+    client.force_authenticate(owner)
+    items = [
+        {'project': project.pk, 'title': f'Task {i}', 'priority': i % 3 + 1, 'tags': ['import', f'batch{i % 10}']}
+        for i in range(tasks)
+    ]
+
+    def per_item():
+        for item in items:
+            response = client.post('/api/tasks/', item, format='json')
+            assert response.status_code == 201, response.status_code
+
+    def bulk():
+        response = client.post('/api/tasks/bulk/', items, format='json')
+        assert response.status_code == 201 and not response.data['errors'], response.data
+
+    return {
+        f'{tasks} x POST /api/tasks/': measure(per_item, repeat),
+        f'POST /api/tasks/bulk/ ({tasks} items)': measure(bulk, repeat),
+    }
+
+
+@scenario('jwt-auth')
+def jwt_auth(stdout, repeat=200, **options):
+    user = User.objects.create(username='bench-auth', email='bench-auth@example.com', phone_number='')
+    project = Project.objects.create(name='Benchmark', owner=user)
+    token = RefreshToken.for_user(user).access_token
+    request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    url = f'/api/projects/{project.pk}/'
+    etag = client.get(url)['ETag']
+
+    def authenticate(backend):
+        def run():
+            assert backend.authenticate(request)[0].pk == user.pk
+        return run
+
+    def not_modified():
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, response.status_code
+
+    return {
+        'JWTAuthentication.authenticate': measure(authenticate(JWTAuthentication()), repeat),
+        'CachedJWTAuthentication.authenticate': measure(authenticate(CachedJWTAuthentication()), repeat),
+        f'GET {url} (If-None-Match, cached auth)': measure(not_modified, repeat),
+    }
+
+
+@scenario('login')
+def login(stdout, concurrency=16, repeat=3, **options):
+    """
+    One worker's login throughput: a WSGI worker serves ``concurrency``
+    logins one after another, an ASGI worker takes them all at once.
+    """
+    user = User.objects.create_user(
+        'bench-login', 'bench-login@example.com', 'bench-password', phone_number='',
+    )
+    payload = {'username': user.username, 'password': 'bench-password'}
+
+    def wsgi():
+        client = Client()
+        for _ in range(concurrency):
+            response = client.post('/api/auth/login/', payload, content_type='application/json')
+            assert response.status_code == 200, response.status_code
+
+    async def many_async_logins():
+        client = AsyncClient()
+        responses = await asyncio.gather(*(
+            client.post('/api/auth/async/login/', payload, content_type='application/json')
+            for _ in range(concurrency)
+        ))
+        assert all(response.status_code == 200 for response in responses)
+
+    def asgi():
+        async_to_sync(many_async_logins)()
+
+    return {
+        f'WSGI {concurrency} x POST /api/auth/login/': throughput(measure(wsgi, repeat), concurrency),
+        f'ASGI {concurrency} x POST /api/auth/async/login/': throughput(measure(asgi, repeat), concurrency),
+    }
+
+
+@scenario('endpoints')
+def endpoints(stdout, tasks=2000, repeat=20, **options):
+    """
+    Every router endpoint plus the auth views, through the test client with
+    a JWT, against a seeded dataset sized by ``tasks``. Logins hash a
+    password each time and are only run a few times.
+    """
+    data = seed_dataset(
+        users=max(10, tasks // 20), projects=max(2, tasks // 200), tasks=tasks, comments=tasks * 2,
+        otps=10, prefix='bench',
+    )
+    project = data['projects'][0]
+    user = project.owner
+    task = Task.objects.filter(project=project).order_by('pk').first()
+    tag = data['tags'][0].name
+    refresh = RefreshToken.for_user(user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+
+    def call(method, url, expected=200, body=None):
+        def run():
+            response = getattr(client, method)(url, body, format='json')
+            assert response.status_code == expected, (url, response.status_code)
+        return run
+
+    etag = client.get(f'/api/projects/{project.pk}/')['ETag']
+
+    def not_modified():
+        response = client.get(f'/api/projects/{project.pk}/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304, response.status_code
+
+    anonymous = APIClient()
+    codes = []
+
+    def login():
+        response = anonymous.post('/api/auth/login/', {'username': user.username, 'password': PASSWORD}, format='json')
+        assert response.status_code == 200, response.status_code
+
+    def issue_code():
+        codes.append(get_otp_store().issue(user))
+
+    def verify_otp():
+        response = anonymous.post('/api/auth/verify-otp/', {'user_id': user.pk, 'code': codes.pop()}, format='json')
+        assert response.status_code == 200, response.status_code
+
+    comment = {'task': task.pk, 'content': 'benchmark comment'}
+    auth_repeat = min(repeat, 3)
+    return {
+        'GET /api/projects/': measure(call('get', '/api/projects/'), repeat),
+        'GET /api/projects/{id}/': measure(call('get', f'/api/projects/{project.pk}/'), repeat),
+        'GET /api/projects/{id}/ (If-None-Match)': measure(not_modified, repeat),
+        'GET /api/projects/{id}/stats/': measure(call('get', f'/api/projects/{project.pk}/stats/'), repeat),
+        'GET /api/projects/{id}/board/': measure(call('get', f'/api/projects/{project.pk}/board/'), repeat),
+        'GET /api/projects/{id}/tags/': measure(call('get', f'/api/projects/{project.pk}/tags/'), repeat),
+        'GET /api/tasks/': measure(call('get', '/api/tasks/'), repeat),
+        'GET /api/tasks/?project={id}&status=todo': measure(
+            call('get', f'/api/tasks/?project={project.pk}&status=todo'), repeat,
+        ),
+        'GET /api/tasks/?project={id}&tags=': measure(
+            call('get', f'/api/tasks/?project={project.pk}&tags={tag}'), repeat,
+        ),
+        'GET /api/tasks/?search=': measure(call('get', '/api/tasks/?search=payment'), repeat),
+        'GET /api/tasks/{id}/': measure(call('get', f'/api/tasks/{task.pk}/'), repeat),
+        'GET /api/tasks/workload/': measure(call('get', '/api/tasks/workload/'), repeat),
+        'PATCH /api/tasks/{id}/': measure(
+            call('patch', f'/api/tasks/{task.pk}/', body={'priority': 2}), repeat,
+        ),
+        'GET /api/comments/': measure(call('get', '/api/comments/'), repeat),
+        'GET /api/comments/?task={id}': measure(call('get', f'/api/comments/?task={task.pk}'), repeat),
+        'POST /api/comments/': measure(call('post', '/api/comments/', 201, comment), repeat),
+        'GET /api/users/': measure(call('get', '/api/users/'), repeat),
+        'GET /api/users/{id}/': measure(call('get', f'/api/users/{user.pk}/'), repeat),
+        'GET /api/memberships/': measure(call('get', '/api/memberships/'), repeat),
+        'GET /api/search/?q=': measure(call('get', '/api/search/?q=payment'), repeat),
+        'POST /api/auth/token/refresh/': measure(
+            call('post', '/api/auth/token/refresh/', body={'refresh': str(refresh)}), repeat,
+        ),
+        'POST /api/auth/login/': measure(login, auth_repeat),
+        'POST /api/auth/verify-otp/': measure(verify_otp, auth_repeat, setup=issue_code),
+    }
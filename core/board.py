@@ -0,0 +1,95 @@
+"""
+Kanban board of a project: one column per ``Task.STATUS_CHOICES`` entry.
+
+The first cards of every column come from a single query: ``ROW_NUMBER()``
+partitioned by status ranks the project's tasks straight off the covering
+``task_board_idx``, and only the ranked-in rows are read from the table.
+Column totals are summed from the rollup cells in the same statement rather
+than counted by a second window over every task. Each column carries a
+keyset cursor for its next cards, which reads one more range of the index.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db.models import F, OuterRef, Subquery, Sum, Window
+from django.db.models.functions import RowNumber
+
+from .models import Task, TaskRollup
+from .pagination import _to_json, decode_position, keyset_filter, keyset_order_by, parse_ordering
+
+ORDERING = ('priority', 'due_date', 'id')
+CARD_FIELDS = ('id', 'title', 'priority', 'due_date', 'assignee_id', 'parent_id', 'open_blockers')
+DEFAULT_CARDS = 20
+MAX_CARDS = 200
+
+KEYS = parse_ordering(Task, ORDERING)
+STATUSES = [value for value, _ in Task.STATUS_CHOICES]
+
+
+class BoardError(Exception):
+    pass
+
+
+def encode_cursor(card):
+    position = [_to_json(card[field.attname]) for field, _ in KEYS]
+    return urlsafe_b64encode(json.dumps(position, separators=(',', ':')).encode()).decode('ascii')
+
+
+def decode_cursor(encoded):
+    try:
+        return decode_position(KEYS, json.loads(urlsafe_b64decode(encoded.encode('ascii'))))
+    except (TypeError, ValueError):
+        raise BoardError("Invalid cursor.")
+
+
+def _column(status, total, cards, limit):
+    has_more = len(cards) > limit
+    cards = cards[:limit]
+    return {
+        'status': status,
+        'total': total,
+        'cards': cards,
+        'next': encode_cursor(cards[-1]) if has_more else None,
+    }
+
+
+def board(project_id, limit=DEFAULT_CARDS):
+    """Every column with its total and first ``limit`` cards, in one query."""
+    first = (
+        Task.objects.filter(project_id=project_id)
+        .annotate(position=Window(RowNumber(), partition_by=[F('status')], order_by=keyset_order_by(KEYS)))
+        # One card beyond the limit tells whether the column has more.
+        .filter(position__lte=limit + 1)
+        .values('id')
+    )
+    totals = (
+        TaskRollup.objects.filter(project_id=OuterRef('project_id'), status=OuterRef('status'))
+        .values('status').annotate(tasks=Sum('tasks')).values('tasks')
+    )
+    rows = (
+        Task.objects.filter(pk__in=first)
+        .annotate(total=Subquery(totals))
+        .order_by('status', *keyset_order_by(KEYS))
+        .values('status', 'total', *CARD_FIELDS)
+    )
+    columns = {status: {'total': 0, 'cards': []} for status in STATUSES}
+    for row in rows:
+        column = columns.setdefault(row.pop('status'), {'total': 0, 'cards': []})
+        column['total'] = row.pop('total') or 0
+        column['cards'].append(row)
+    return {
+        'project': project_id,
+        'columns': [_column(status, column['total'], column['cards'], limit) for status, column in columns.items()],
+    }
+
+
+def column(project_id, status, cursor=None, limit=DEFAULT_CARDS):
+    """The next ``limit`` cards of one column after ``cursor``; ``total`` is left out."""
+    if status not in STATUSES:
+        raise BoardError(f"Unknown status {status!r}.")
+    cards = Task.objects.filter(project_id=project_id, status=status).order_by(*keyset_order_by(KEYS))
+    if cursor:
+        cards = cards.filter(keyset_filter(KEYS, decode_cursor(cursor)))
+    result = _column(status, None, list(cards.values(*CARD_FIELDS)[:limit + 1]), limit)
+    del result['total']
+    return result
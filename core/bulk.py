@@ -0,0 +1,218 @@
+"""
+Batched task writes behind the ``/api/tasks/bulk*`` endpoints.
+
+Each operation checks permissions once per distinct project, writes every
+valid item in one transaction with ``bulk_create``/``bulk_update``/``update``,
+and reports invalid items by their index in the request. Model signals do
+not fire for these writes; ``tasks_bulk_changed`` is sent instead and the
+audit entries and project events are recorded here.
+"""
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.timezone import now
+from taggit.models import Tag, TaggedItem
+
+from . import audit, events, tagindex
+from .models import Project, Task, User
+from .serializers import BulkTaskSerializer
+from .signals import tasks_bulk_changed
+
+MAX_ITEMS = getattr(settings, 'TASK_BULK_MAX_ITEMS', 5000)
+
+
+class BulkError(Exception):
+    pass
+
+
+def _check_size(items):
+    if not isinstance(items, list) or not items:
+        raise BulkError("Expected a non-empty list.")
+    if len(items) > MAX_ITEMS:
+        raise BulkError(f"At most {MAX_ITEMS} items per request.")
+
+
+def writable_projects(user, project_ids):
+    """``{id: Project}`` for the projects among ``project_ids`` that ``user`` may change tasks in."""
+    projects = Project.objects.filter(pk__in=set(project_ids)).only('id', 'owner_id')
+    if not user.is_staff:
+        projects = projects.filter(owner=user)
+    return {project.pk: project for project in projects}
+
+
+def set_tags(task_tags, replace=False):
+    """
+    Tag many ``(task, tag_names)`` pairs at once: one lookup for existing tags, one insert for the
+    tagged items and one for their ``TaskTag`` rows. Only tag names never seen before are created
+    one by one, so taggit can pick unique slugs.
+    """
+    if not task_tags:
+        return
+    content_type = ContentType.objects.get_for_model(Task)
+    names = {name for _, tag_names in task_tags for name in tag_names}
+    tags = {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+    for name in names - tags.keys():
+        tags[name] = Tag.objects.create(name=name)
+    if replace:
+        TaggedItem.objects.filter(
+            content_type=content_type, object_id__in=[task.pk for task, _ in task_tags]
+        ).delete()
+    TaggedItem.objects.bulk_create(
+        [
+            TaggedItem(tag=tags[name], content_type=content_type, object_id=task.pk)
+            for task, tag_names in task_tags
+            for name in set(tag_names)
+        ],
+        ignore_conflicts=True,
+    )
+    tagindex.set_tags([(task, [tags[name] for name in set(tag_names)]) for task, tag_names in task_tags], replace)
+
+
+def _changed(task_ids, project_ids, fields, created=False):
+    tasks_bulk_changed.send(
+        sender=Task, task_ids=task_ids, project_ids=project_ids, fields=fields, created=created,
+    )
+
+
+def _as_int(value):
+    # JSON true and false arrive as bools, which int() reads as 1 and 0.
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _project_ids(items):
+    ids = {_as_int(item.get('project')) for item in items if isinstance(item, dict)}
+    ids.discard(None)
+    return ids
+
+
+def bulk_create(user, items):
+    _check_size(items)
+    projects = writable_projects(user, _project_ids(items))
+    context = {'projects': projects}
+
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        serializer = BulkTaskSerializer(data=item, context=context)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    with transaction.atomic():
+        task_tags = []
+        tasks = []
+        for index, data in valid:
+            data = dict(data)
+            tag_names = data.pop('tags', None)
+            task = Task(**data)
+            tasks.append(task)
+            if tag_names:
+                task_tags.append((task, tag_names))
+        Task.objects.bulk_create(tasks)
+        audit.record([audit.saved(task, created=True) for task in tasks])
+        events.record_bulk_tasks(tasks, created=True)
+        set_tags(task_tags)
+        task_ids = [task.pk for task in tasks]
+        project_ids = {task.project_id for task in tasks}
+        transaction.on_commit(lambda: _changed(task_ids, project_ids, None, created=True))
+
+    results = [{'index': index, 'id': task.pk} for (index, _), task in zip(valid, tasks)]
+    return results, errors
+
+
+def _load(user, ids, errors):
+    """Tasks by id that exist and that ``user`` may change; misses go to ``errors``."""
+    tasks = {task.pk: task for task in Task.objects.filter(pk__in={i for i in ids if i is not None})}
+    projects = writable_projects(user, {task.project_id for task in tasks.values()})
+    allowed = {}
+    for index, task_id in enumerate(ids):
+        task = tasks.get(task_id)
+        if task is None:
+            errors.append({'index': index, 'errors': {'id': ["Task not found."]}})
+        elif task.project_id not in projects:
+            errors.append({'index': index, 'errors': {'id': ["Only admins or the project owner can update tasks."]}})
+        else:
+            allowed[index] = task
+    return allowed
+
+
+def bulk_update(user, items):
+    _check_size(items)
+    errors = []
+    ids = [_as_int(item.get('id')) if isinstance(item, dict) else None for item in items]
+    tasks = _load(user, ids, errors)
+    project_ids = {task.project_id for task in tasks.values()}
+    # Tasks may only move to projects the user could create them in.
+    context = {'projects': writable_projects(user, _project_ids(items))}
+
+    changed, fields, task_tags, moved_from = [], set(), [], {}
+    for index, task in tasks.items():
+        old_project_id = task.project_id
+        serializer = BulkTaskSerializer(task, data=items[index], partial=True, context=context)
+        if not serializer.is_valid():
+            errors.append({'index': index, 'errors': serializer.errors})
+            continue
+        data = dict(serializer.validated_data)
+        tag_names = data.pop('tags', None)
+        if tag_names is not None:
+            task_tags.append((task, tag_names))
+        for name, value in data.items():
+            setattr(task, name, value)
+            fields.add(name)
+        changed.append((index, task))
+        project_ids.add(task.project_id)
+        if task.project_id != old_project_id:
+            moved_from[task.pk] = old_project_id
+
+    with transaction.atomic():
+        if fields:
+            timestamp = now()
+            for _, task in changed:
+                task.updated_at = timestamp
+            Task.objects.bulk_update([task for _, task in changed], sorted(fields) + ['updated_at'], batch_size=1000)
+            audit.record([audit.saved(task, False, fields) for _, task in changed])
+        set_tags(task_tags, replace=True)
+        events.record_bulk_tasks([task for _, task in changed], False, moved_from)
+        task_ids = [task.pk for _, task in changed]
+        changed_fields = sorted(fields) + (['tags'] if task_tags else [])
+        transaction.on_commit(lambda: _changed(task_ids, project_ids, changed_fields))
+
+    errors.sort(key=lambda error: error['index'])
+    return [{'index': index, 'id': task.pk} for index, task in changed], errors
+
+
+def _bulk_set(user, ids, field, value):
+    if not isinstance(ids, list) or not ids:
+        raise BulkError("Expected a non-empty list of task ids.")
+    if len(ids) > MAX_ITEMS:
+        raise BulkError(f"At most {MAX_ITEMS} items per request.")
+    errors = []
+    tasks = _load(user, [_as_int(task_id) for task_id in ids], errors)
+    task_ids = [task.pk for task in tasks.values()]
+    project_ids = {task.project_id for task in tasks.values()}
+    with transaction.atomic():
+        Task.objects.filter(pk__in=task_ids).update(**{field: value, 'updated_at': now()})
+        for task in tasks.values():
+            setattr(task, field, value)
+        audit.record([audit.saved(task, False, [field]) for task in tasks.values()])
+        events.record_bulk_tasks(tasks.values(), created=False)
+        transaction.on_commit(lambda: _changed(task_ids, project_ids, [field]))
+    return [{'index': index, 'id': task.pk} for index, task in tasks.items()], errors
+
+
+def bulk_set_status(user, ids, status):
+    if status not in dict(Task.STATUS_CHOICES):
+        raise BulkError(f'"{status}" is not a valid status.')
+    return _bulk_set(user, ids, 'status', status)
+
+
+def bulk_assign(user, ids, assignee_id):
+    if assignee_id is not None:
+        if _as_int(assignee_id) is None or not User.objects.filter(pk=assignee_id).exists():
+            raise BulkError(f'User {assignee_id} does not exist.')
+    return _bulk_set(user, ids, 'assignee_id', assignee_id)
@@ -0,0 +1,78 @@
+"""
+Conditional GET driven by ``Project.version``.
+
+Every write to a project, its tasks, their comments and tags, or its
+memberships bumps the project's counter (see core.signals). A request that is
+about one project is answered with 304 from a primary-key lookup of that
+counter when the client's ``If-None-Match`` still matches; only otherwise does
+the view query and serialize anything.
+
+User rows are not covered: a change to the owner, a member or an assignee
+(their name or email, say) leaves the projects they appear in at the same
+version, so clients keep a cached copy of those nested users until something
+in the project itself is written.
+"""
+import hashlib
+
+from django.db.models import F, Subquery
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Project, Task
+
+
+def bump_projects(project_ids):
+    project_ids = {project_id for project_id in project_ids if project_id is not None}
+    if project_ids:
+        Project.objects.filter(pk__in=project_ids).update(version=F('version') + 1)
+
+
+def bump_task_projects(task_ids):
+    """Bump the projects of ``task_ids`` without loading the tasks."""
+    task_ids = [task_id for task_id in task_ids if task_id is not None]
+    if task_ids:
+        Project.objects.filter(
+            pk__in=Subquery(Task.objects.filter(pk__in=task_ids).values('project_id'))
+        ).update(version=F('version') + 1)
+
+
+def make_etag(request, project_id, version):
+    """
+    Strong ETag for this exact representation: the same URL and ``Accept``
+    header against the same project version always render the same bytes.
+    """
+    variant = hashlib.sha1(
+        f"{request.get_full_path()}\n{request.headers.get('Accept', '')}".encode()
+    ).hexdigest()[:16]
+    return quote_etag(f"{project_id}.{version}.{variant}")
+
+
+class ProjectETagMixin:
+    """
+    For viewsets whose responses are determined by one project's data. Wrap a
+    handler in ``conditional(request, project_id, handler)``; it checks the
+    counter first and tags 200 responses with the ETag of the version read
+    before rendering, so a concurrent write can only make a client refetch.
+    """
+
+    def check_project_etag(self, project):
+        """Hook run on the ``(pk, owner_id, version)`` stub before answering 304."""
+
+    def conditional(self, request, project_id, handler):
+        try:
+            project_id = int(project_id)
+        except (TypeError, ValueError):
+            return handler()
+        project = Project.objects.filter(pk=project_id).only('id', 'owner_id', 'version').first()
+        if project is None:
+            return handler()
+        self.check_project_etag(project)
+        etag = make_etag(request, project.pk, project.version)
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match == '*' or etag in parse_etags(if_none_match):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = handler()
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
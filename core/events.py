@@ -0,0 +1,283 @@
+"""
+Per-project change feed streamed as Server-Sent Events.
+
+``ProjectEvent`` rows are the source of truth: signal handlers, and the bulk
+task operations, insert them in the same transaction as the change, so a
+stream resumes from any ``Last-Event-ID`` by reading the rows after it. Once a
+change commits, the ``EVENTS_BACKEND`` wakes the streams following that
+project so they read immediately; streams also re-read on every heartbeat,
+which bounds the delay for changes made in processes the backend does not
+reach.
+
+Ids are handed out at insert, not at commit, so a row can become visible
+after one with a higher id has already been streamed. Streams therefore also
+re-read the rows created in the last ``EVENTS_COMMIT_WINDOW`` seconds and send
+those they haven't yet. A resumed stream re-sends that window too: clients
+should ignore event ids they have already seen.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from .models import Comment, ProjectEvent, Task
+
+HEARTBEAT = getattr(settings, 'EVENTS_HEARTBEAT', 15)
+# Streams end after this long; clients reconnect with Last-Event-ID.
+MAX_SECONDS = getattr(settings, 'EVENTS_MAX_SECONDS', 300)
+RETRY_MS = 3000
+BATCH_SIZE = 100
+# Longest a transaction recording events is expected to stay open.
+COMMIT_WINDOW = timedelta(seconds=getattr(settings, 'EVENTS_COMMIT_WINDOW', 10))
+
+
+def task_payload(task):
+    return {
+        'id': task.pk,
+        'project': task.project_id,
+        'title': task.title,
+        'status': task.status,
+        'priority': task.priority,
+        'assignee': task.assignee_id,
+        'due_date': task.due_date,
+    }
+
+
+def comment_payload(comment):
+    return {'id': comment.pk, 'task': comment.task_id, 'author': comment.author_id, 'parent': comment.parent_id}
+
+
+def record(events):
+    """Save ``ProjectEvent`` instances and wake their projects' streams after commit."""
+    if not events:
+        return
+    ProjectEvent.objects.bulk_create(events, batch_size=1000)
+    project_ids = {event.project_id for event in events}
+    transaction.on_commit(lambda: _publish(project_ids))
+
+
+def _publish(project_ids):
+    backend = get_event_backend()
+    for project_id in project_ids:
+        backend.publish(project_id)
+
+
+def event(project_id, kind, action, object_id, payload):
+    return ProjectEvent(project_id=project_id, kind=kind, action=action, object_id=object_id, payload=payload)
+
+
+def task_events(task, created, old_project_id=None):
+    """The events of one task write; a move also tells the old project the task left."""
+    changes = [event(task.project_id, 'task', 'created' if created else 'updated', task.pk, task_payload(task))]
+    if old_project_id is not None and old_project_id != task.project_id:
+        changes.append(event(old_project_id, 'task', 'deleted', task.pk, {'id': task.pk, 'moved_to': task.project_id}))
+    return changes
+
+
+def record_bulk_tasks(tasks, created, old_project_ids=None):
+    """Events of a bulk write, from the saved instances; ``old_project_ids`` maps moved task ids."""
+    old_project_ids = old_project_ids or {}
+    record([
+        change for task in tasks
+        for change in task_events(task, created, old_project_ids.get(task.pk))
+    ])
+
+
+def comment_project_id(comment):
+    if Comment.task.is_cached(comment):
+        return comment.task.project_id
+    return Task.objects.filter(pk=comment.task_id).values_list('project_id', flat=True).first()
+
+
+async def alatest_id(project_id):
+    latest = ProjectEvent.objects.filter(project_id=project_id).order_by('-id').values_list('id', flat=True)
+    return await latest.afirst() or 0
+
+
+def purge(before, chunk_size=1000):
+    total = 0
+    while True:
+        ids = list(ProjectEvent.objects.filter(created_at__lt=before).values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        total += ProjectEvent.objects.filter(pk__in=ids).delete()[0]
+
+
+def format_event(project_event):
+    data = json.dumps(
+        {'id': project_event.object_id, 'data': project_event.payload, 'at': project_event.created_at},
+        cls=DjangoJSONEncoder,
+    )
+    return f"id: {project_event.pk}\nevent: {project_event.kind}.{project_event.action}\ndata: {data}\n\n"
+
+
+class BaseEventBackend:
+    def publish(self, project_id):
+        """Wake the streams following ``project_id``; called after commit, from any thread."""
+
+    def subscribe(self, project_id):
+        """A subscription with ``clear()``, ``async wait(timeout)`` and ``close()``."""
+        return _PollingSubscription(HEARTBEAT)
+
+
+class _PollingSubscription:
+    def __init__(self, interval):
+        self.interval = interval
+
+    def clear(self):
+        pass
+
+    async def wait(self, timeout):
+        await asyncio.sleep(min(self.interval, timeout))
+
+    def close(self):
+        pass
+
+
+class PollingEventBackend(BaseEventBackend):
+    """
+    Shares nothing: every stream re-reads the table each
+    ``EVENTS_POLL_INTERVAL`` seconds, so any number of workers see each
+    other's changes at the cost of one indexed query per stream and interval.
+    """
+
+    def subscribe(self, project_id):
+        return _PollingSubscription(getattr(settings, 'EVENTS_POLL_INTERVAL', 2))
+
+
+class _LocalSubscription:
+    def __init__(self, backend, project_id):
+        self.backend = backend
+        self.project_id = project_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            # The stream's event loop has already shut down.
+            pass
+
+    def clear(self):
+        self.event.clear()
+
+    async def wait(self, timeout):
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            # Only an alias of TimeoutError from Python 3.11 on.
+            pass
+
+    def close(self):
+        self.backend._remove(self)
+
+
+class LocalEventBackend(BaseEventBackend):
+    """
+    In-process fan-out: a commit wakes every stream of the project in this
+    process at once. Changes committed by other processes show up at the
+    next heartbeat; use ``PollingEventBackend`` to shorten that.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, project_id):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(project_id, ()))
+        for subscription in subscriptions:
+            subscription.wake()
+
+    def subscribe(self, project_id):
+        subscription = _LocalSubscription(self, project_id)
+        with self._lock:
+            self._subscriptions[project_id].add(subscription)
+        return subscription
+
+    def _remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.project_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.project_id]
+
+
+@lru_cache(maxsize=None)
+def get_event_backend():
+    return import_string(getattr(settings, 'EVENTS_BACKEND', 'core.events.LocalEventBackend'))()
+
+
+def _unsent(project_id, after_id, sent):
+    """The project's events after ``after_id`` or inside the commit window, oldest first."""
+    cutoff = now() - COMMIT_WINDOW
+    for pk, created_at in list(sent.items()):
+        if created_at < cutoff:
+            del sent[pk]
+    # Rows at or below after_id only come back while inside the window, and
+    # those already sent are in ``sent``, so this limit leaves a full batch.
+    return (
+        ProjectEvent.objects.filter(project_id=project_id)
+        .filter(Q(id__gt=after_id) | Q(created_at__gte=cutoff))
+        .order_by('id')[:BATCH_SIZE + len(sent)]
+    )
+
+
+async def stream(project_id, after_id, still_allowed, resume=True):
+    """
+    SSE lines for ``project_id`` after event ``after_id``, ending after
+    ``MAX_SECONDS`` or when ``await still_allowed()``, checked every
+    ``HEARTBEAT`` seconds whether or not events are flowing, turns False.
+    Unless ``resume``, the events up to ``after_id`` that are already visible
+    count as sent.
+    """
+    subscription = get_event_backend().subscribe(project_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_SECONDS
+    last_write = last_check = loop.time()
+    # Ids streamed inside the commit window, with their created_at.
+    sent = {}
+    if not resume:
+        sent = {
+            pk: created_at async for pk, created_at in
+            ProjectEvent.objects.filter(project_id=project_id, id__lte=after_id, created_at__gte=now() - COMMIT_WINDOW)
+            .values_list('id', 'created_at')
+        }
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        while loop.time() < deadline:
+            if loop.time() - last_check >= HEARTBEAT:
+                if not await still_allowed():
+                    return
+                last_check = loop.time()
+            # Cleared before reading, so a wake-up during the read isn't lost.
+            subscription.clear()
+            batch = [
+                project_event async for project_event in _unsent(project_id, after_id, sent)
+                if project_event.pk not in sent
+            ][:BATCH_SIZE]
+            for project_event in batch:
+                yield format_event(project_event)
+                sent[project_event.pk] = project_event.created_at
+                after_id = max(after_id, project_event.pk)
+            if batch:
+                last_write = loop.time()
+                if len(batch) == BATCH_SIZE:
+                    continue
+            elif loop.time() - last_write >= HEARTBEAT:
+                yield ": keep-alive\n\n"
+                last_write = loop.time()
+            await subscription.wait(max(0, min(HEARTBEAT, deadline - loop.time())))
+    finally:
+        subscription.close()
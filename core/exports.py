@@ -0,0 +1,134 @@
+"""
+Constant-memory CSV / NDJSON exports.
+
+Rows are read with ``.values().iterator(chunk_size=...)`` (a server-side
+cursor on PostgreSQL) and related data such as tags and usernames is looked
+up once per chunk, so memory depends on the chunk size, not the row count.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from taggit.models import TaggedItem
+
+from .models import Task, User
+
+CHUNK_SIZE = 2000
+
+TASK_COLUMNS = [
+    'id', 'project_id', 'title', 'description', 'status', 'priority',
+    'assignee', 'tags', 'due_date', 'created_at',
+]
+COMMENT_COLUMNS = ['id', 'task_id', 'author', 'content', 'created_at']
+PROJECT_COLUMNS = ['id', 'name', 'description', 'status', 'owner', 'created_at']
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Lets content negotiation (``?format=`` or ``Accept``) pick the export
+    format. Exports stream past the renderer; only error responses are
+    rendered here.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode()
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class Echo:
+    """File-like object whose write() hands back the line instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def usernames(user_ids):
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    return dict(User.objects.filter(pk__in=user_ids).values_list('id', 'username'))
+
+
+def task_tags(task_ids):
+    tags = {}
+    rows = TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Task), object_id__in=task_ids,
+    ).values_list('object_id', 'tag__name')
+    for task_id, name in rows:
+        tags.setdefault(task_id, []).append(name)
+    return tags
+
+
+def export_tasks(queryset, chunk_size=CHUNK_SIZE):
+    rows = queryset.order_by('pk').values(
+        'id', 'project_id', 'title', 'description', 'status', 'priority',
+        'assignee_id', 'due_date', 'created_at',
+    ).iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        assignees = usernames(row['assignee_id'] for row in chunk)
+        tags = task_tags([row['id'] for row in chunk])
+        for row in chunk:
+            row['assignee'] = assignees.get(row.pop('assignee_id'))
+            row['tags'] = sorted(tags.get(row['id'], []))
+            yield row
+
+
+def export_comments(queryset, chunk_size=CHUNK_SIZE):
+    rows = queryset.order_by('pk').values(
+        'id', 'task_id', 'author_id', 'content', 'created_at',
+    ).iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        authors = usernames(row['author_id'] for row in chunk)
+        for row in chunk:
+            row['author'] = authors.get(row.pop('author_id'))
+            yield row
+
+
+def export_projects(queryset, chunk_size=CHUNK_SIZE):
+    rows = queryset.order_by('pk').values(
+        'id', 'name', 'description', 'status', 'owner_id', 'created_at',
+    ).iterator(chunk_size=chunk_size)
+    for chunk in chunked(rows, chunk_size):
+        owners = usernames(row['owner_id'] for row in chunk)
+        for row in chunk:
+            row['owner'] = owners.get(row.pop('owner_id'))
+            yield row
+
+
+def _csv_lines(rows, columns):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            ','.join(value) if isinstance(value, list) else value
+            for value in (row[name] for name in columns)
+        ])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=str) + '\n'
+
+
+def streaming_export(rows, columns, renderer, filename):
+    lines = _csv_lines(rows, columns) if renderer.format == 'csv' else ndjson_lines(rows)
+    response = StreamingHttpResponse(lines, content_type=renderer.media_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{renderer.format}"'
+    return response
@@ -0,0 +1,250 @@
+"""
+Subtasks and task dependencies.
+
+Subtasks form a tree stored as a materialized path: ``Task.path`` lists the
+ancestors' ids, so a whole subtree is one range scan over the path index and
+a move is checked by comparing prefixes rather than walking parents.
+
+Dependencies ("task is blocked by blocker") form a DAG whose transitive
+closure is kept in ``TaskDependencyClosure`` with the number of distinct
+chains between each pair, which is what lets an edge be removed again. A new
+edge closes a cycle exactly when the blocker already waits on the task: one
+indexed lookup. ``Task.open_blockers`` counts the direct blockers not yet
+done and is refreshed with one UPDATE whenever a blocker's status moves to
+or from done.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, Exists, Max, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Length, Substr
+
+from .models import Project, Task, TaskDependency, TaskDependencyClosure
+
+MAX_PATH_LENGTH = Task._meta.get_field('path').max_length
+TOO_DEEP = f"Subtasks would be nested too deeply: a task's ancestor ids take at most {MAX_PATH_LENGTH} characters."
+TREE_FIELDS = ('id', 'parent_id', 'title', 'status', 'priority', 'assignee_id', 'open_blockers')
+
+
+class HierarchyError(Exception):
+    pass
+
+
+def prefix(task):
+    """Path shared by every descendant of ``task``."""
+    return f'{task.path}{task.pk}/'
+
+
+def under(prefix):
+    """Tasks whose path starts with ``prefix``, as a condition the path index can answer."""
+    if connection.vendor == 'sqlite':
+        # SQLite's LIKE is case-insensitive and can't use the index; paths
+        # are digits and '/', and '0' sorts right after '/'.
+        return Q(path__gte=prefix, path__lt=prefix[:-1] + '0')
+    # Collations other than "C" may skip the '/' when comparing, so a range
+    # could miss rows there; LIKE is answered by a varchar_pattern_ops index
+    # (Django adds one for ``Task.path``, migration 0022 for comment paths).
+    return Q(path__startswith=prefix)
+
+
+def check_parent(task, parent):
+    """Raise ``HierarchyError`` unless ``parent`` may hold ``task``."""
+    if parent is None:
+        return
+    if parent.project_id != task.project_id:
+        raise HierarchyError("A subtask must be in its parent's project.")
+    if task.pk is None:
+        return
+    if parent.pk == task.pk or prefix(parent).startswith(prefix(task)):
+        raise HierarchyError("A task can't be moved under itself or one of its subtasks.")
+
+
+def prepare(task):
+    """
+    ``pre_save``: derive the task's path from its parent. When an existing
+    task moves, its old subtree prefix is left on ``_moved_from`` for
+    ``move_subtree``.
+    """
+    task._moved_from = None
+    loaded = getattr(task, '_loaded_values', {})
+    if not task._state.adding and loaded.get('parent_id', task.parent_id) == task.parent_id and 'path' in loaded:
+        return
+    if task.parent_id is None:
+        path = ''
+    else:
+        parent = Task.objects.filter(pk=task.parent_id).only('id', 'project_id', 'path').first()
+        if parent is None:
+            raise HierarchyError(f"Task {task.parent_id} does not exist.")
+        check_parent(task, parent)
+        path = prefix(parent)
+    old_path = None
+    if not task._state.adding:
+        old_path = loaded.get('path')
+        if old_path is None:
+            old_path = Task.objects.filter(pk=task.pk).values_list('path', flat=True).first()
+    check_depth(task, path, old_path)
+    if old_path is not None and old_path != path:
+        task._moved_from = f'{old_path}{task.pk}/'
+    task.path = path
+
+
+def check_depth(task, path, old_path=None):
+    """
+    Raise ``HierarchyError`` unless ``task`` and, when it moves from
+    ``old_path``, its subtree still fit ``Task.path`` under the new ``path``.
+    """
+    if len(path) > MAX_PATH_LENGTH:
+        raise HierarchyError(TOO_DEEP)
+    if old_path is not None and old_path != path and task.pk is not None:
+        deepest = Task.objects.filter(under(f'{old_path}{task.pk}/')).aggregate(length=Max(Length('path')))['length']
+        if deepest is not None and deepest - len(old_path) + len(path) > MAX_PATH_LENGTH:
+            raise HierarchyError(TOO_DEEP)
+
+
+def move_subtree(task):
+    """``post_save``: re-root the descendants of a task that ``prepare`` saw move, in one UPDATE."""
+    old_prefix = getattr(task, '_moved_from', None)
+    if old_prefix is None:
+        return
+    task._moved_from = None
+    Task.objects.filter(under(old_prefix)).update(
+        path=Concat(Value(prefix(task)), Substr('path', len(old_prefix) + 1)),
+    )
+
+
+def tree(task):
+    """``task`` and every subtask, nested under ``subtasks``, read with one query."""
+    root = {field: getattr(task, field) for field in TREE_FIELDS}
+    nodes = {task.pk: root}
+    root['subtasks'] = []
+    # Ordered by path, every parent comes before its children.
+    for row in Task.objects.filter(under(prefix(task))).order_by('path', 'id').values(*TREE_FIELDS):
+        row['subtasks'] = []
+        nodes[row['id']] = row
+        nodes[row['parent_id']]['subtasks'].append(row)
+    return root
+
+
+def _lock_project(project_id):
+    # Serializes dependency changes within a project, so concurrent edges
+    # can't close a cycle that neither saw.
+    list(Project.objects.select_for_update().filter(pk=project_id).values_list('pk'))
+
+
+def _adjust(task_id, blocker_id, sign):
+    """
+    Add (``sign`` 1) or take away (-1) the chains through edge
+    ``task_id -> blocker_id``: everything waiting on the task (the task
+    included) gains or loses routes to everything the blocker waits on (the
+    blocker included).
+    """
+    upstream = [(task_id, 1)] + list(
+        TaskDependencyClosure.objects.filter(blocker_id=task_id).values_list('task_id', 'paths')
+    )
+    downstream = [(blocker_id, 1)] + list(
+        TaskDependencyClosure.objects.filter(task_id=blocker_id).values_list('blocker_id', 'paths')
+    )
+    delta = {
+        (waiting, blocking): sign * waiting_paths * blocking_paths
+        for waiting, waiting_paths in upstream
+        for blocking, blocking_paths in downstream
+    }
+    existing = {
+        (row.task_id, row.blocker_id): row
+        for row in TaskDependencyClosure.objects.filter(
+            task_id__in={pair[0] for pair in delta}, blocker_id__in={pair[1] for pair in delta},
+        )
+    }
+    created, updated, emptied = [], [], []
+    for (waiting, blocking), change in delta.items():
+        row = existing.get((waiting, blocking))
+        if row is None:
+            created.append(TaskDependencyClosure(task_id=waiting, blocker_id=blocking, paths=change))
+            continue
+        row.paths += change
+        if row.paths > 0:
+            updated.append(row)
+        else:
+            emptied.append(row.pk)
+    TaskDependencyClosure.objects.bulk_create(created, batch_size=1000)
+    TaskDependencyClosure.objects.bulk_update(updated, ['paths'], batch_size=1000)
+    TaskDependencyClosure.objects.filter(pk__in=emptied).delete()
+
+
+def add_dependency(task, blocker):
+    """Make ``task`` wait on ``blocker``; returns False if it already did."""
+    if task.pk == blocker.pk:
+        raise HierarchyError("A task can't block itself.")
+    if task.project_id != blocker.project_id:
+        raise HierarchyError("Dependencies must be between tasks of the same project.")
+    with transaction.atomic():
+        _lock_project(task.project_id)
+        if TaskDependencyClosure.objects.filter(task_id=blocker.pk, blocker_id=task.pk).exists():
+            raise HierarchyError(f"Task {blocker.pk} already waits on task {task.pk}; this would be a cycle.")
+        _, created = TaskDependency.objects.get_or_create(task_id=task.pk, blocker_id=blocker.pk)
+        if created:
+            _adjust(task.pk, blocker.pk, 1)
+            refresh_open_blockers([task.pk])
+    return created
+
+
+def remove_dependency(task_id, blocker_id, project_id):
+    """Stop ``task_id`` waiting on ``blocker_id``; returns False if it didn't."""
+    with transaction.atomic():
+        _lock_project(project_id)
+        deleted, _ = TaskDependency.objects.filter(task_id=task_id, blocker_id=blocker_id).delete()
+        if deleted:
+            _adjust(task_id, blocker_id, -1)
+            refresh_open_blockers([task_id])
+    return bool(deleted)
+
+
+def has_dependencies(task):
+    """Whether ``task`` waits on or blocks another task, which ties it to its project."""
+    return TaskDependency.objects.filter(Q(task=task) | Q(blocker=task)).exists()
+
+
+def detach(task, origin=None):
+    """
+    ``pre_delete``: take ``task``'s edges out of the closure before its rows
+    cascade away. Skipped when its whole project is being deleted.
+    """
+    if isinstance(origin, Project):
+        return
+    edges = list(
+        TaskDependency.objects.filter(Q(task=task) | Q(blocker=task)).values_list('task_id', 'blocker_id')
+    )
+    for task_id, blocker_id in edges:
+        remove_dependency(task_id, blocker_id, task.project_id)
+
+
+def refresh_open_blockers(task_ids):
+    """Recount the open direct blockers of ``task_ids`` (ids or a subquery) in one UPDATE."""
+    open_count = (
+        TaskDependency.objects.filter(task=OuterRef('pk')).exclude(blocker__status='done')
+        .values('task').annotate(count=Count('pk')).values('count')
+    )
+    Task.objects.filter(pk__in=task_ids).update(open_blockers=Coalesce(Subquery(open_count), 0))
+
+
+def blockers_changed(blocker_ids):
+    """Recount the tasks waiting directly on ``blocker_ids`` after their status changed."""
+    refresh_open_blockers(TaskDependency.objects.filter(blocker_id__in=blocker_ids).values('task_id'))
+
+
+def dependencies(task):
+    """Everything ``task`` transitively waits on and everything waiting on it, one query each."""
+    def rows(closure, other):
+        direct = TaskDependency.objects.filter(
+            task_id=OuterRef('task_id'), blocker_id=OuterRef('blocker_id'),
+        )
+        return [
+            {'id': row[f'{other}_id'], 'title': row[f'{other}__title'], 'status': row[f'{other}__status'],
+             'direct': row['direct']}
+            for row in closure.annotate(direct=Exists(direct)).order_by(f'{other}_id').values(
+                f'{other}_id', f'{other}__title', f'{other}__status', 'direct',
+            )
+        ]
+
+    return {
+        'blocked_by': rows(TaskDependencyClosure.objects.filter(task=task), 'blocker'),
+        'blocking': rows(TaskDependencyClosure.objects.filter(blocker=task), 'task'),
+    }
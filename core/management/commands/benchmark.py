@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+
+from core.benchmarks import BASELINES_PATH, SCENARIOS, check_baselines, load_baselines, save_baselines
+
+
+class Command(BaseCommand):
+    help = "Run an endpoint benchmark against freshly seeded data (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        # Left unset, each scenario uses its own defaults.
+        parser.add_argument('--tasks', type=int)
+        parser.add_argument('--repeat', type=int)
+        parser.add_argument('--concurrency', type=int)
+        parser.add_argument('--baseline', default=str(BASELINES_PATH), help="Baselines JSON file.")
+        parser.add_argument('--check', action='store_true',
+                            help="Fail when a result makes more queries than its baseline.")
+        parser.add_argument('--check-timings', action='store_true',
+                            help="With --check, also fail on p95s over the baseline; only meaningful on the "
+                                 "machine that recorded it.")
+        parser.add_argument('--tolerance', type=float, default=1.0,
+                            help="Allowed p95 slowdown over the baseline, as a fraction (default 1.0, i.e. 2x).")
+        parser.add_argument('--update-baseline', action='store_true',
+                            help="Record these results as the scenario's baselines.")
+
+    def handle(self, *args, scenario, baseline, check, check_timings, tolerance, update_baseline, **options):
+        kwargs = {name: options[name] for name in ('tasks', 'repeat', 'concurrency') if options[name] is not None}
+        # Scenarios make slow requests on purpose; don't log each one.
+        with override_settings(METRICS_SLOW_REQUEST_MS=None), transaction.atomic():
+            results = SCENARIOS[scenario](self.stdout, **kwargs)
+            transaction.set_rollback(True)
+
+        for label, result in results.items():
+            line = (
+                f"{label:<45} queries={result['queries']:<6} "
+                f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms max={result['max_ms']}ms"
+            )
+            if 'per_second' in result:
+                line += f" throughput={result['per_second']}/s"
+            self.stdout.write(line)
+
+        if update_baseline:
+            save_baselines(scenario, results, baseline)
+            self.stdout.write(f"baseline={baseline}")
+        if check:
+            baselines = load_baselines(baseline).get(scenario)
+            if not baselines:
+                raise CommandError(f"No baselines for {scenario!r} in {baseline}.")
+            failures = check_baselines(results, baselines, tolerance if check_timings else None)
+            if failures:
+                raise CommandError("Over baseline:\n" + "\n".join(failures))
+            self.stdout.write(f"checked={len(baselines)}")
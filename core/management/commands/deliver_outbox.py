@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.outbox import claim_batch, deliver_batch, queue_depth
+
+
+class Command(BaseCommand):
+    help = "Deliver queued outbound email in batches. Runs until interrupted unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int, default=4,
+                            help="Threads (and mail connections) per batch.")
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help="Seconds to sleep when nothing is due.")
+        parser.add_argument('--once', action='store_true',
+                            help="Drain what is currently due, then exit.")
+        parser.add_argument('--stats', action='store_true',
+                            help="Print the queue depth and exit.")
+
+    def handle(self, *args, batch_size, workers, interval, once, stats, **options):
+        if batch_size < 1 or workers < 1:
+            raise CommandError("--batch-size and --workers must be at least 1.")
+        if stats:
+            self.stdout.write(f"pending={queue_depth()}")
+            return
+
+        while True:
+            batch = claim_batch(batch_size)
+            if batch:
+                sent, retried, failed = deliver_batch(batch, workers)
+                self.stdout.write(
+                    f"sent={sent} retrying={retried} failed={failed} pending={queue_depth()}"
+                )
+                continue
+            if once:
+                return
+            time.sleep(interval)
@@ -0,0 +1,101 @@
+import re
+from datetime import timedelta
+from itertools import chain
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from django_filters import filters
+from django_filters.rest_framework import DjangoFilterBackend
+
+from core.urls import router
+
+# A full pass over a table, as opposed to an index search.
+SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)'),
+    'mysql': re.compile(r'type: ALL.*table: (\w+)|"access_type": "ALL"'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN every filter and declared filter combination of the API viewsets "
+        "and report the ones that fall back to a full table scan. Plans depend on "
+        "table statistics, so run this against a realistically sized database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fail-on-scan', action='store_true',
+                            help="Exit with an error if any combination scans a table.")
+        parser.add_argument('--verbose-plans', action='store_true',
+                            help="Print every plan, not only the scanning ones.")
+
+    def handle(self, *args, fail_on_scan=False, verbose_plans=False, **options):
+        pattern = SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Don't know how to read {connection.vendor} plans.")
+
+        scans = 0
+        for prefix, viewset, basename in router.registry:
+            view = viewset(action='list', kwargs={}, format_kwarg=None)
+            queryset = view.get_queryset()
+            filterset_class = DjangoFilterBackend().get_filterset_class(view, queryset)
+            if filterset_class is None:
+                continue
+            base_filters = filterset_class.base_filters
+            combinations = chain(
+                ((name,) for name in base_filters),
+                getattr(viewset, 'filter_combinations', ()),
+            )
+            filterset = filterset_class(queryset=queryset)
+            for combination in combinations:
+                filtered = queryset
+                for name in combination:
+                    filter_ = base_filters[name]
+                    lookup = self.sample_lookup(queryset.model, filter_)
+                    if filter_.method:
+                        # Method filters get the sample value and build their own lookups.
+                        [value] = lookup.values()
+                        if isinstance(filter_, filters.CharFilter):
+                            value = str(value)
+                        filtered = getattr(filterset, filter_.method)(filtered, name, value)
+                    else:
+                        filtered = filtered.filter(**lookup)
+                ordering = getattr(viewset, 'ordering', None)
+                if ordering:
+                    filtered = filtered.order_by(*ordering)
+                plan = filtered.explain()
+                scanned = sorted(set(m for m in pattern.findall(plan) if m))
+                label = f"{basename}: {' + '.join(combination)}"
+                if scanned:
+                    scans += 1
+                    self.stdout.write(self.style.WARNING(f"SCAN  {label} -> {', '.join(scanned)}"))
+                else:
+                    self.stdout.write(f"ok    {label}")
+                if scanned or verbose_plans:
+                    self.stdout.write('      ' + plan.replace('\n', '\n      '))
+
+        if scans and fail_on_scan:
+            raise CommandError(f"{scans} filter combination(s) scan a full table.")
+
+    def sample_lookup(self, model, filter_):
+        field_name = filter_.field_name
+        if isinstance(filter_, filters.DateFromToRangeFilter):
+            now = timezone.now()
+            return {f'{field_name}__range': (now - timedelta(days=30), now)}
+        if isinstance(filter_, filters.DateTimeFilter):
+            return {f'{field_name}__{filter_.lookup_expr}': timezone.now() - timedelta(days=30)}
+        value = (
+            model._default_manager.exclude(**{f'{field_name}__isnull': True})
+            .values_list(field_name, flat=True).first()
+        )
+        if value is None:
+            try:
+                field_choices = model._meta.get_field(field_name).choices
+            except FieldDoesNotExist:
+                field_choices = None
+            choices = getattr(filter_, 'extra', {}).get('choices') or field_choices
+            value = choices[0][0] if choices else 1
+        return {f'{field_name}__{filter_.lookup_expr}': value}
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from core.audit import period_of, purge
+
+
+class Command(BaseCommand):
+    help = "Delete audit log periods (calendar months) older than the last --months, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, months, chunk_size, **options):
+        current = now()
+        index = current.year * 12 + current.month - 1 - months
+        before = period_of(current.replace(year=index // 12, month=index % 12 + 1, day=1))
+        deleted = purge(before, chunk_size=chunk_size)
+        self.stdout.write(f"before={before} deleted={deleted}")
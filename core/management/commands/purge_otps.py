@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.otp_store import get_otp_store
+
+
+class Command(BaseCommand):
+    help = "Delete expired one-time passwords in chunks (a no-op for cache-backed stores)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, chunk_size, **options):
+        deleted = get_otp_store().purge_expired(chunk_size=chunk_size)
+        self.stdout.write(f"deleted={deleted}")
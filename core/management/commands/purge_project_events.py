@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from core.events import purge
+
+
+class Command(BaseCommand):
+    help = "Delete project change-feed events older than --days, in chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, days, chunk_size, **options):
+        deleted = purge(now() - timedelta(days=days), chunk_size=chunk_size)
+        self.stdout.write(f"deleted={deleted}")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.models import SearchEntry
+from core.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index from tasks, projects and comments."
+
+    def handle(self, *args, **options):
+        rebuild()
+        self.stdout.write(f"indexed={SearchEntry.objects.count()}")
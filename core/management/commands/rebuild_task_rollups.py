@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the task statistics rollups, or with --check only list projects that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', dest='projects',
+                            help="Limit to this project id; repeatable.")
+        parser.add_argument('--check', action='store_true',
+                            help="Report drifted projects without writing.")
+
+    def handle(self, *args, projects, check, **options):
+        drifted = rollups.drift(projects)
+        self.stdout.write(f"drifted={','.join(map(str, drifted)) or '-'}")
+        if not check:
+            rollups.rebuild(projects)
+            self.stdout.write("rebuilt")
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import tagindex
+
+
+class Command(BaseCommand):
+    help = "Re-derive the per-project task tag index from taggit, or with --check only list projects that drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', dest='projects',
+                            help="Limit to this project id; repeatable.")
+        parser.add_argument('--check', action='store_true',
+                            help="Report drifted projects without writing.")
+
+    def handle(self, *args, projects, check, **options):
+        drifted = tagindex.drift(projects)
+        self.stdout.write(f"drifted={','.join(map(str, drifted)) or '-'}")
+        if not check:
+            tagindex.rebuild(projects)
+            self.stdout.write("rebuilt")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from core.seed import PASSWORD, seed_dataset
+
+
+class Command(BaseCommand):
+    help = "Bulk-insert a synthetic dataset: users, projects, memberships, tagged tasks, comments and OTPs."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--projects', type=int, default=10)
+        parser.add_argument('--members', type=int, default=10, help="Members per project.")
+        parser.add_argument('--tasks', type=int, default=5000)
+        parser.add_argument('--tags', type=int, default=50)
+        parser.add_argument('--tags-per-task', type=int, default=2)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--otps', type=int, default=100)
+        parser.add_argument('--prefix', default='seed', help="Prefix of usernames, tag and project names.")
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['projects'] < 1:
+            raise CommandError("Need at least one user and one project.")
+        try:
+            created = seed_dataset(
+                users=options['users'], projects=options['projects'], members=options['members'],
+                tasks=options['tasks'], tags=options['tags'], tags_per_task=options['tags_per_task'],
+                comments=options['comments'], otps=options['otps'], prefix=options['prefix'],
+                random_seed=options['random_seed'],
+            )
+        except IntegrityError as exc:
+            raise CommandError(f"{exc}; rows with prefix {options['prefix']!r} probably exist, pick another --prefix.")
+        self.stdout.write(' '.join(f'{kind}={len(objects)}' for kind, objects in created.items()))
+        self.stdout.write(f"password={PASSWORD}")
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+
+from core.reminders import ReminderScheduler
+
+
+class Command(BaseCommand):
+    help = "Email assignees digests of their upcoming and overdue tasks. Runs until interrupted unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30.0,
+                            help="Most seconds to sleep between looks for changed tasks.")
+        parser.add_argument('--once', action='store_true',
+                            help="Send what is currently due, then exit.")
+
+    def handle(self, *args, interval, once, **options):
+        scheduler = ReminderScheduler()
+        while True:
+            digests, reminders = scheduler.tick()
+            if digests:
+                self.stdout.write(f"digests={digests} reminders={reminders}")
+            if once:
+                return
+            next_fire = scheduler.next_fire()
+            wait = interval if next_fire is None else (next_fire - now()).total_seconds()
+            time.sleep(min(max(wait, 0.1), interval))
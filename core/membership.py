@@ -0,0 +1,82 @@
+"""
+Answers "is user U the owner or a member of project P" without loading the
+project's member list.
+
+Lookups go through a per-process LRU, then the shared Django cache, and only
+then to a single EXISTS query over the indexed membership tables. Shared
+entries are keyed by a per-project version, so invalidating a project is one
+cache write no matter how many users were cached for it. The query always
+runs on the primary, so a lagging replica can't be cached past an invalidation.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from .cache import LocalLRUCache, MISSING
+from .models import Project, membership
+
+_local = LocalLRUCache(
+    maxsize=getattr(settings, 'MEMBERSHIP_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'MEMBERSHIP_CACHE_LOCAL_TTL', 5),
+)
+SHARED_TIMEOUT = getattr(settings, 'MEMBERSHIP_CACHE_TIMEOUT', 300)
+
+
+def _version_key(project_id):
+    return f'membership:v:{project_id}'
+
+
+def _project_version(project_id):
+    # Seeded from the clock so an evicted version never comes back as a
+    # value that older entries were stored under.
+    return cache.get_or_set(_version_key(project_id), lambda: time.time_ns(), None)
+
+
+def _query(project_id, user_id):
+    through = Project.members.through
+    return Project.objects.using(DEFAULT_DB_ALIAS).filter(pk=project_id).filter(
+        Q(owner_id=user_id)
+        | Exists(through.objects.filter(project_id=OuterRef('pk'), user_id=user_id))
+        | Exists(membership.objects.filter(project_id=OuterRef('pk'), user_id=user_id))
+    ).exists()
+
+
+def is_project_member(user, project):
+    """True if ``user`` owns ``project`` or belongs to it through either membership table."""
+    if not user or not user.is_authenticated:
+        return False
+    project_id = project.pk if isinstance(project, Project) else project
+    if isinstance(project, Project) and project.owner_id == user.pk:
+        return True
+
+    local_key = (project_id, user.pk)
+    result = _local.get(local_key)
+    if result is not MISSING:
+        return result
+
+    shared_key = f'membership:{project_id}:{_project_version(project_id)}:{user.pk}'
+    result = cache.get(shared_key)
+    if result is None:
+        result = _query(project_id, user.pk)
+        cache.set(shared_key, result, SHARED_TIMEOUT)
+    _local.set(local_key, result)
+    return result
+
+
+def _invalidate(project_id):
+    _local.delete_where(lambda key: key[0] == project_id)
+    try:
+        cache.incr(_version_key(project_id))
+    except ValueError:
+        pass
+
+
+def invalidate_project(project_id):
+    """Drop cached answers for ``project_id`` now and again once the transaction commits."""
+    _invalidate(project_id)
+    # The second pass covers readers that re-cached the old answer between
+    # the write and the commit.
+    transaction.on_commit(lambda: _invalidate(project_id))
@@ -0,0 +1,78 @@
+"""
+``@username`` mentions in comments.
+
+When a comment is written its mentions are parsed out, resolved to members of
+the task's project with one query, and the comment's ``Mention`` rows are
+brought in line with them. Each row sits in the mentioned user's inbox
+(``mention_inbox_idx``), so reading it never touches comment text.
+"""
+import re
+
+from django.db.models import Exists, OuterRef, Q
+
+from .models import Comment, Mention, Project, Task, User, membership
+
+# Django usernames are letters, digits and @.+-_; a trailing '.' ends a sentence.
+MENTION = re.compile(r'(?<![\w@.+-])@([\w.@+-]+)')
+MAX_MENTIONS = 50
+
+
+def extract(content):
+    """The distinct usernames mentioned in ``content``, in order of appearance."""
+    names = []
+    for match in MENTION.finditer(content):
+        name = match.group(1).rstrip('.')
+        if name and name not in names:
+            names.append(name)
+    return names[:MAX_MENTIONS]
+
+
+def resolve(names, project_id):
+    """Ids of the users called ``names`` who own or belong to the project, in one query."""
+    if not names:
+        return set()
+    through = Project.members.through
+    return set(
+        User.objects.filter(username__in=names).filter(
+            Q(Exists(Project.objects.filter(pk=project_id, owner=OuterRef('pk'))))
+            | Q(Exists(through.objects.filter(project_id=project_id, user=OuterRef('pk'))))
+            | Q(Exists(membership.objects.filter(project_id=project_id, user=OuterRef('pk'))))
+        ).values_list('pk', flat=True)
+    )
+
+
+def prepare(comment):
+    """``pre_save``: note whether the comment's mentions need looking at again."""
+    loaded = getattr(comment, '_loaded_values', {})
+    comment._mentions_stale = (
+        comment.pk is None
+        or loaded.get('content') != comment.content
+        or loaded.get('task_id') != comment.task_id
+    )
+
+
+def sync(comment, created):
+    """``post_save``: match the comment's mentions to its content; returns the user ids added."""
+    if not getattr(comment, '_mentions_stale', True):
+        return set()
+    comment._mentions_stale = False
+    names = extract(comment.content)
+    if created and not names:
+        return set()
+    if Comment.task.is_cached(comment):
+        project_id = comment.task.project_id
+    else:
+        project_id = Task.objects.filter(pk=comment.task_id).values_list('project_id', flat=True).first()
+    wanted = resolve(names, project_id) - {comment.author_id}
+    existing = set()
+    if not created:
+        existing = set(Mention.objects.filter(comment=comment).values_list('user_id', flat=True))
+        if existing - wanted:
+            Mention.objects.filter(comment=comment, user_id__in=existing - wanted).delete()
+        Mention.objects.filter(comment=comment).exclude(task_id=comment.task_id).update(task_id=comment.task_id)
+    added = wanted - existing
+    Mention.objects.bulk_create([
+        Mention(user_id=user_id, comment=comment, task_id=comment.task_id, created_at=comment.created_at)
+        for user_id in added
+    ])
+    return added
@@ -0,0 +1,257 @@
+"""
+Request instrumentation exported in the Prometheus text format.
+
+``MetricsMiddleware`` times each request and, through a database execute
+wrapper installed on every connection, counts its SQL queries and their time;
+``TimedSerializerMixin`` adds the time spent producing serializer ``.data``.
+Series are labelled by URL name (e.g. ``tasks-list``), never by raw path.
+Requests slower than ``METRICS_SLOW_REQUEST_MS`` are logged to
+``core.metrics`` with their slowest queries.
+
+Values live in the memory of each process; with several workers every scrape
+sees the worker that answered it.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+# Queries kept per request for the slow-request log.
+MAX_LOGGED_QUERIES = 20
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_current = ContextVar('request_stats', default=None)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labelnames):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name + _labels(self.labelnames, labels), value) for labels, value in sorted(self._values.items())]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labelnames, buckets):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [0] * len(self.buckets) + [0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in sorted(self._values.items())]
+        samples = []
+        for labels, series in items:
+            for bound, count in zip(self.buckets, series):
+                samples.append((f'{self.name}_bucket' + _labels(self.labelnames, labels, [('le', bound)]), count))
+            samples.append((f'{self.name}_bucket' + _labels(self.labelnames, labels, [('le', '+Inf')]), series[-1]))
+            samples.append((f'{self.name}_sum' + _labels(self.labelnames, labels), round(series[-2], 6)))
+            samples.append((f'{self.name}_count' + _labels(self.labelnames, labels), series[-1]))
+        return samples
+
+
+REQUESTS = Counter('http_requests_total', 'Requests by view, method and status.', ('view', 'method', 'status'))
+LATENCY = Histogram('http_request_duration_seconds', 'Time to produce the response.', ('view', 'method'), LATENCY_BUCKETS)
+DB_QUERIES = Histogram('http_request_db_queries', 'SQL queries per request.', ('view', 'method'), QUERY_BUCKETS)
+DB_TIME = Histogram('http_request_db_seconds', 'Time spent in SQL per request.', ('view', 'method'), LATENCY_BUCKETS)
+SERIALIZER_TIME = Histogram(
+    'http_request_serializer_seconds', 'Time spent producing serializer data per request.', ('view', 'method'),
+    LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size (streaming responses excluded).', ('view', 'method'), SIZE_BUCKETS,
+)
+REGISTRY = [REQUESTS, LATENCY, DB_QUERIES, DB_TIME, SERIALIZER_TIME, RESPONSE_SIZE]
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(f'{name} {value}' for name, value in metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds', 'serializer_seconds', 'slow_queries')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.slow_queries = []
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_seconds += duration
+        self.slow_queries.append((duration, sql))
+        if len(self.slow_queries) > MAX_LOGGED_QUERIES * 2:
+            self.slow_queries.sort(reverse=True)
+            del self.slow_queries[MAX_LOGGED_QUERIES:]
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current request's stats."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """``connection_created`` receiver; contextvars carry the stats into ``sync_to_async`` threads."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed_serialization():
+    stats = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.serializer_seconds += time.perf_counter() - start
+
+
+class TimedDataMixin:
+    @property
+    def data(self):
+        with timed_serialization():
+            return super().data
+
+
+class TimedListSerializer(TimedDataMixin, serializers.ListSerializer):
+    pass
+
+
+class TimedSerializerMixin(TimedDataMixin):
+    """
+    Counts the time spent in ``.data`` towards the request's serializer time.
+    Pair it with ``list_serializer_class = TimedListSerializer`` in ``Meta``.
+    """
+
+
+def _finish(request, response, stats, elapsed):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match else 'unmatched'
+    labels = (view, request.method)
+    REQUESTS.inc((view, request.method, response.status_code))
+    LATENCY.observe(labels, elapsed)
+    DB_QUERIES.observe(labels, stats.queries)
+    DB_TIME.observe(labels, stats.db_seconds)
+    SERIALIZER_TIME.observe(labels, stats.serializer_seconds)
+    if not response.streaming:
+        RESPONSE_SIZE.observe(labels, len(response.content))
+
+    threshold = getattr(settings, 'METRICS_SLOW_REQUEST_MS', 500)
+    if threshold is not None and elapsed * 1000 >= threshold:
+        slowest = sorted(stats.slow_queries, reverse=True)[:MAX_LOGGED_QUERIES]
+        logger.warning(
+            "Slow request %s %s (%s): %.1fms, %d queries in %.1fms, serializer %.1fms\n%s",
+            request.method, request.get_full_path(), view, elapsed * 1000,
+            stats.queries, stats.db_seconds * 1000, stats.serializer_seconds * 1000,
+            '\n'.join(f'  {duration * 1000:.1f}ms  {sql}' for duration, sql in slowest),
+        )
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        _finish(request, response, stats, time.perf_counter() - start)
+        return response
+
+
+def metrics_view(request):
+    """``GET /metrics``; requires ``Authorization: Bearer <METRICS_TOKEN>`` when that setting is set."""
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(render(), content_type=CONTENT_TYPE)
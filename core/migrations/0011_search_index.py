@@ -0,0 +1,83 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE core_searchentry_fts USING fts5("
+    "body, content='core_searchentry', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER core_searchentry_ai AFTER INSERT ON core_searchentry BEGIN "
+    "INSERT INTO core_searchentry_fts(rowid, body) VALUES (new.id, new.body); END",
+    "CREATE TRIGGER core_searchentry_ad AFTER DELETE ON core_searchentry BEGIN "
+    "INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, body) VALUES ('delete', old.id, old.body); END",
+    "CREATE TRIGGER core_searchentry_au AFTER UPDATE ON core_searchentry BEGIN "
+    "INSERT INTO core_searchentry_fts(core_searchentry_fts, rowid, body) VALUES ('delete', old.id, old.body); "
+    "INSERT INTO core_searchentry_fts(rowid, body) VALUES (new.id, new.body); END",
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS core_searchentry_au",
+    "DROP TRIGGER IF EXISTS core_searchentry_ad",
+    "DROP TRIGGER IF EXISTS core_searchentry_ai",
+    "DROP TABLE IF EXISTS core_searchentry_fts",
+]
+POSTGRES_FORWARD = [
+    "CREATE INDEX core_searchentry_body_gin ON core_searchentry USING GIN (to_tsvector('simple', body))",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS core_searchentry_body_gin",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+def backfill(apps, schema_editor):
+    SearchEntry = apps.get_model('core', 'SearchEntry')
+    Project = apps.get_model('core', 'Project')
+    Task = apps.get_model('core', 'Task')
+    Comment = apps.get_model('core', 'Comment')
+    sources = [
+        ('project', Project.objects.values_list('id', 'id', 'name', 'description')),
+        ('task', Task.objects.values_list('id', 'project_id', 'title', 'description')),
+        ('comment', Comment.objects.values_list('id', 'task__project_id', 'content')),
+    ]
+    for kind, rows in sources:
+        SearchEntry.objects.bulk_create(
+            (
+                SearchEntry(kind=kind, object_id=row[0], project_id=row[1], body='\n'.join(filter(None, row[2:])))
+                for row in rows.iterator()
+            ),
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_otp_store'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('task', 'Task'), ('project', 'Project'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('body', models.TextField()),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_kind_object_uniq')],
+            },
+        ),
+        migrations.RunPython(
+            _run({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRES_FORWARD}),
+            _run({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRES_BACKWARD}),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
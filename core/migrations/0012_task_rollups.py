@@ -0,0 +1,44 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill(apps, schema_editor):
+    Task = apps.get_model('core', 'Task')
+    TaskRollup = apps.get_model('core', 'TaskRollup')
+    cells = (
+        Task.objects.values('project_id', 'assignee_id', 'status', 'priority')
+        .annotate(tasks=Count('id', distinct=True), comments=Count('comments'))
+        .order_by()
+    )
+    TaskRollup.objects.bulk_create((TaskRollup(**cell) for cell in cells.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('todo', 'To Do'), ('in_progress', 'In Progress'), ('done', 'Done')], max_length=20)),
+                ('priority', models.IntegerField(choices=[(1, 'High'), (2, 'Medium'), (3, 'Low')])),
+                ('tasks', models.IntegerField(default=0)),
+                ('comments', models.IntegerField(default=0)),
+                ('assignee', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['assignee', 'project'], name='taskrollup_assignee_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('assignee__isnull', False)), fields=('project', 'assignee', 'status', 'priority'), name='taskrollup_cell_uniq'), models.UniqueConstraint(condition=models.Q(('assignee__isnull', True)), fields=('project', 'status', 'priority'), name='taskrollup_unassigned_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
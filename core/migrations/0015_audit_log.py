@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:43
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_project_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('model', models.CharField(choices=[('project', 'Project'), ('task', 'Task'), ('comment', 'Comment'), ('membership', 'Membership')], max_length=12)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=10)),
+                ('changes', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('actor', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('project', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='core.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'created_at'], name='auditlog_project_idx'), models.Index(fields=['actor', 'created_at'], name='auditlog_actor_idx'), models.Index(fields=['created_at', 'id'], name='auditlog_created_id_idx'), models.Index(fields=['period'], name='auditlog_period_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_audit_log'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='open_blockers',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subtasks', to='core.task'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.CreateModel(
+            name='TaskDependency',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('blocker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependent_edges', to='core.task')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dependency_edges', to='core.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['blocker', 'task'], name='taskdependency_blocker_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task', 'blocker'), name='taskdependency_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskDependencyClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('paths', models.PositiveBigIntegerField()),
+                ('blocker', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.task')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['blocker', 'task'], name='taskdepclosure_blocker_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task', 'blocker'), name='taskdependencyclosure_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill(apps, schema_editor):
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    Task = apps.get_model('core', 'Task')
+    TaskTag = apps.get_model('core', 'TaskTag')
+    content_type = ContentType.objects.filter(app_label='core', model='task').first()
+    if content_type is None:
+        return
+    items = TaggedItem.objects.filter(
+        content_type=content_type, object_id__in=Task.objects.values('pk'),
+    ).annotate(
+        project_id=Subquery(Task.objects.filter(pk=OuterRef('object_id')).values('project_id')[:1]),
+    ).values_list('project_id', 'tag_id', 'object_id')
+    TaskTag.objects.bulk_create(
+        (TaskTag(project_id=project_id, tag_id=tag_id, task_id=task_id)
+         for project_id, tag_id, task_id in items.iterator(chunk_size=1000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0020_comment_threads_mentions'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.project')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='taggit.tag')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project', 'tag', 'task'], name='tasktag_project_idx'), models.Index(fields=['tag', 'task'], name='tasktag_tag_idx')],
+                'constraints': [models.UniqueConstraint(fields=('task', 'tag'), name='tasktag_unique')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
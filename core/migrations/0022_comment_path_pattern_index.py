@@ -0,0 +1,28 @@
+from django.db import migrations
+
+# comment_task_path_idx compares paths in the database collation, which can't
+# answer ``path LIKE 'prefix%'`` unless it is "C"; varchar_pattern_ops can.
+POSTGRES_FORWARD = [
+    "CREATE INDEX comment_task_path_like_idx ON core_comment (task_id, path varchar_pattern_ops)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS comment_task_path_like_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_task_tag_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run({'postgresql': POSTGRES_FORWARD}), _run({'postgresql': POSTGRES_BACKWARD})),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_comment_path_pattern_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='task',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1024),
+        ),
+    ]
@@ -1,6 +1,8 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from taggit.managers import TaggableManager
+from taggit.models import Tag
 from django.utils.timezone import now
 from datetime import timedelta
 from django.contrib.auth import get_user_model
@@ -16,7 +18,17 @@ class User(AbstractUser):
 
 # core/models.py
 
-class Project(models.Model):
+class LoadedValuesMixin:
+    """Keeps the column values an instance was loaded with, so core.audit can diff a save against them."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+
+class Project(LoadedValuesMixin, models.Model):
     STATUS_CHOICES = [
         ('planning', 'Planning'),
         ('in_progress', 'In Progress'),
@@ -31,11 +43,15 @@ class Project(models.Model):
     members = models.ManyToManyField(User, related_name='projects')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='planning')
     created_at = models.DateTimeField(auto_now_add=True)
-    
+    # Bumped in the database on every write to the project or anything in it
+    # (core.etags); saves write it as version + 1, never a value the instance
+    # holds, which may be stale.
+    version = models.PositiveBigIntegerField(default=0, editable=False)
+
     def __str__(self):
         return self.name
 
-class Task(models.Model):
+class Task(LoadedValuesMixin, models.Model):
     STATUS_CHOICES = [
         ('todo', 'To Do'),
         ('in_progress', 'In Progress'),
@@ -54,26 +70,162 @@ class Task(models.Model):
     priority = models.IntegerField(choices=PRIORITY_CHOICES, default=3)
     due_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bulk writes set it themselves; the reminder scheduler polls it.
+    updated_at = models.DateTimeField(auto_now=True)
     tags = TaggableManager(blank=True)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='subtasks')
+    # Ids of the ancestors, root first, each followed by '/' ('' for a
+    # top-level task); a subtree is one prefix range. Kept by core.hierarchy.
+    # The length caps nesting: about 146 levels while ids have six digits.
+    path = models.CharField(max_length=1024, default='', blank=True, editable=False, db_index=True)
+    # Direct blockers not yet done (core.hierarchy).
+    open_blockers = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination orders by each of these followed by id.
+            models.Index(fields=['created_at', 'id'], name='task_created_id_idx'),
+            models.Index(fields=['due_date', 'id'], name='task_due_id_idx'),
+            models.Index(fields=['priority', 'id'], name='task_priority_id_idx'),
+            # TaskFilter combinations, almost always scoped to one project;
+            # project and status are the leading columns of task_board_idx.
+            models.Index(fields=['project', 'priority'], name='task_project_priority_idx'),
+            models.Index(fields=['assignee', 'status'], name='task_assignee_status_idx'),
+            # Changes since the reminder scheduler last looked (core.reminders).
+            models.Index(fields=['updated_at', 'id'], name='task_updated_id_idx'),
+            # Timeline bars in start order (core.timeline).
+            models.Index(fields=['project', 'created_at', 'id'], name='task_project_created_idx'),
+            # Board columns, in card order (core.board).
+            models.Index(fields=['project', 'status', 'priority', 'due_date', 'id'], name='task_board_idx'),
+            models.Index(
+                fields=['project', 'due_date'], name='task_project_due_idx',
+                condition=models.Q(due_date__isnull=False),
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
-class Comment(models.Model):
+class TaskDependency(models.Model):
+    """``task`` can't be done before ``blocker``; both are in the same project."""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='dependency_edges')
+    blocker = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='dependent_edges')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'blocker'], name='taskdependency_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['blocker', 'task'], name='taskdependency_blocker_idx'),
+        ]
+
+
+class TaskDependencyClosure(models.Model):
+    """
+    Transitive closure of ``TaskDependency``: ``task`` waits on ``blocker``
+    through ``paths`` distinct chains of dependencies. Derived by core.hierarchy.
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+')
+    blocker = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+')
+    paths = models.PositiveBigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'blocker'], name='taskdependencyclosure_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['blocker', 'task'], name='taskdepclosure_blocker_idx'),
+        ]
+
+
+class TaskTag(models.Model):
+    """
+    ``task`` is tagged ``tag``, filed under the task's project: ``Task.tags``
+    without taggit's generic relation. Derived by core.tagindex.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='+')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'tag'], name='tasktag_unique'),
+        ]
+        indexes = [
+            # Tag filters and tag counts, within a project.
+            models.Index(fields=['project', 'tag', 'task'], name='tasktag_project_idx'),
+            # Tag filters across projects.
+            models.Index(fields=['tag', 'task'], name='tasktag_tag_idx'),
+        ]
+
+
+class SentReminder(models.Model):
+    """A due-date reminder already delivered for one due date of a task (core.reminders)."""
+    KIND_CHOICES = [
+        ('upcoming', 'Due soon'),
+        ('overdue', 'Overdue'),
+    ]
+
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    due_date = models.DateTimeField()
+    sent_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['task', 'kind', 'due_date'], name='sentreminder_unique'),
+        ]
+
+
+class Comment(LoadedValuesMixin, models.Model):
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    # Zero-padded ids of the thread from its root down to this comment, each
+    # followed by '/', so ordering by path is display order. Kept by core.threads.
+    path = models.CharField(max_length=255, default='', blank=True, editable=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='comment_created_id_idx'),
+            models.Index(fields=['task', 'created_at', 'id'], name='comment_task_created_id_idx'),
+            # A task's threads in display order; one thread is a prefix range.
+            models.Index(fields=['task', 'path'], name='comment_task_path_idx'),
+        ]
 
-class membership(models.Model):
+
+class Mention(models.Model):
+    """An ``@username`` in a comment, in the mentioned user's inbox (core.mentions)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='mentions')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='mentions')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+    read_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['comment', 'user'], name='mention_unique'),
+        ]
+        indexes = [
+            # The inbox, newest first.
+            models.Index(fields=['user', 'created_at', 'id'], name='mention_inbox_idx'),
+        ]
+
+
+class membership(LoadedValuesMixin, models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     role = models.CharField(max_length=50, default='member')
     joined_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ('user', 'project')  
+        unique_together = ('user', 'project')
+        indexes = [
+            models.Index(fields=['joined_at', 'id'], name='membership_joined_id_idx'),
+        ]
 
 User = get_user_model()
 
@@ -82,6 +234,14 @@ class OTP(models.Model):
     code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField()
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Verification reads the user's newest code; purging walks expiry.
+            models.Index(fields=['user', '-created_at'], name='otp_user_created_idx'),
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
 
     def is_valid(self):
         return now() < self.expires_at
@@ -89,3 +249,167 @@ class OTP(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.code}"
 
+
+
+class OutboundEmail(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    recipient = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], name='outbox_pending_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient} - {self.subject} ({self.status})"
+
+
+class SearchEntry(models.Model):
+    """
+    One row of searchable text per task, project or comment (see core.search).
+
+    On SQLite an FTS5 table mirrors ``body`` through triggers and on PostgreSQL
+    a GIN index covers ``to_tsvector('simple', body)``; both are created in
+    migration 0011. SQLite rebuilds a table when it is altered, which drops its
+    triggers, so schema changes here must recreate them.
+    """
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('project', 'Project'),
+        ('comment', 'Comment'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    body = models.TextField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchentry_kind_object_uniq'),
+        ]
+
+
+class TaskRollup(models.Model):
+    """
+    Task and comment counts for one (project, assignee, status, priority)
+    cell, kept current by the signal handlers in core.signals (see
+    core.rollups). Dashboards sum a handful of these rows instead of scanning
+    tasks; ``manage.py rebuild_task_rollups`` repairs drift.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='+')
+    assignee = models.ForeignKey(User, on_delete=models.CASCADE, null=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Task.STATUS_CHOICES)
+    priority = models.IntegerField(choices=Task.PRIORITY_CHOICES)
+    tasks = models.IntegerField(default=0)
+    comments = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project', 'assignee', 'status', 'priority'], name='taskrollup_cell_uniq',
+                condition=models.Q(assignee__isnull=False),
+            ),
+            models.UniqueConstraint(
+                fields=['project', 'status', 'priority'], name='taskrollup_unassigned_uniq',
+                condition=models.Q(assignee__isnull=True),
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['assignee', 'project'], name='taskrollup_assignee_idx'),
+        ]
+
+
+class ProjectEvent(models.Model):
+    """
+    Change feed of a project's tasks and comments, written by core.signals in
+    the same transaction as the change and streamed by the SSE endpoint (see
+    core.events). The id doubles as the SSE event id clients resume from.
+    """
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    KIND_CHOICES = [
+        ('task', 'Task'),
+        ('comment', 'Comment'),
+    ]
+
+    # No database constraint: a project's cascade deletes tasks and comments,
+    # recording events, after its own events would have been removed.
+    project = models.ForeignKey(
+        Project, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    object_id = models.BigIntegerField()
+    payload = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'id'], name='projectevent_project_id_idx'),
+            models.Index(fields=['created_at'], name='projectevent_created_idx'),
+        ]
+
+
+class AuditLog(models.Model):
+    """
+    Who changed what on projects, tasks, comments and memberships, one row per
+    save or delete with only the changed fields (see core.audit). ``period``
+    (YYYYMM of ``created_at``) is the partition key: time-range queries are
+    bounded by it and retention drops whole periods.
+    """
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+    MODEL_CHOICES = [
+        ('project', 'Project'),
+        ('task', 'Task'),
+        ('comment', 'Comment'),
+        ('membership', 'Membership'),
+    ]
+
+    period = models.PositiveIntegerField()
+    created_at = models.DateTimeField()
+    # No database constraints: the trail outlives the users and projects it names.
+    actor = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+',
+    )
+    project = models.ForeignKey(
+        Project, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    model = models.CharField(max_length=12, choices=MODEL_CHOICES)
+    object_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # {field: [old, new]}; old is null on create, new is null on delete.
+    changes = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project', 'created_at'], name='auditlog_project_idx'),
+            models.Index(fields=['actor', 'created_at'], name='auditlog_actor_idx'),
+            # Newest-first listing and time ranges; retention deletes by period.
+            models.Index(fields=['created_at', 'id'], name='auditlog_created_id_idx'),
+            models.Index(fields=['period'], name='auditlog_period_idx'),
+        ]
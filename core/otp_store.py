@@ -0,0 +1,146 @@
+"""
+Storage backends for login one-time passwords.
+
+Only a user's most recent code is live: issuing a new one replaces the old,
+a successful verification consumes it, and too many wrong guesses burn it.
+Pick the backend with the ``OTP_STORE`` setting.
+"""
+import hmac
+import secrets
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from .models import OTP
+
+OTP_TTL = getattr(settings, 'OTP_TTL', 300)
+OTP_MAX_ATTEMPTS = getattr(settings, 'OTP_MAX_ATTEMPTS', 5)
+
+
+class OTPError(Exception):
+    pass
+
+
+def new_code():
+    return f'{secrets.randbelow(900000) + 100000}'
+
+
+class BaseOTPStore:
+    def issue(self, user):
+        """Store and return a fresh code for ``user``."""
+        raise NotImplementedError
+
+    def verify(self, user_id, code):
+        """Consume ``code`` or raise ``OTPError``."""
+        raise NotImplementedError
+
+    async def averify(self, user_id, code):
+        await sync_to_async(self.verify)(user_id, code)
+
+    def purge_expired(self, chunk_size=1000):
+        """Delete expired codes; returns how many were removed."""
+        return 0
+
+
+class CacheOTPStore(BaseOTPStore):
+    """
+    Codes live in the Django cache and expire with its native TTL, so nothing
+    accumulates. Needs a cache shared by every worker (not LocMemCache).
+    """
+
+    def _keys(self, user_id):
+        return f'otp:{user_id}', f'otp:{user_id}:attempts'
+
+    def issue(self, user):
+        code = new_code()
+        code_key, attempts_key = self._keys(user.pk)
+        cache.set_many({code_key: code, attempts_key: 0}, OTP_TTL)
+        return code
+
+    def verify(self, user_id, code):
+        code_key, attempts_key = self._keys(user_id)
+        stored = cache.get(code_key)
+        if stored is None:
+            raise OTPError("Invalid OTP")
+        if not hmac.compare_digest(stored, str(code)):
+            try:
+                attempts = cache.incr(attempts_key)
+            except ValueError:
+                attempts = OTP_MAX_ATTEMPTS
+            if attempts >= OTP_MAX_ATTEMPTS:
+                cache.delete_many([code_key, attempts_key])
+                raise OTPError("Too many attempts")
+            raise OTPError("Invalid OTP")
+        # Whoever deletes the key first wins; a concurrent replay gets False.
+        if not cache.delete(code_key):
+            raise OTPError("Invalid OTP")
+        cache.delete(attempts_key)
+
+
+class DatabaseOTPStore(BaseOTPStore):
+    """Codes are ``OTP`` rows; run ``manage.py purge_otps`` to clear expired ones."""
+
+    def issue(self, user):
+        code = new_code()
+        OTP.objects.filter(user=user).delete()
+        OTP.objects.create(user=user, code=code, expires_at=now() + timedelta(seconds=OTP_TTL))
+        return code
+
+    def _latest(self, user_id):
+        return OTP.objects.filter(user_id=user_id).order_by('-created_at')
+
+    def _matches(self, otp, code):
+        """Whether ``code`` is ``otp``'s; raises ``OTPError`` when there is no live code."""
+        if otp is None:
+            raise OTPError("Invalid OTP")
+        if not otp.is_valid():
+            raise OTPError("OTP expired")
+        return hmac.compare_digest(otp.code, str(code))
+
+    def _count_attempt(self, otp):
+        # Counted in the UPDATE itself: concurrent wrong guesses can't all
+        # read the same count and slip under the limit.
+        return OTP.objects.filter(pk=otp.pk, attempts__lt=OTP_MAX_ATTEMPTS - 1)
+
+    def verify(self, user_id, code):
+        otp = self._latest(user_id).first()
+        if not self._matches(otp, code):
+            if not self._count_attempt(otp).update(attempts=F('attempts') + 1):
+                OTP.objects.filter(pk=otp.pk).delete()
+                raise OTPError("Too many attempts")
+            raise OTPError("Invalid OTP")
+        deleted, _ = OTP.objects.filter(pk=otp.pk).delete()
+        if not deleted:
+            raise OTPError("Invalid OTP")
+
+    async def averify(self, user_id, code):
+        # ``verify`` on the async ORM: the same queries without a thread hop.
+        otp = await self._latest(user_id).afirst()
+        if not self._matches(otp, code):
+            if not await self._count_attempt(otp).aupdate(attempts=F('attempts') + 1):
+                await OTP.objects.filter(pk=otp.pk).adelete()
+                raise OTPError("Too many attempts")
+            raise OTPError("Invalid OTP")
+        deleted, _ = await OTP.objects.filter(pk=otp.pk).adelete()
+        if not deleted:
+            raise OTPError("Invalid OTP")
+
+    def purge_expired(self, chunk_size=1000):
+        total = 0
+        while True:
+            ids = list(
+                OTP.objects.filter(expires_at__lt=now())
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                return total
+            total += OTP.objects.filter(pk__in=ids).delete()[0]
+
+
+def get_otp_store():
+    return import_string(getattr(settings, 'OTP_STORE', 'core.otp_store.DatabaseOTPStore'))()
@@ -0,0 +1,128 @@
+"""
+Transactional email outbox.
+
+Request code calls ``enqueue_email`` inside its own transaction, so a message
+exists exactly when the data it talks about was committed, and returns without
+touching SMTP. ``manage.py deliver_outbox`` drains the table in batches.
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from .models import OutboundEmail
+
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 6)
+BACKOFF_BASE = getattr(settings, 'OUTBOX_BACKOFF_BASE', 30)
+BACKOFF_MAX = getattr(settings, 'OUTBOX_BACKOFF_MAX', 3600)
+# How long a claimed message is hidden from other workers.
+LEASE_SECONDS = getattr(settings, 'OUTBOX_LEASE_SECONDS', 300)
+
+
+def enqueue_email(subject, body, recipient, from_email=None):
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        recipient=recipient,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def queue_depth():
+    """Messages still waiting for delivery, including ones backing off."""
+    return OutboundEmail.objects.filter(status='pending').count()
+
+
+def backoff(attempts):
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def claim_batch(size):
+    """
+    Lease up to ``size`` due messages to this worker. Rows another worker has
+    locked are skipped (SKIP LOCKED); where the backend can't skip locks, each
+    row is leased only if its ``next_attempt_at`` is still the one read, so
+    two workers never both claim it.
+    """
+    lease_until = now() + timedelta(seconds=LEASE_SECONDS)
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(status='pending', next_attempt_at__lte=now())
+        if connection.features.has_select_for_update_skip_locked:
+            batch = list(due.select_for_update(skip_locked=True).order_by('next_attempt_at')[:size])
+            OutboundEmail.objects.filter(pk__in=[m.pk for m in batch]).update(next_attempt_at=lease_until)
+        else:
+            batch = [
+                message for message in due.order_by('next_attempt_at')[:size]
+                if OutboundEmail.objects.filter(
+                    pk=message.pk, status='pending', next_attempt_at=message.next_attempt_at,
+                ).update(next_attempt_at=lease_until)
+            ]
+    for message in batch:
+        message.next_attempt_at = lease_until
+    return batch
+
+
+def _send_chunk(messages):
+    """Send ``messages`` over one SMTP connection; return ``{pk: error or None}``."""
+    results = {}
+    mail_connection = get_connection()
+    try:
+        mail_connection.open()
+        for message in messages:
+            email = EmailMessage(
+                message.subject, message.body, message.from_email or None,
+                [message.recipient], connection=mail_connection,
+            )
+            try:
+                email.send()
+                results[message.pk] = None
+            except Exception as exc:
+                results[message.pk] = repr(exc)
+    except Exception as exc:
+        for message in messages:
+            results.setdefault(message.pk, repr(exc))
+    finally:
+        mail_connection.close()
+    return results
+
+
+def deliver_batch(batch, workers=4):
+    """
+    Send a claimed batch across ``workers`` threads, each holding one mail
+    connection for its share, then record the outcome. Returns
+    ``(sent, retried, failed)`` counts.
+    """
+    if not batch:
+        return 0, 0, 0
+    chunks = [batch[i::workers] for i in range(workers) if batch[i::workers]]
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+        for chunk_results in pool.map(_send_chunk, chunks):
+            results.update(chunk_results)
+
+    sent, retried, failed = [], [], []
+    timestamp = now()
+    for message in batch:
+        error = results[message.pk]
+        if error is None:
+            message.status = 'sent'
+            message.sent_at = timestamp
+            sent.append(message)
+            continue
+        message.attempts += 1
+        message.last_error = error
+        if message.attempts >= MAX_ATTEMPTS:
+            message.status = 'failed'
+            failed.append(message)
+        else:
+            message.next_attempt_at = timestamp + backoff(message.attempts)
+            retried.append(message)
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'sent_at', 'attempts', 'last_error', 'next_attempt_at']
+    )
+    return len(sent), len(retried), len(failed)
@@ -0,0 +1,172 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+def parse_ordering(model, ordering):
+    """Turn ``['-due_date', 'id']`` into ``[(field, descending), ...]``."""
+    keys = []
+    for name in ordering:
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+        keys.append((field, descending))
+    return keys
+
+
+def keyset_order_by(keys, reverse=False):
+    """``order_by`` expressions for ``keys``; NULLs sort after every value."""
+    expressions = []
+    for field, descending in keys:
+        descending = descending != reverse
+        if not field.null:
+            expressions.append(f"{'-' if descending else ''}{field.attname}")
+            continue
+        nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+        expression = F(field.attname)
+        expressions.append(expression.desc(**nulls) if descending else expression.asc(**nulls))
+    return expressions
+
+
+def keyset_filter(keys, position, reverse=False):
+    """
+    Rows strictly after ``position`` in ``keyset_order_by(keys, reverse)`` order.
+
+    Expands the row comparison ``(a, b, c) > (x, y, z)`` into
+    ``a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)`` so it can be
+    answered from a composite index on ``keys``.
+    """
+    condition = Q(pk__in=[])
+    equal_so_far = Q()
+    for (field, descending), value in zip(keys, position):
+        name = field.attname
+        descending = descending != reverse
+        nulls_last = not reverse
+        if value is None:
+            after = None if nulls_last else Q(**{f'{name}__isnull': False})
+            equal = Q(**{f'{name}__isnull': True})
+        else:
+            after = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            if field.null and nulls_last:
+                after |= Q(**{f'{name}__isnull': True})
+            equal = Q(**{name: value})
+        if after is not None:
+            condition |= equal_so_far & after
+        equal_so_far &= equal
+    return condition
+
+
+def keyset_position(instance, keys):
+    return [getattr(instance, field.attname) for field, _ in keys]
+
+
+def _to_json(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def decode_position(keys, values):
+    if len(values) != len(keys):
+        raise ValueError('position does not match ordering')
+    try:
+        return [
+            None if value is None else field.to_python(value)
+            for (field, _), value in zip(keys, values)
+        ]
+    except ValidationError as exc:
+        raise ValueError(exc)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on the full composite ordering key.
+
+    DRF's ``CursorPagination`` positions on the first ordering column and
+    skips ties with an offset; here the cursor carries every column of the
+    ordering plus the primary key, so each page is a single index range scan
+    however deep the client has paged. The ordering comes from the view's
+    ``ordering`` default or an ``?ordering=`` value in ``ordering_fields``.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = 'id'
+    ordering_param = 'ordering'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.keys = parse_ordering(queryset.model, self.ordering)
+
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor['reverse'])
+        queryset = queryset.order_by(*keyset_order_by(self.keys, reverse))
+        if self.cursor:
+            queryset = queryset.filter(keyset_filter(self.keys, self.cursor['position'], reverse))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = self.cursor is not None, has_more
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(getattr(view, 'ordering', None) or [self.ordering])
+        allowed = getattr(view, 'ordering_fields', None) or []
+        requested = request.query_params.get(self.ordering_param)
+        if requested:
+            fields = [term.strip() for term in requested.split(',') if term.strip()]
+            if fields and all(term.lstrip('-') in allowed for term in fields):
+                ordering = fields
+        if not any(term.lstrip('-') in ('id', 'pk') for term in ordering):
+            # The primary key makes every position unique.
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        return tuple(ordering)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            if payload['o'] != list(self.ordering):
+                raise ValueError('cursor was issued for another ordering')
+            return {
+                'reverse': bool(payload.get('r')),
+                'position': decode_position(self.keys, payload['p']),
+            }
+        except (TypeError, ValueError, KeyError, FieldDoesNotExist):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse=False):
+        payload = {'o': list(self.ordering), 'p': [_to_json(value) for value in position]}
+        if reverse:
+            payload['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(keyset_position(self.page[-1], self.keys))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(keyset_position(self.page[0], self.keys), reverse=True)
@@ -1,12 +1,13 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 from rest_framework.exceptions import PermissionDenied
+from .membership import is_project_member
 
 
 class IsProjectOwnerOrAdmin(BasePermission):
     def has_object_permission(self, request, view, obj):
         
         if request.method in SAFE_METHODS:
-            return request.user == obj.owner or request.user in obj.members.all()
+            return is_project_member(request.user, obj)
        
         return request.user == obj.owner or request.user.is_staff
 
@@ -43,8 +44,4 @@ class IsProjectMemberForTaskComments(BasePermission):
         return request.user.is_authenticated
     
     def has_object_permission(self, request, view, obj):
-        project = obj.task.project
-        return (
-            request.user == project.owner or
-            request.user in project.members.all()
-        )
\ No newline at end of file
+        return is_project_member(request.user, obj.task.project_id)
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Due-date reminders for assignees, batched into one digest per person.
+
+Each open, assigned task with a due date gets an ``upcoming`` reminder
+``REMINDER_LEAD_HOURS`` before it is due and an ``overdue`` one when it is.
+``ReminderScheduler`` keeps the fire times of the next ``horizon`` in a heap:
+new stretches of time are loaded with a range scan of the ``due_date`` index
+as the clock advances, and tasks changed since the last look are read off the
+``updated_at`` index, so the table is never scanned whole. Heap entries are
+not removed when a task changes; the tasks behind due entries are re-read in
+one query when they fire and anything no longer true is dropped.
+
+Digests go out over one mail connection per tick, and delivered reminders are
+recorded in ``SentReminder`` so a restarted scheduler doesn't repeat them.
+The clock is injectable (``clock`` returns an aware datetime) for tests.
+"""
+import heapq
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils.timezone import now
+
+from .models import SentReminder, Task
+
+logger = logging.getLogger(__name__)
+
+LEAD = timedelta(hours=getattr(settings, 'REMINDER_LEAD_HOURS', 24))
+# Overdue reminders still owed when the scheduler starts are sent this far back.
+LOOKBACK = timedelta(days=getattr(settings, 'REMINDER_LOOKBACK_DAYS', 7))
+HORIZON = timedelta(hours=1)
+# Changes are re-read this far back, for transactions that committed after
+# a later ``updated_at`` had already been seen.
+CHANGE_SKEW = timedelta(seconds=60)
+RETRY_DELAY = timedelta(minutes=5)
+TASK_FIELDS = ('id', 'title', 'due_date', 'assignee_id', 'assignee__email', 'project__name')
+
+
+def _open(tasks):
+    return tasks.filter(assignee__isnull=False, due_date__isnull=False).exclude(status='done')
+
+
+def fire_times(due_date, lead=LEAD):
+    return {'upcoming': due_date - lead, 'overdue': due_date}
+
+
+def digest(email, reminders):
+    """One message listing ``reminders`` (``(kind, row)`` pairs), overdue first."""
+    lines = []
+    for kind, heading in (('overdue', 'Overdue'), ('upcoming', 'Due soon')):
+        rows = sorted((row for k, row in reminders if k == kind), key=lambda row: (row['due_date'], row['id']))
+        if rows:
+            lines.append(f'{heading}:')
+            lines.extend(
+                f"- {row['title']} ({row['project__name']}), due {row['due_date']:%Y-%m-%d %H:%M %Z}" for row in rows
+            )
+            lines.append('')
+    count = len(reminders)
+    subject = f"{count} task reminder{'s' if count != 1 else ''}"
+    return EmailMessage(subject, '\n'.join(lines), settings.DEFAULT_FROM_EMAIL, [email])
+
+
+class ReminderScheduler:
+    def __init__(self, clock=now, lead=LEAD, lookback=LOOKBACK, horizon=HORIZON):
+        self.clock = clock
+        self.lead = lead
+        self.horizon = horizon
+        self._heap = []
+        self._queued = set()
+        start = clock()
+        # Fire times before this are never scheduled; those in
+        # [_first, _loaded_until) are in the heap or already sent.
+        self._first = start - lookback
+        self._loaded_until = self._first
+        self._changes_since = start
+
+    def _push(self, rows, low, high):
+        """Queue the reminders of ``rows`` firing in ``[low, high)`` that weren't sent yet."""
+        candidates = [
+            (fire_at, row['id'], kind, row['due_date'])
+            for row in rows
+            for kind, fire_at in fire_times(row['due_date'], self.lead).items()
+            if low <= fire_at < high
+        ]
+        if not candidates:
+            return
+        sent = set(
+            SentReminder.objects.filter(task_id__in={entry[1] for entry in candidates})
+            .values_list('task_id', 'kind', 'due_date')
+        )
+        for entry in candidates:
+            key = entry[1:]
+            if key not in sent and key not in self._queued:
+                self._queued.add(key)
+                heapq.heappush(self._heap, entry)
+
+    def load(self, until):
+        """Schedule the reminders firing before ``until`` with one range scan over due dates."""
+        if until <= self._loaded_until:
+            return
+        low = self._loaded_until
+        # Either kind fires in [low, until) only for these due dates.
+        rows = _open(Task.objects.filter(due_date__gte=low, due_date__lt=until + self.lead))
+        self._push(rows.values('id', 'due_date'), low, until)
+        self._loaded_until = until
+
+    def refresh(self):
+        """Schedule the reminders of tasks changed since the last look."""
+        moment = self.clock()
+        changed = _open(Task.objects.filter(updated_at__gte=self._changes_since - CHANGE_SKEW))
+        self._push(changed.values('id', 'due_date'), self._first, self._loaded_until)
+        self._changes_since = moment
+
+    def due(self, moment):
+        """
+        Pop the entries firing by ``moment``; returns ``{email: [(kind, row), ...]}``
+        for those still true, and the entries behind it.
+        """
+        fired = []
+        while self._heap and self._heap[0][0] <= moment:
+            entry = heapq.heappop(self._heap)
+            self._queued.discard(entry[1:])
+            fired.append(entry)
+        if not fired:
+            return {}, []
+        current = _open(Task.objects.filter(pk__in={entry[1] for entry in fired})).values(*TASK_FIELDS)
+        rows = {row['id']: row for row in current}
+        digests, entries = {}, []
+        for entry in fired:
+            _, task_id, kind, due_date = entry
+            row = rows.get(task_id)
+            if row is None or row['due_date'] != due_date or not row['assignee__email']:
+                continue
+            if kind == 'upcoming' and due_date <= moment:
+                # Late start; the overdue reminder says more.
+                continue
+            digests.setdefault(row['assignee__email'], []).append((kind, row))
+            entries.append(entry)
+        return digests, entries
+
+    def tick(self):
+        """Load, refresh and send what is due; returns ``(digests, reminders)`` sent."""
+        moment = self.clock()
+        self.refresh()
+        self.load(moment + self.horizon)
+        digests, entries = self.due(moment)
+        if not digests:
+            return 0, 0
+        messages = [digest(email, reminders) for email, reminders in digests.items()]
+        try:
+            # One connection for every digest of the tick.
+            get_connection().send_messages(messages)
+        except Exception:
+            logger.exception("Sending %d reminder digests failed; retrying", len(messages))
+            retry_at = moment + RETRY_DELAY
+            for _, task_id, kind, due_date in entries:
+                self._queued.add((task_id, kind, due_date))
+                heapq.heappush(self._heap, (retry_at, task_id, kind, due_date))
+            return 0, 0
+        SentReminder.objects.bulk_create(
+            [SentReminder(task_id=task_id, kind=kind, due_date=due_date, sent_at=moment)
+             for _, task_id, kind, due_date in entries],
+            ignore_conflicts=True,
+        )
+        return len(messages), len(entries)
+
+    def next_fire(self):
+        """When the next queued reminder fires, or None."""
+        return self._heap[0][0] if self._heap else None
@@ -0,0 +1,171 @@
+"""
+Incrementally maintained task statistics.
+
+Every task is counted in one ``TaskRollup`` cell keyed by project, assignee,
+status and priority, together with its comments. Model signals move a task
+between cells as it changes and bulk writes recompute the projects they
+touched, so dashboards sum a few dozen rows however many tasks a project has.
+Overdue counts depend on the clock rather than on writes; they come from a
+count over the partial ``task_project_due_idx`` index instead.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils.timezone import now
+
+from .models import Comment, Task, TaskRollup
+
+CELL_FIELDS = ('project_id', 'assignee_id', 'status', 'priority')
+
+
+def cell_of(task):
+    return tuple(getattr(task, field) for field in CELL_FIELDS)
+
+
+def stored_cell(task_id):
+    """The cell of task ``task_id`` as saved in the database, or None."""
+    return Task.objects.filter(pk=task_id).values_list(*CELL_FIELDS).first()
+
+
+def _lookup(cell):
+    return dict(zip(CELL_FIELDS, cell))
+
+
+def bump(cell, tasks=0, comments=0):
+    """Add to the counts of ``cell``, creating it on first use."""
+    if not (tasks or comments):
+        return
+    rows = TaskRollup.objects.filter(**_lookup(cell))
+    changes = {'tasks': F('tasks') + tasks, 'comments': F('comments') + comments}
+    if rows.update(**changes):
+        return
+    if tasks < 0 or comments < 0:
+        # The cell went first, with its project; nothing left to subtract from.
+        return
+    try:
+        with transaction.atomic():
+            TaskRollup.objects.create(**_lookup(cell), tasks=tasks, comments=comments)
+    except IntegrityError:
+        rows.update(**changes)
+
+
+def move_task(task_id, old, new):
+    """Move a task, with its comments, from cell ``old`` (None if new) to ``new``."""
+    if old == new:
+        return
+    comments = Comment.objects.filter(task_id=task_id).count()
+    if old is not None:
+        bump(old, -1, -comments)
+    bump(new, 1, comments)
+
+
+def move_comment(old_task_id, new_task_id):
+    """Count a comment against ``new_task_id`` instead of ``old_task_id``; either may be None."""
+    for task_id, delta in ((old_task_id, -1), (new_task_id, 1)):
+        cell = stored_cell(task_id) if task_id is not None else None
+        if cell is not None:
+            bump(cell, comments=delta)
+
+
+def fold_assignee(user_id):
+    """Move a departing user's cells to unassigned, as SET_NULL does to their tasks."""
+    rows = TaskRollup.objects.filter(assignee_id=user_id)
+    for row in rows:
+        bump((row.project_id, None, row.status, row.priority), row.tasks, row.comments)
+    rows.delete()
+
+
+def _cells(tasks):
+    return (
+        tasks.values(*CELL_FIELDS)
+        .annotate(tasks=Count('id', distinct=True), comments=Count('comments'))
+        .order_by()
+    )
+
+
+def _scoped(project_ids):
+    tasks, rows = Task.objects.all(), TaskRollup.objects.all()
+    if project_ids is not None:
+        tasks = tasks.filter(project_id__in=project_ids)
+        rows = rows.filter(project_id__in=project_ids)
+    return tasks, rows
+
+
+def rebuild(project_ids=None):
+    """Recompute the cells of ``project_ids`` (every project when None) from the tasks."""
+    tasks, rows = _scoped(project_ids)
+    with transaction.atomic():
+        rows.delete()
+        TaskRollup.objects.bulk_create(
+            (TaskRollup(**cell) for cell in _cells(tasks).iterator()), batch_size=1000,
+        )
+
+
+def drift(project_ids=None):
+    """Ids of the projects whose stored cells disagree with their tasks."""
+    tasks, rows = _scoped(project_ids)
+    expected = {
+        tuple(cell[field] for field in CELL_FIELDS): (cell['tasks'], cell['comments'])
+        for cell in _cells(tasks).iterator()
+    }
+    stored = {}
+    for *cell, task_count, comment_count in rows.values_list(*CELL_FIELDS, 'tasks', 'comments'):
+        if task_count or comment_count:
+            stored[tuple(cell)] = (task_count, comment_count)
+    return sorted({
+        cell[0] for cell in expected.keys() | stored.keys()
+        if expected.get(cell) != stored.get(cell)
+    })
+
+
+def _summary(rows, overdue):
+    summary = {
+        'tasks': 0,
+        'open': 0,
+        'overdue': overdue,
+        'comments': 0,
+        'by_status': {status: 0 for status, _ in Task.STATUS_CHOICES},
+        'by_priority': {priority: 0 for priority, _ in Task.PRIORITY_CHOICES},
+    }
+    for _, status, priority, tasks, comments in rows:
+        summary['tasks'] += tasks
+        summary['comments'] += comments
+        summary['by_status'][status] += tasks
+        summary['by_priority'][priority] += tasks
+        if status != 'done':
+            summary['open'] += tasks
+    summary['comments_per_task'] = round(summary['comments'] / summary['tasks'], 2) if summary['tasks'] else 0
+    return summary
+
+
+def _breakdown(rows, key):
+    groups = {}
+    for group, status, _, tasks, _ in rows:
+        counts = groups.setdefault(group, {key: group, 'tasks': 0, 'open': 0})
+        counts['tasks'] += tasks
+        if status != 'done':
+            counts['open'] += tasks
+    return [counts for counts in groups.values() if counts['tasks']]
+
+
+def _overdue(tasks):
+    return tasks.filter(due_date__lt=now()).exclude(status='done').count()
+
+
+def project_stats(project_id):
+    rows = list(
+        TaskRollup.objects.filter(project_id=project_id)
+        .values_list('assignee_id', 'status', 'priority', 'tasks', 'comments')
+        .order_by('assignee_id')
+    )
+    summary = _summary(rows, _overdue(Task.objects.filter(project_id=project_id)))
+    return {'project': project_id, **summary, 'by_assignee': _breakdown(rows, 'assignee')}
+
+
+def workload(user_id):
+    rows = list(
+        TaskRollup.objects.filter(assignee_id=user_id)
+        .values_list('project_id', 'status', 'priority', 'tasks', 'comments')
+        .order_by('project_id')
+    )
+    summary = _summary(rows, _overdue(Task.objects.filter(assignee_id=user_id)))
+    return {'assignee': user_id, **summary, 'by_project': _breakdown(rows, 'project')}
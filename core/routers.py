@@ -0,0 +1,111 @@
+"""
+Read-replica routing with read-your-writes stickiness.
+
+Reads go to a replica only inside a GET/HEAD/OPTIONS request handled by
+``ReplicaRoutingMiddleware``, and only once authentication has identified a
+caller who is not pinned (``route_reads``); authentication itself and
+everything else (writes, transactions, commands, workers, streaming response
+bodies) use the primary. After an unsafe request the caller is pinned to the
+primary for ``REPLICA_PIN_SECONDS`` so the next reads see their own changes.
+"""
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing', default=None)
+
+
+class RoutingState:
+    __slots__ = ('replica',)
+
+    def __init__(self):
+        # Alias reads go to; None keeps them on the primary.
+        self.replica = None
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def _pin_key(user_id):
+    return f'dbpin:{user_id}'
+
+
+def pin(user_id):
+    cache.set(_pin_key(user_id), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id), False)
+
+
+def route_reads(user_id):
+    """Send the rest of the current safe request's reads to a replica unless ``user_id`` is pinned."""
+    state = _state.get()
+    if state is None or not replicas() or is_pinned(user_id):
+        return
+    state.replica = random.choice(replicas())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.replica is None:
+            return DEFAULT_DB_ALIAS
+        # Inside a transaction the primary holds writes the replica can't see yet.
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        aliases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = _state.set(RoutingState() if request.method in SAFE_METHODS else None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        self._finish(request)
+        return response
+
+    async def __acall__(self, request):
+        token = _state.set(RoutingState() if request.method in SAFE_METHODS else None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        self._finish(request)
+        return response
+
+    def _finish(self, request):
+        # DRF copies the user it authenticated onto the Django request.
+        user = getattr(request, 'user', None)
+        if request.method not in SAFE_METHODS and replicas() and user is not None and user.is_authenticated:
+            pin(user.pk)
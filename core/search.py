@@ -0,0 +1,179 @@
+"""
+Full-text search over tasks, projects and comments.
+
+``SearchEntry`` holds one row of text per object and is kept current by the
+signal handlers in core.signals. Matching uses SQLite FTS5 or PostgreSQL
+``tsvector`` with a GIN index, depending on the database; other databases fall
+back to ``icontains``. Every query term is prefix-matched.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Comment, Project, SearchEntry, Task, membership
+
+TERM_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TERMS = 8
+
+
+def _body(*parts):
+    return '\n'.join(part for part in parts if part)
+
+
+def entry_for(kind, obj):
+    if kind == 'task':
+        return SearchEntry(kind=kind, object_id=obj.pk, project_id=obj.project_id,
+                           body=_body(obj.title, obj.description))
+    if kind == 'project':
+        return SearchEntry(kind=kind, object_id=obj.pk, project_id=obj.pk,
+                           body=_body(obj.name, obj.description))
+    return SearchEntry(kind=kind, object_id=obj.pk, project_id=obj.task.project_id,
+                       body=_body(obj.content))
+
+
+def index_objects(kind, objects):
+    SearchEntry.objects.bulk_create(
+        [entry_for(kind, obj) for obj in objects],
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['project', 'body'],
+        batch_size=1000,
+    )
+
+
+def unindex(kind, object_ids):
+    SearchEntry.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+def reindex_tasks(task_ids):
+    tasks = list(Task.objects.filter(pk__in=task_ids).only('id', 'project_id', 'title', 'description'))
+    index_objects('task', tasks)
+    for task in tasks:
+        sync_comment_projects(task)
+
+
+def sync_comment_projects(task):
+    """Keep the project of a task's comment entries in step when the task moves."""
+    SearchEntry.objects.filter(
+        kind='comment', object_id__in=task.comments.values('pk'),
+    ).exclude(project_id=task.project_id).update(project_id=task.project_id)
+
+
+def rebuild():
+    SearchEntry.objects.all().delete()
+    index_objects('project', Project.objects.only('id', 'name', 'description').iterator())
+    index_objects('task', Task.objects.only('id', 'project_id', 'title', 'description').iterator())
+    index_objects('comment', Comment.objects.select_related('task').only(
+        'id', 'content', 'task__project_id').iterator())
+
+
+def terms(text):
+    return TERM_RE.findall(text or '')[:MAX_TERMS]
+
+
+def _match_sql(text):
+    """``(sql, params)`` selecting ``id, kind, object_id, project_id, score`` of matching entries; lower scores rank first."""
+    words = terms(text)
+    if connection.vendor == 'sqlite':
+        # CROSS JOIN keeps the FTS table as the outer loop; with a plain JOIN
+        # SQLite may re-run the MATCH for every entry of the requested kind.
+        query = ' '.join('"%s"*' % word.replace('"', '') for word in words)
+        return (
+            "SELECT e.id, e.kind, e.object_id, e.project_id, bm25(core_searchentry_fts) AS score "
+            "FROM core_searchentry_fts CROSS JOIN core_searchentry e ON e.id = core_searchentry_fts.rowid "
+            "WHERE core_searchentry_fts MATCH %s",
+            [query],
+        )
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f'{word}:*' for word in words)
+        return (
+            "SELECT e.id, e.kind, e.object_id, e.project_id, "
+            "-ts_rank(to_tsvector('simple', e.body), to_tsquery('simple', %s)) AS score "
+            "FROM core_searchentry e "
+            "WHERE to_tsvector('simple', e.body) @@ to_tsquery('simple', %s)",
+            [query, query],
+        )
+    return None
+
+
+def matching_ids(kind, text):
+    """Expression usable as ``pk__in=`` selecting objects of ``kind`` that match ``text``."""
+    match = _match_sql(text)
+    if match is None:
+        entries = SearchEntry.objects.filter(kind=kind)
+        for word in terms(text):
+            entries = entries.filter(body__icontains=word)
+        return entries.values('object_id')
+    sql, params = match
+    return RawSQL(f"SELECT m.object_id FROM ({sql}) m WHERE m.kind = %s", params + [kind])
+
+
+def visible_project_ids(user):
+    if user.is_staff:
+        return None
+    return (
+        Project.objects.filter(
+            Q(owner=user) | Q(members=user)
+            | Q(pk__in=membership.objects.filter(user=user).values('project_id'))
+        ).values('pk')
+    )
+
+
+def search(user, text, kinds=None, limit=50):
+    """Best matches as ``[(kind, object_id, project_id), ...]`` in projects ``user`` can see."""
+    if not terms(text):
+        return []
+    kinds = list(kinds or [kind for kind, _ in SearchEntry.KIND_CHOICES])
+    visible = visible_project_ids(user)
+    match = _match_sql(text)
+    if match is None:
+        entries = SearchEntry.objects.filter(kind__in=kinds)
+        for word in terms(text):
+            entries = entries.filter(body__icontains=word)
+        if visible is not None:
+            entries = entries.filter(project_id__in=visible)
+        return list(entries.values_list('kind', 'object_id', 'project_id')[:limit])
+
+    sql, params = match
+    where = ["m.kind IN (%s)" % ', '.join(['%s'] * len(kinds))]
+    params = params + kinds
+    if visible is not None:
+        visible_sql, visible_params = visible.query.sql_with_params()
+        where.append(f"m.project_id IN ({visible_sql})")
+        params += list(visible_params)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT m.kind, m.object_id, m.project_id FROM ({sql}) m "
+            f"WHERE {' AND '.join(where)} ORDER BY m.score LIMIT %s",
+            params + [limit],
+        )
+        return cursor.fetchall()
+
+
+class FullTextSearchFilter(BaseFilterBackend):
+    """
+    ``?search=`` backed by the search index. Views opt in by naming their
+    ``search_kind``; the list keeps its own ordering.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        kind = getattr(view, 'search_kind', None)
+        text = request.query_params.get(self.search_param, '')
+        if not kind or not terms(text):
+            return queryset
+        return queryset.filter(pk__in=matching_ids(kind, text))
+
+    def get_schema_operation_parameters(self, view):
+        if not getattr(view, 'search_kind', None):
+            return []
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'Full-text search; every word is prefix-matched.',
+            'schema': {'type': 'string'},
+        }]
@@ -0,0 +1,142 @@
+"""
+Synthetic data at realistic scale, for benchmarks and local load testing.
+
+Rows are written with ``bulk_create``, which skips model signals, so the
+tables those signals maintain (search index, task rollups, tag index,
+comment thread paths) are filled in directly. Every seeded user's password is ``password``.
+"""
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.timezone import now
+from taggit.models import Tag, TaggedItem
+
+from . import rollups, search, tagindex, threads
+from .models import OTP, Comment, Project, Task, User, membership
+
+PASSWORD = 'password'
+WORDS = (
+    'api backend billing bug cache client deploy design docs export feature frontend '
+    'import index invoice login migration mobile onboarding payment performance release '
+    'report review search security signup sync test ui upgrade'
+).split()
+
+
+def _text(rng, count):
+    return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+
+def seed_dataset(users=100, projects=10, members=10, tasks=5000, tags=50, tags_per_task=2,
+                 comments=10000, otps=100, prefix='seed', random_seed=0, batch_size=1000):
+    """
+    Create the dataset and return the created objects by kind. ``members``
+    users join each project through both membership tables.
+    """
+    rng = random.Random(random_seed)
+    password = make_password(PASSWORD)
+    timestamp = now()
+
+    with transaction.atomic():
+        user_objs = User.objects.bulk_create(
+            (
+                User(username=f'{prefix}-user{i}', email=f'{prefix}-user{i}@example.com',
+                     phone_number='', password=password)
+                for i in range(users)
+            ),
+            batch_size=batch_size,
+        )
+        project_objs = Project.objects.bulk_create(
+            (
+                Project(name=f'{prefix} {_text(rng, 2)} {i}', description=_text(rng, 12),
+                        owner=rng.choice(user_objs), status=rng.choice(Project.STATUS_CHOICES)[0])
+                for i in range(projects)
+            ),
+            batch_size=batch_size,
+        )
+
+        project_members = {}
+        for project in project_objs:
+            chosen = {project.owner} | set(rng.sample(user_objs, min(members, len(user_objs))))
+            project_members[project.pk] = list(chosen)
+        Project.members.through.objects.bulk_create(
+            (
+                Project.members.through(project_id=project_id, user_id=user.pk)
+                for project_id, chosen in project_members.items() for user in chosen
+            ),
+            batch_size=batch_size,
+        )
+        membership.objects.bulk_create(
+            (
+                membership(project_id=project_id, user=user)
+                for project_id, chosen in project_members.items() for user in chosen
+            ),
+            batch_size=batch_size,
+        )
+
+        task_objs = []
+        for i in range(tasks):
+            project = rng.choice(project_objs)
+            due = rng.random()
+            task_objs.append(Task(
+                project=project,
+                title=f'{_text(rng, 3)} {i}',
+                description=_text(rng, 20),
+                assignee=rng.choice(project_members[project.pk]) if rng.random() < 0.9 else None,
+                status=rng.choice(Task.STATUS_CHOICES)[0],
+                priority=rng.choice(Task.PRIORITY_CHOICES)[0],
+                due_date=timestamp + timedelta(days=rng.randint(-30, 60)) if due < 0.7 else None,
+            ))
+        task_objs = Task.objects.bulk_create(task_objs, batch_size=batch_size)
+
+        tag_objs = Tag.objects.bulk_create(
+            (Tag(name=f'{prefix}-tag{i}', slug=f'{prefix}-tag{i}') for i in range(tags)),
+            batch_size=batch_size,
+        )
+        content_type = ContentType.objects.get_for_model(Task)
+        if tag_objs:
+            TaggedItem.objects.bulk_create(
+                (
+                    TaggedItem(tag=tag, content_type=content_type, object_id=task.pk)
+                    for task in task_objs
+                    for tag in rng.sample(tag_objs, min(tags_per_task, len(tag_objs)))
+                ),
+                batch_size=batch_size,
+            )
+
+        comment_objs = []
+        for _ in range(comments if task_objs else 0):
+            task = rng.choice(task_objs)
+            comment_objs.append(Comment(
+                task=task, author=rng.choice(project_members[task.project_id]), content=_text(rng, 15),
+            ))
+        comment_objs = Comment.objects.bulk_create(comment_objs, batch_size=batch_size)
+        for comment in comment_objs:
+            comment.path = threads.segment(comment.pk)
+        Comment.objects.bulk_update(comment_objs, ['path'], batch_size=batch_size)
+
+        otp_objs = OTP.objects.bulk_create(
+            (
+                OTP(user=user, code=f'{rng.randint(100000, 999999)}',
+                    expires_at=timestamp + timedelta(minutes=rng.randint(-60, 5)))
+                for user in rng.sample(user_objs, min(otps, len(user_objs)))
+            ),
+            batch_size=batch_size,
+        )
+
+        search.index_objects('project', project_objs)
+        search.index_objects('task', task_objs)
+        search.index_objects('comment', comment_objs)
+        rollups.rebuild([project.pk for project in project_objs])
+        tagindex.rebuild([project.pk for project in project_objs])
+
+    return {
+        'users': user_objs,
+        'projects': project_objs,
+        'tasks': task_objs,
+        'tags': tag_objs,
+        'comments': comment_objs,
+        'otps': otp_objs,
+    }
@@ -1,10 +1,13 @@
 from rest_framework import serializers
-from .models import Task, User, Project, Comment, membership, OTP
+from .models import Task, User, Project, Comment, Mention, membership, AuditLog
 from django.contrib.auth import get_user_model, authenticate
 from taggit.serializers import (TagListSerializerField, TaggitSerializer)
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.contrib.auth.password_validation import validate_password
 from .utils import generate_otp
+from .otp_store import get_otp_store, OTPError
+from .metrics import TimedListSerializer, TimedSerializerMixin
+from . import hierarchy, threads
 
 User = get_user_model()
 
@@ -28,12 +31,9 @@ class VerifyOTPSerializer(serializers.Serializer):
 
     def validate(self, data):
         try:
-            otp = OTP.objects.filter(user_id=data['user_id'], code=data['code']).latest('created_at')
-        except OTP.DoesNotExist:
-            raise serializers.ValidationError("Invalid OTP")
-
-        if not otp.is_valid():
-            raise serializers.ValidationError("OTP expired")
+            get_otp_store().verify(data['user_id'], data['code'])
+        except OTPError as exc:
+            raise serializers.ValidationError(str(exc))
 
         return data
 
@@ -70,45 +70,125 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
         return user
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = ['id', 'username', 'email', 'phone_number']
 
 
+def user_only_fields(prefix=''):
+    """Columns ``UserSerializer`` renders, for ``only()`` on related users."""
+    return [prefix + name for name in UserSerializer.Meta.fields]
+
+
+def user_deferred_fields(prefix=''):
+    """Columns ``UserSerializer`` never reads, for ``defer()`` through ``select_related``."""
+    return [
+        prefix + field.name
+        for field in User._meta.concrete_fields
+        if field.name not in UserSerializer.Meta.fields
+    ]
 
-class ProjectSerializer(serializers.ModelSerializer):
+
+
+class ProjectSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     owner = UserSerializer(read_only=True)
     members = UserSerializer(many=True, read_only=True)
 
     class Meta:
         model = Project
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
 
 
-class TaskSerializer(TaggitSerializer,serializers.ModelSerializer):
+class TaskSerializer(TimedSerializerMixin, TaggitSerializer,serializers.ModelSerializer):
     assignee = UserSerializer(read_only=True)
     tags = TagListSerializerField(required=False)
 
     class Meta:
         model = Task
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
 
+    def validate(self, attrs):
+        instance = self.instance
+        project = attrs.get('project')
+        if instance is not None and project is not None and project.pk != instance.project_id:
+            if instance.parent_id is not None or instance.subtasks.exists():
+                raise serializers.ValidationError({'project': "A task with a parent or subtasks can't change project."})
+            if hierarchy.has_dependencies(instance):
+                raise serializers.ValidationError({'project': "A task with dependencies can't change project."})
+        if attrs.get('parent') is not None:
+            task = Task(
+                pk=instance.pk if instance else None,
+                project_id=project.pk if project is not None else instance.project_id,
+                path=instance.path if instance else '',
+            )
+            try:
+                hierarchy.check_parent(task, attrs['parent'])
+                hierarchy.check_depth(task, hierarchy.prefix(attrs['parent']), instance.path if instance else None)
+            except hierarchy.HierarchyError as exc:
+                raise serializers.ValidationError({'parent': str(exc)})
+        return attrs
+
+
+class BulkTaskSerializer(TaskSerializer):
+    """Validates one item of a bulk write against projects resolved once per request."""
+    project = serializers.IntegerField()
+
+    class Meta(TaskSerializer.Meta):
+        # Bulk writes skip the signals that keep subtask paths.
+        read_only_fields = ['parent']
+
+    def validate_project(self, value):
+        project = self.context['projects'].get(value)
+        if project is None:
+            raise serializers.ValidationError("Only admins or the project owner can create tasks in this project.")
+        return project
 
-class CommentSerializer(serializers.ModelSerializer):
+
+class CommentSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
 
     class Meta:
         model = Comment
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
 
+    def validate(self, attrs):
+        instance = self.instance
+        task = attrs.get('task', instance.task if instance else None)
+        if instance is not None:
+            if 'parent' in attrs and attrs['parent'] != instance.parent:
+                raise serializers.ValidationError({'parent': "A comment can't move to another thread."})
+            if task.pk != instance.task_id and (instance.parent_id is not None or instance.replies.exists()):
+                raise serializers.ValidationError({'task': "A comment in a thread can't move to another task."})
+        elif attrs.get('parent') is not None:
+            try:
+                threads.check_parent(None, attrs['parent'], task.pk)
+            except threads.ThreadError as exc:
+                raise serializers.ValidationError({'parent': str(exc)})
+        return attrs
+
+
+class MentionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    author = serializers.CharField(source='comment.author.username', read_only=True)
+    content = serializers.CharField(source='comment.content', read_only=True)
 
-class MembershipSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Mention
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'comment', 'task', 'author', 'content', 'created_at', 'read_at']
+
+
+class MembershipSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
 
     class Meta:
         model = membership
+        list_serializer_class = TimedListSerializer
         fields = '__all__'
 
     def create(self, validated_data):
@@ -121,3 +201,11 @@ class MembershipSerializer(serializers.ModelSerializer):
             defaults={'role': validated_data.get('role', 'member')}
         )
         return membership_instance
+
+
+class AuditLogSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = AuditLog
+        list_serializer_class = TimedListSerializer
+        fields = ['id', 'created_at', 'actor', 'project', 'model', 'object_id', 'action', 'changes']
+        read_only_fields = fields
@@ -0,0 +1,329 @@
+from django.db.backends.signals import connection_created
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from . import audit, etags, events, hierarchy, mentions, metrics, rollups, search, tagindex, threads
+from .authentication import invalidate_user
+from .membership import invalidate_project
+from .models import Comment, Project, ProjectEvent, Task, User, membership
+
+# Sent after a bulk task write commits, in place of the per-row model signals
+# that bulk_create/bulk_update/update skip. Arguments: task_ids, project_ids,
+# fields (None when the tasks were created) and created.
+tasks_bulk_changed = Signal()
+
+connection_created.connect(metrics.install_query_recorder, dispatch_uid='core.metrics')
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def project_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_project(instance.pk)
+        return
+    # user.projects.<op>(): pk_set holds project ids, except for clear where
+    # they have to be read before the rows go away.
+    if action == 'pre_clear':
+        instance._cleared_project_ids = list(instance.projects.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        for project_id in getattr(instance, '_cleared_project_ids', ()):
+            invalidate_project(project_id)
+    elif action in ('post_add', 'post_remove'):
+        for project_id in pk_set or ():
+            invalidate_project(project_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=membership)
+@receiver(post_delete, sender=membership)
+def membership_changed(sender, instance, **kwargs):
+    invalidate_project(instance.project_id)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    # The owner may have changed; project writes are rare enough not to check.
+    if not created:
+        invalidate_project(instance.pk)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    invalidate_project(instance.pk)
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, **kwargs):
+    search.index_objects('project', [instance])
+
+
+@receiver(post_save, sender=Task)
+def index_task(sender, instance, created, **kwargs):
+    search.index_objects('task', [instance])
+    if not created:
+        search.sync_comment_projects(instance)
+
+
+@receiver(post_delete, sender=Task)
+def unindex_task(sender, instance, **kwargs):
+    search.unindex('task', [instance.pk])
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, **kwargs):
+    search.index_objects('comment', [instance])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_comment(sender, instance, **kwargs):
+    search.unindex('comment', [instance.pk])
+
+
+@receiver(tasks_bulk_changed)
+def reindex_bulk_tasks(sender, task_ids, fields, **kwargs):
+    if fields is None or {'title', 'description', 'project'} & set(fields):
+        search.reindex_tasks(task_ids)
+
+
+@receiver(pre_save, sender=Task)
+def remember_task_cell(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._rollup_cell = rollups.stored_cell(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def roll_up_task(sender, instance, created, **kwargs):
+    if created:
+        rollups.bump(rollups.cell_of(instance), tasks=1)
+    else:
+        rollups.move_task(instance.pk, getattr(instance, '_rollup_cell', None), rollups.cell_of(instance))
+
+
+@receiver(post_delete, sender=Task)
+def roll_down_task(sender, instance, **kwargs):
+    # Its comments were deleted, and counted out, just before it.
+    rollups.bump(rollups.cell_of(instance), tasks=-1)
+
+
+@receiver(pre_save, sender=Comment)
+def remember_comment_task(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance._rollup_task_id = (
+            Comment.objects.filter(pk=instance.pk).values_list('task_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Comment)
+def roll_up_comment(sender, instance, **kwargs):
+    rollups.move_comment(getattr(instance, '_rollup_task_id', None), instance.task_id)
+
+
+@receiver(post_delete, sender=Comment)
+def roll_down_comment(sender, instance, **kwargs):
+    rollups.move_comment(instance.task_id, None)
+
+
+@receiver(pre_delete, sender=User)
+def fold_assignee_rollups(sender, instance, **kwargs):
+    rollups.fold_assignee(instance.pk)
+
+
+@receiver(tasks_bulk_changed)
+def roll_up_bulk_tasks(sender, project_ids, fields, **kwargs):
+    if fields is None or {'project', 'assignee', 'assignee_id', 'status', 'priority'} & set(fields):
+        rollups.rebuild(project_ids)
+
+
+@receiver(pre_save, sender=Project)
+def bump_saved_project_version(sender, instance, update_fields, **kwargs):
+    if not instance._state.adding and (update_fields is None or 'version' in update_fields):
+        instance.version = F('version') + 1
+
+
+@receiver(post_save, sender=Project)
+def bump_project_version(sender, instance, created, update_fields, **kwargs):
+    if created:
+        return
+    if update_fields is not None and 'version' not in update_fields:
+        etags.bump_projects([instance.pk])
+    # Deferred, so the new value is only read if someone asks for it.
+    instance.__dict__.pop('version', None)
+
+
+@receiver(post_save, sender=membership)
+@receiver(post_delete, sender=membership)
+def bump_membership_version(sender, instance, **kwargs):
+    etags.bump_projects([instance.project_id])
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def bump_members_version(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        etags.bump_projects([instance.pk])
+    elif action == 'post_clear':
+        etags.bump_projects(getattr(instance, '_cleared_project_ids', ()))
+    else:
+        etags.bump_projects(pk_set or ())
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def bump_task_version(sender, instance, **kwargs):
+    # A task moved between projects changes both; the old one was read by remember_task_cell.
+    old = getattr(instance, '_rollup_cell', None)
+    etags.bump_projects([instance.project_id, old[0] if old else None])
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def bump_task_tags_version(sender, instance, action, reverse, **kwargs):
+    if not reverse and action in ('post_add', 'post_remove', 'post_clear'):
+        etags.bump_projects([instance.project_id])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_version(sender, instance, **kwargs):
+    etags.bump_task_projects([instance.task_id, getattr(instance, '_rollup_task_id', None)])
+
+
+@receiver(tasks_bulk_changed)
+def bump_bulk_tasks_version(sender, project_ids, **kwargs):
+    etags.bump_projects(project_ids)
+
+
+@receiver(post_save, sender=Task)
+def task_event(sender, instance, created, **kwargs):
+    old = getattr(instance, '_rollup_cell', None)
+    events.record(events.task_events(instance, created, old[0] if old else None))
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted_event(sender, instance, **kwargs):
+    events.record([events.event(instance.project_id, 'task', 'deleted', instance.pk, {'id': instance.pk})])
+
+
+@receiver(post_save, sender=Comment)
+def comment_event(sender, instance, created, **kwargs):
+    project_id = events.comment_project_id(instance)
+    if project_id is not None:
+        action = 'created' if created else 'updated'
+        events.record([events.event(project_id, 'comment', action, instance.pk, events.comment_payload(instance))])
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted_event(sender, instance, **kwargs):
+    project_id = events.comment_project_id(instance)
+    if project_id is not None:
+        events.record([events.event(project_id, 'comment', 'deleted', instance.pk, events.comment_payload(instance))])
+
+
+@receiver(post_delete, sender=Project)
+def drop_project_events(sender, instance, **kwargs):
+    # Runs after the cascade, so it also takes the events the cascade recorded.
+    ProjectEvent.objects.filter(project_id=instance.pk).delete()
+
+
+@receiver(pre_save, sender=Project)
+@receiver(pre_save, sender=Task)
+@receiver(pre_save, sender=Comment)
+@receiver(pre_save, sender=membership)
+def remember_audited_values(sender, instance, **kwargs):
+    audit.remember(instance)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=Comment)
+@receiver(post_save, sender=membership)
+def audit_save(sender, instance, created, update_fields, **kwargs):
+    audit.record([audit.saved(instance, created, update_fields)])
+
+
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=Task)
+@receiver(post_delete, sender=Comment)
+@receiver(post_delete, sender=membership)
+def audit_delete(sender, instance, **kwargs):
+    audit.record([audit.deleted(instance)])
+
+
+@receiver(pre_save, sender=Task)
+def place_in_tree(sender, instance, **kwargs):
+    hierarchy.prepare(instance)
+
+
+@receiver(post_save, sender=Task)
+def move_subtasks(sender, instance, created, **kwargs):
+    hierarchy.move_subtree(instance)
+    old = getattr(instance, '_rollup_cell', None)
+    if old and (old[2] == 'done') != (instance.status == 'done'):
+        hierarchy.blockers_changed([instance.pk])
+
+
+@receiver(pre_delete, sender=Task)
+def detach_dependencies(sender, instance, origin=None, **kwargs):
+    hierarchy.detach(instance, origin)
+
+
+@receiver(tasks_bulk_changed)
+def bulk_blockers_changed(sender, task_ids, fields, **kwargs):
+    if fields is not None and 'status' in fields:
+        hierarchy.blockers_changed(task_ids)
+
+
+@receiver(pre_save, sender=Comment)
+def check_mentions(sender, instance, **kwargs):
+    mentions.prepare(instance)
+
+
+@receiver(post_save, sender=Comment)
+def place_comment(sender, instance, created, **kwargs):
+    if created:
+        threads.place(instance)
+    mentions.sync(instance, created)
+
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def index_task_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        return
+    # taggit passes only the tag ids actually added or removed.
+    if action == 'post_add':
+        tagindex.add(instance, pk_set)
+    elif action == 'post_remove':
+        tagindex.remove(instance.pk, pk_set or ())
+    elif action == 'post_clear':
+        tagindex.remove(instance.pk)
+
+
+@receiver(post_save, sender=Task)
+def move_task_tags(sender, instance, created, **kwargs):
+    old = getattr(instance, '_rollup_cell', None)
+    if old and old[0] != instance.project_id:
+        tagindex.move([instance.pk])
+
+
+@receiver(tasks_bulk_changed)
+def move_bulk_task_tags(sender, task_ids, fields, **kwargs):
+    if fields is not None and 'project' in fields:
+        tagindex.move(task_ids)
+
+
+# Connected last: every receiver above may read the values these hold from
+# before the save. A later save of the same instance re-reads them anyway.
+@receiver(post_save, sender=Task)
+def update_task_cell(sender, instance, **kwargs):
+    instance._rollup_cell = rollups.cell_of(instance)
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_task(sender, instance, **kwargs):
+    instance._rollup_task_id = instance.task_id
@@ -0,0 +1,132 @@
+"""
+Per-project index of task tags.
+
+taggit's ``TaggedItem`` reaches tasks through ``content_type`` and
+``object_id``, so a tag filter or a tag count means a generic join across
+every tagged object. ``TaskTag`` holds the same pairs with the task's project
+alongside, keyed by ``tasktag_project_idx``: tasks with a tag, and a
+project's tag counts, are one range of that index. Model signals keep it in
+step with ``Task.tags`` and with tasks moving between projects, bulk writes
+update it themselves, and ``manage.py rebuild_task_tags`` repairs drift.
+"""
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery
+from taggit.models import TaggedItem
+
+from .models import Task, TaskTag
+
+DEFAULT_TAGS = 100
+MAX_TAGS = 1000
+
+
+def parse_names(value):
+    """Tag names from a comma-separated query value, blanks and repeats dropped."""
+    return list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+
+
+def add(task, tag_ids):
+    if tag_ids:
+        TaskTag.objects.bulk_create(
+            [TaskTag(project_id=task.project_id, tag_id=tag_id, task_id=task.pk) for tag_id in tag_ids],
+            ignore_conflicts=True,
+        )
+
+
+def remove(task_id, tag_ids=None):
+    """Drop ``tag_ids`` (all of them when None) from task ``task_id``."""
+    rows = TaskTag.objects.filter(task_id=task_id)
+    if tag_ids is not None:
+        rows = rows.filter(tag_id__in=tag_ids)
+    rows.delete()
+
+
+def move(task_ids):
+    """Re-point the rows of ``task_ids`` at their tasks' current projects."""
+    TaskTag.objects.filter(task_id__in=task_ids).update(
+        project_id=Subquery(Task.objects.filter(pk=OuterRef('task_id')).values('project_id')[:1]),
+    )
+
+
+def set_tags(task_tags, replace=False):
+    """Index many ``(task, tags)`` pairs, ``tags`` being ``Tag`` objects; see ``bulk.set_tags``."""
+    if replace:
+        TaskTag.objects.filter(task_id__in=[task.pk for task, _ in task_tags]).delete()
+    TaskTag.objects.bulk_create(
+        [
+            TaskTag(project_id=task.project_id, tag_id=tag.pk, task_id=task.pk)
+            for task, tags in task_tags
+            for tag in tags
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def tasks_with_any(names, project_id=None):
+    """Ids of the tasks tagged with at least one of ``names``, as a subquery."""
+    rows = TaskTag.objects.filter(tag__name__in=names)
+    if project_id is not None:
+        rows = rows.filter(project_id=project_id)
+    return rows.values('task_id')
+
+
+def tasks_with_all(names, project_id=None):
+    """Ids of the tasks tagged with every one of ``names``, as a subquery."""
+    # Tag names are unique, so a task with every tag has one row per name.
+    return (
+        tasks_with_any(names, project_id)
+        .annotate(matched=Count('tag_id'))
+        .filter(matched=len(set(names)))
+        .values('task_id')
+    )
+
+
+def tag_counts(project_id, limit=DEFAULT_TAGS):
+    """The project's ``limit`` most used tags with their task counts, most used first."""
+    counts = (
+        TaskTag.objects.filter(project_id=project_id)
+        .values('tag_id')
+        .annotate(tasks=Count('task_id'))
+        .order_by('-tasks', 'tag__name')
+        .values('tag__name', 'tag__slug', 'tasks')[:limit]
+    )
+    return {
+        'project': project_id,
+        'tags': [{'name': row['tag__name'], 'slug': row['tag__slug'], 'tasks': row['tasks']} for row in counts],
+    }
+
+
+def _tagged(project_ids):
+    tasks = Task.objects.all() if project_ids is None else Task.objects.filter(project_id__in=project_ids)
+    # Items whose task is gone are taggit's to clean up; they can't be indexed.
+    return TaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Task), object_id__in=tasks.values('pk'),
+    ).annotate(
+        project_id=Subquery(Task.objects.filter(pk=OuterRef('object_id')).values('project_id')[:1]),
+    ).values_list('project_id', 'tag_id', 'object_id')
+
+
+def _scoped(project_ids):
+    rows = TaskTag.objects.all()
+    if project_ids is not None:
+        # Rows left behind in another project by a missed move count too.
+        rows = rows.filter(Q(project_id__in=project_ids) | Q(task__project_id__in=project_ids))
+    return rows
+
+
+def rebuild(project_ids=None):
+    """Re-derive the rows of ``project_ids`` (every project when None) from taggit."""
+    with transaction.atomic():
+        _scoped(project_ids).delete()
+        TaskTag.objects.bulk_create(
+            (TaskTag(project_id=project_id, tag_id=tag_id, task_id=task_id)
+             for project_id, tag_id, task_id in _tagged(project_ids).iterator()),
+            batch_size=1000,
+        )
+
+
+def drift(project_ids=None):
+    """Ids of the projects whose index rows disagree with taggit."""
+    expected = set(_tagged(project_ids).iterator())
+    stored = set(_scoped(project_ids).values_list('project_id', 'tag_id', 'task_id').iterator())
+    return sorted({row[0] for row in expected ^ stored})
@@ -1,3 +1,1656 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.signals import user_login_failed
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import audit, authentication, events, exports, hierarchy, mentions, metrics, reminders, rollups, routers, tagindex
+from . import membership as membership_service
+from .benchmarks import check_baselines
+from .models import (
+    AuditLog, User, Project, Task, Comment, Mention, membership, OTP, OutboundEmail, ProjectEvent, SearchEntry,
+    SentReminder, TaskDependency, TaskDependencyClosure, TaskRollup, TaskTag,
+)
+from .signals import tasks_bulk_changed
+from .outbox import claim_batch
+from .otp_store import CacheOTPStore, DatabaseOTPStore, OTPError, OTP_MAX_ATTEMPTS
+from .views import AuditLogViewSet, MentionViewSet, ProjectViewSet, TaskViewSet, CommentViewSet
+
+
+def make_user(username, **extra):
+    return User.objects.create_user(username, f'{username}@example.com', 'x', phone_number='', **extra)
+
+
+# Password hashing alone crosses the slow-request threshold.
+@override_settings(METRICS_SLOW_REQUEST_MS=None)
+class APITestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        membership_service._local.clear()
+        authentication._local.clear()
+        self.client = APIClient()
+
+
+class QueryBudgetMixin:
+    """Fail a test when an endpoint exceeds the ``query_budget`` its viewset declares."""
+
+    def assertWithinQueryBudget(self, viewset, action, method, *args, **kwargs):
+        budget = viewset.query_budget[action]
+        with CaptureQueriesContext(connection) as ctx:
+            response = method(*args, **kwargs)
+        executed = len(ctx.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(q['sql'] for q in ctx.captured_queries)
+            self.fail(
+                f"{viewset.__name__}.{action} ran {executed} queries, budget is {budget}:\n{queries}"
+            )
+        return response
+
+
+class ProjectQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', is_staff=True)
+        cls.users = [make_user(f'u{i}') for i in range(5)]
+        for i in range(10):
+            project = Project.objects.create(name=f'p{i}', owner=cls.users[i % 5])
+            project.members.add(*cls.users)
+        cls.project = project
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.admin)
+
+    def test_list_is_constant(self):
+        response = self.assertWithinQueryBudget(
+            ProjectViewSet, 'list', self.client.get, '/api/projects/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 10)
+        self.assertEqual(len(response.data[0]['members']), 5)
+        self.assertIn('email', response.data[0]['owner'])
+
+    def test_retrieve_is_constant(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.assertWithinQueryBudget(
+            ProjectViewSet, 'retrieve', self.client.get, f'/api/projects/{self.project.pk}/'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class TaskQueryBudgetTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        for i in range(20):
+            task = Task.objects.create(project=cls.project, title=f't{i}', assignee=cls.owner)
+            task.tags.add('backend', f'tag{i % 4}')
+        cls.task = task
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def test_list_is_constant(self):
+        response = self.assertWithinQueryBudget(TaskViewSet, 'list', self.client.get, '/api/tasks/')
+        results = response.data['results']
+        self.assertEqual(len(results), 20)
+        self.assertCountEqual(results[0]['tags'], ['backend', 'tag0'])
+        self.assertEqual(results[0]['assignee']['username'], 'owner')
+
+    def test_retrieve_is_constant(self):
+        response = self.assertWithinQueryBudget(
+            TaskViewSet, 'retrieve', self.client.get, f'/api/tasks/{self.task.pk}/'
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class MembershipLookupTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.member = make_user('member')
+        cls.outsider = make_user('outsider')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.project.members.add(cls.member)
+        cls.task = Task.objects.create(project=cls.project, title='t')
+
+    def test_owner_and_members(self):
+        self.assertTrue(membership_service.is_project_member(self.owner, self.project))
+        self.assertTrue(membership_service.is_project_member(self.member, self.project.pk))
+        self.assertFalse(membership_service.is_project_member(self.outsider, self.project.pk))
+
+    def test_repeat_lookups_are_cached(self):
+        membership_service.is_project_member(self.member, self.project.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(membership_service.is_project_member(self.member, self.project.pk))
+
+    def test_m2m_changes_invalidate(self):
+        self.assertTrue(membership_service.is_project_member(self.member, self.project.pk))
+        self.project.members.remove(self.member)
+        self.assertFalse(membership_service.is_project_member(self.member, self.project.pk))
+        self.outsider.projects.add(self.project)
+        self.assertTrue(membership_service.is_project_member(self.outsider, self.project.pk))
+        self.outsider.projects.clear()
+        self.assertFalse(membership_service.is_project_member(self.outsider, self.project.pk))
+
+    def test_membership_rows_count_and_invalidate(self):
+        self.assertFalse(membership_service.is_project_member(self.outsider, self.project.pk))
+        row = membership.objects.create(user=self.outsider, project=self.project)
+        self.assertTrue(membership_service.is_project_member(self.outsider, self.project.pk))
+        row.delete()
+        self.assertFalse(membership_service.is_project_member(self.outsider, self.project.pk))
+
+    def test_comment_requires_membership(self):
+        self.client.force_authenticate(self.outsider)
+        response = self.client.post('/api/comments/', {'task': self.task.pk, 'content': 'hi'})
+        self.assertEqual(response.status_code, 403)
+        self.client.force_authenticate(self.member)
+        response = self.client.post('/api/comments/', {'task': self.task.pk, 'content': 'hi'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Comment.objects.get().author, self.member)
+
+
+class KeysetPaginationTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        now = timezone.now()
+        tasks = []
+        for i in range(23):
+            # Repeated priorities and some missing due dates exercise ties and NULLs.
+            due = None if i % 4 == 0 else now + timedelta(days=i % 5)
+            tasks.append(Task.objects.create(
+                project=cls.project, title=f't{i}', priority=i % 3 + 1, due_date=due,
+            ))
+        cls.tasks = tasks
+        for i in range(7):
+            Comment.objects.create(task=tasks[0], author=cls.owner, content=f'c{i}')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def walk(self, url):
+        ids, pages = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids, pages
+
+    def test_forward_walk_covers_every_row_once(self):
+        for ordering in ('created_at', '-due_date', 'priority', '-priority,due_date'):
+            ids, pages = self.walk(f'/api/tasks/?page_size=5&ordering={ordering}')
+            self.assertEqual(len(ids), 23, ordering)
+            self.assertEqual(len(set(ids)), 23, ordering)
+            self.assertEqual(len(pages), 5, ordering)
+
+    def test_ordering_matches_database_order(self):
+        ids, _ = self.walk('/api/tasks/?page_size=4&ordering=due_date')
+        with_due = [t for t in self.tasks if t.due_date is not None]
+        expected = [t.pk for t in sorted(with_due, key=lambda t: (t.due_date, t.pk))]
+        expected += [t.pk for t in self.tasks if t.due_date is None]
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get('/api/tasks/?page_size=5&ordering=-priority').data
+        second = self.client.get(first['next']).data
+        self.assertIsNone(first['previous'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual(
+            [t['id'] for t in back['results']], [t['id'] for t in first['results']]
+        )
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/tasks/?cursor=bogus').status_code, 404)
+        cursor = self.client.get('/api/tasks/?page_size=5').data['next'].split('cursor=')[1]
+        response = self.client.get(f'/api/tasks/?ordering=priority&cursor={cursor}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments_by_task(self):
+        response = self.assertWithinQueryBudget(
+            CommentViewSet, 'list', self.client.get,
+            f'/api/comments/?task={self.tasks[0].pk}&page_size=3',
+        )
+        self.assertEqual([c['content'] for c in response.data['results']], ['c0', 'c1', 'c2'])
+
+
+class ExplainFiltersCommandTests(TestCase):
+    def test_reports_every_declared_combination(self):
+        out = StringIO()
+        call_command('explain_filters', stdout=out)
+        lines = [line for line in out.getvalue().splitlines() if not line.startswith(' ')]
+        self.assertIn('tasks: project + status', '\n'.join(lines))
+        self.assertTrue(all(line.startswith(('ok', 'SCAN')) for line in lines))
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('smtp down')
+
+
+class OutboxTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('alice')
+
+    def test_login_queues_otp_without_sending(self):
+        response = self.client.post('/api/auth/login/', {'username': 'alice', 'password': 'x'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.recipient, 'alice@example.com')
+        self.assertIn(OTP.objects.get().code, queued.body)
+
+        call_command('deliver_outbox', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['alice@example.com'])
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+
+    @override_settings(EMAIL_BACKEND='core.tests.FailingEmailBackend')
+    def test_failures_back_off(self):
+        OutboundEmail.objects.create(recipient='a@example.com', subject='s', body='b')
+        call_command('deliver_outbox', '--once', stdout=StringIO())
+        message = OutboundEmail.objects.get()
+        self.assertEqual((message.status, message.attempts), ('pending', 1))
+        self.assertIn('smtp down', message.last_error)
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        out = StringIO()
+        call_command('deliver_outbox', '--stats', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'pending=1')
+
+    def test_needs_a_worker(self):
+        for option in ('--workers', '--batch-size'):
+            with self.assertRaises(CommandError):
+                call_command('deliver_outbox', '--once', option, '0', stdout=StringIO())
+
+    def test_claims_lease_each_message_once(self):
+        OutboundEmail.objects.bulk_create(
+            OutboundEmail(recipient=f'{i}@example.com', subject='s', body='b') for i in range(3)
+        )
+        first = claim_batch(2)
+        self.assertEqual(len(first), 2)
+        self.assertGreater(first[0].next_attempt_at, timezone.now())
+        second = claim_batch(10)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({m.pk for m in first} & {m.pk for m in second})
+        self.assertEqual(claim_batch(10), [])
+
+
+class OTPStoreTestsMixin:
+    store_class = None
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('alice')
+
+    def setUp(self):
+        super().setUp()
+        self.store = self.store_class()
+
+    def test_code_is_single_use(self):
+        code = self.store.issue(self.user)
+        self.store.verify(self.user.pk, code)
+        with self.assertRaisesMessage(OTPError, 'Invalid OTP'):
+            self.store.verify(self.user.pk, code)
+
+    def test_new_code_replaces_old(self):
+        old = self.store.issue(self.user)
+        new = self.store.issue(self.user)
+        if old != new:
+            with self.assertRaises(OTPError):
+                self.store.verify(self.user.pk, old)
+        self.store.verify(self.user.pk, new)
+
+    def test_attempts_are_limited(self):
+        code = self.store.issue(self.user)
+        wrong = '000000' if code != '000000' else '111111'
+        for _ in range(OTP_MAX_ATTEMPTS - 1):
+            with self.assertRaisesMessage(OTPError, 'Invalid OTP'):
+                self.store.verify(self.user.pk, wrong)
+        with self.assertRaisesMessage(OTPError, 'Too many attempts'):
+            self.store.verify(self.user.pk, wrong)
+        with self.assertRaises(OTPError):
+            self.store.verify(self.user.pk, code)
+
+    def test_login_and_verify_endpoints(self):
+        with self.settings(OTP_STORE=f'core.otp_store.{self.store_class.__name__}'):
+            self.client.post('/api/auth/login/', {'username': 'alice', 'password': 'x'})
+            code = OutboundEmail.objects.get().body.split()[3].rstrip('.')
+            response = self.client.post('/api/auth/verify-otp/', {'user_id': self.user.pk, 'code': code})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('access', response.data)
+            response = self.client.post('/api/auth/verify-otp/', {'user_id': self.user.pk, 'code': code})
+            self.assertEqual(response.status_code, 400)
+
+
+    async def test_async_verify(self):
+        code = await sync_to_async(self.store.issue)(self.user)
+        with self.assertRaisesMessage(OTPError, 'Invalid OTP'):
+            await self.store.averify(self.user.pk, '000000' if code != '000000' else '111111')
+        await self.store.averify(self.user.pk, code)
+        with self.assertRaisesMessage(OTPError, 'Invalid OTP'):
+            await self.store.averify(self.user.pk, code)
+
+    async def test_async_login_and_verify_endpoints(self):
+        with self.settings(OTP_STORE=f'core.otp_store.{self.store_class.__name__}'):
+            response = await self.async_client.post(
+                '/api/auth/async/login/', {'username': 'alice', 'password': 'wrong'}, content_type='application/json',
+            )
+            self.assertEqual(response.status_code, 400)
+            response = await self.async_client.post(
+                '/api/auth/async/login/', {'username': 'alice', 'password': 'x'}, content_type='application/json',
+            )
+            self.assertEqual(response.json()['user_id'], self.user.pk)
+            email = await OutboundEmail.objects.aget()
+            code = email.body.split()[3].rstrip('.')
+            payload = {'user_id': self.user.pk, 'code': code}
+            response = await self.async_client.post('/api/auth/async/verify-otp/', payload)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('access', response.json())
+            response = await self.async_client.post('/api/auth/async/verify-otp/', payload)
+            self.assertEqual(response.status_code, 400)
+
+
+class CacheOTPStoreTests(OTPStoreTestsMixin, APITestCase):
+    store_class = CacheOTPStore
+
+    def test_nothing_is_written_to_the_database(self):
+        self.store.issue(self.user)
+        self.assertFalse(OTP.objects.exists())
+
+
+class DatabaseOTPStoreTests(OTPStoreTestsMixin, APITestCase):
+    store_class = DatabaseOTPStore
+
+    def test_expired_code(self):
+        code = self.store.issue(self.user)
+        OTP.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.assertRaisesMessage(OTPError, 'OTP expired'):
+            self.store.verify(self.user.pk, code)
+
+    async def test_async_login_goes_through_auth_backends(self):
+        failures = []
+
+        def record(sender, credentials, **kwargs):
+            failures.append(credentials['username'])
+
+        user_login_failed.connect(record)
+        try:
+            response = await self.async_client.post(
+                '/api/auth/async/login/', {'username': 'alice', 'password': 'wrong'}, content_type='application/json',
+            )
+        finally:
+            user_login_failed.disconnect(record)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(failures, ['alice'])
+        with self.settings(AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.RemoteUserBackend']):
+            response = await self.async_client.post(
+                '/api/auth/async/login/', {'username': 'alice', 'password': 'x'}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 400)
+
+    def test_attempt_limit_holds_for_stale_reads(self):
+        code = self.store.issue(self.user)
+        wrong = '000000' if code != '000000' else '111111'
+        # Every concurrent guess read the row before any of them counted.
+        stale = OTP.objects.get()
+        OTP.objects.update(attempts=OTP_MAX_ATTEMPTS - 1)
+        with mock.patch('django.db.models.QuerySet.first', return_value=stale):
+            with self.assertRaisesMessage(OTPError, 'Too many attempts'):
+                self.store.verify(self.user.pk, wrong)
+        self.assertFalse(OTP.objects.exists())
+
+    async def test_async_attempt_limit_holds_for_stale_reads(self):
+        code = await sync_to_async(self.store.issue)(self.user)
+        wrong = '000000' if code != '000000' else '111111'
+        stale = await OTP.objects.aget()
+        await OTP.objects.aupdate(attempts=OTP_MAX_ATTEMPTS - 1)
+        with mock.patch('django.db.models.QuerySet.afirst', mock.AsyncMock(return_value=stale)):
+            with self.assertRaisesMessage(OTPError, 'Too many attempts'):
+                await self.store.averify(self.user.pk, wrong)
+        self.assertFalse(await OTP.objects.aexists())
+
+    def test_purge_deletes_expired_in_chunks(self):
+        self.store.issue(self.user)
+        past = timezone.now() - timedelta(minutes=1)
+        OTP.objects.bulk_create(OTP(user=self.user, code='123456', expires_at=past) for _ in range(25))
+        out = StringIO()
+        call_command('purge_otps', '--chunk-size', '10', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'deleted=25')
+        self.assertEqual(OTP.objects.count(), 1)
+
+
+class BulkTaskTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.other = make_user('other')
+        cls.project = Project.objects.create(name='mine', owner=cls.owner)
+        cls.foreign = Project.objects.create(name='theirs', owner=cls.other)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def create(self, count, **extra):
+        items = [{'project': self.project.pk, 'title': f't{i}', 'tags': ['bulk', f'n{i % 2}'], **extra}
+                 for i in range(count)]
+        return self.client.post('/api/tasks/bulk/', items, format='json')
+
+    def test_create_reports_per_item_errors(self):
+        items = [
+            {'project': self.project.pk, 'title': 'ok', 'tags': ['a', 'b']},
+            {'project': self.foreign.pk, 'title': 'not mine'},
+            {'project': self.project.pk},
+        ]
+        response = self.client.post('/api/tasks/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['index'] for r in response.data['results']], [0])
+        self.assertEqual([e['index'] for e in response.data['errors']], [1, 2])
+        task = Task.objects.get()
+        self.assertCountEqual(task.tags.names(), ['a', 'b'])
+
+    def test_create_queries_do_not_grow_with_items(self):
+        self.create(2)
+        with CaptureQueriesContext(connection) as small:
+            self.create(5)
+        with CaptureQueriesContext(connection) as large:
+            self.create(50)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(Task.objects.count(), 57)
+
+    def test_update_replaces_fields_and_tags(self):
+        ids = [r['id'] for r in self.create(3).data['results']]
+        items = [{'id': ids[0], 'title': 'renamed', 'tags': ['x']}, {'id': ids[1], 'priority': 1}, {'id': 0}]
+        response = self.client.patch('/api/tasks/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([e['index'] for e in response.data['errors']], [2])
+        first, second = Task.objects.get(pk=ids[0]), Task.objects.get(pk=ids[1])
+        self.assertEqual(first.title, 'renamed')
+        self.assertEqual(list(first.tags.names()), ['x'])
+        self.assertEqual(second.priority, 1)
+        self.assertCountEqual(second.tags.names(), ['bulk', 'n1'])
+
+    def test_status_and_assign(self):
+        ids = [r['id'] for r in self.create(3).data['results']]
+        theirs = Task.objects.create(project=self.foreign, title='theirs')
+        received = []
+        handler = lambda **kwargs: received.append(kwargs)
+        tasks_bulk_changed.connect(handler)
+        self.addCleanup(tasks_bulk_changed.disconnect, handler)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/tasks/bulk-status/', {'ids': ids + [theirs.pk], 'status': 'done'}, format='json'
+            )
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(response.data['errors'][0]['index'], 3)
+        self.assertEqual(Task.objects.filter(status='done').count(), 3)
+        self.assertEqual(received[0]['fields'], ['status'])
+        self.assertEqual(received[0]['project_ids'], {self.project.pk})
+
+        response = self.client.post('/api/tasks/bulk-assign/', {'ids': ids, 'assignee': self.other.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Task.objects.filter(assignee=self.other).count(), 3)
+        response = self.client.post('/api/tasks/bulk-status/', {'ids': ids, 'status': 'nope'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        for url in ('/api/tasks/bulk-status/', '/api/tasks/bulk-assign/'):
+            self.assertEqual(self.client.post(url, ids, format='json').status_code, 400)
+        response = self.client.post('/api/tasks/bulk-assign/', {'ids': ids, 'assignee': True}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Task.objects.filter(assignee=self.other).count(), 3)
+
+
+class ExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        for i in range(7):
+            task = Task.objects.create(
+                project=cls.project, title=f't{i}', assignee=cls.owner,
+                status='done' if i % 2 else 'todo',
+            )
+            task.tags.add('x', 'y')
+            Comment.objects.create(task=task, author=cls.owner, content=f'c{i}')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_respects_filters(self):
+        body = self.read(self.client.get('/api/tasks/export/?status=done'))
+        lines = body.strip().splitlines()
+        self.assertEqual(lines[0].split(','), exports.TASK_COLUMNS)
+        self.assertEqual(len(lines), 4)
+        self.assertIn('owner,"x,y"', lines[1])
+
+    def test_ndjson(self):
+        import json
+        body = self.read(self.client.get('/api/comments/export/?format=ndjson'))
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['content'] for row in rows], [f'c{i}' for i in range(7)])
+        self.assertEqual(rows[0]['author'], 'owner')
+
+    def test_related_data_is_loaded_per_chunk(self):
+        def count(chunk_size):
+            with CaptureQueriesContext(connection) as ctx:
+                list(exports.export_tasks(Task.objects.all(), chunk_size=chunk_size))
+            return len(ctx.captured_queries)
+        # One row query plus assignees and tags for each chunk.
+        self.assertLessEqual(count(7), 3)
+        self.assertLessEqual(count(3), 1 + 2 * 3)
+
+
+class SearchTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.outsider = make_user('outsider')
+        cls.project = Project.objects.create(name='Apollo launch', owner=cls.owner)
+        cls.hidden = Project.objects.create(name='Hidden', owner=cls.outsider)
+        cls.strong = Task.objects.create(project=cls.project, title='Rocket engine', description='rocket rocket')
+        cls.weak = Task.objects.create(project=cls.project, title='Paperwork', description='mentions rocket once')
+        cls.other = Task.objects.create(project=cls.hidden, title='Rocket secret')
+        cls.comment = Comment.objects.create(task=cls.weak, author=cls.owner, content='fuel pumps checked')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def hits(self, query):
+        response = self.client.get('/api/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(hit['type'], hit['id']) for hit in response.data['results']]
+
+    def test_prefix_match_ranked_and_scoped(self):
+        hits = self.hits('rock')
+        self.assertEqual(hits, [('task', self.strong.pk), ('task', self.weak.pk)])
+        self.assertEqual(self.hits('apol'), [('project', self.project.pk)])
+        self.assertEqual(self.hits('pump'), [('comment', self.comment.pk)])
+
+    def test_list_search_filter(self):
+        response = self.client.get('/api/tasks/', {'search': 'paper'})
+        self.assertEqual([task['id'] for task in response.data['results']], [self.weak.pk])
+
+    def test_index_follows_changes(self):
+        self.weak.title = 'Launch checklist'
+        self.weak.description = ''
+        self.weak.save()
+        self.assertEqual(self.hits('checklist'), [('task', self.weak.pk)])
+        self.assertNotIn(('task', self.weak.pk), self.hits('rocket'))
+
+        self.weak.project = self.hidden
+        self.weak.save()
+        self.assertEqual(self.hits('pumps'), [])
+
+        self.strong.delete()
+        self.assertEqual(self.hits('engine'), [])
+
+    def test_bulk_update_reindexes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                '/api/tasks/bulk/', [{'id': self.strong.pk, 'title': 'Booster'}], format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.hits('booster'), [('task', self.strong.pk)])
+
+    def test_rebuild_command(self):
+        SearchEntry.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('indexed=6', out.getvalue())
+        self.assertEqual(self.hits('rock'), [('task', self.strong.pk), ('task', self.weak.pk)])
+
+
+class RollupTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.worker = make_user('worker')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.tasks = [
+            Task.objects.create(project=cls.project, title=f't{i}', assignee=cls.worker, priority=1 + i % 3)
+            for i in range(6)
+        ]
+        Comment.objects.create(task=cls.tasks[0], author=cls.owner, content='c')
+        Comment.objects.create(task=cls.tasks[0], author=cls.owner, content='c')
+        Task.objects.filter(pk=cls.tasks[1].pk).update(due_date=timezone.now() - timedelta(days=1))
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def stats(self):
+        response = self.client.get(f'/api/projects/{self.project.pk}/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def assertNoDrift(self):
+        self.assertEqual(rollups.drift(), [])
+
+    def test_stats(self):
+        stats = self.stats()
+        self.assertEqual(stats['tasks'], 6)
+        self.assertEqual(stats['overdue'], 1)
+        self.assertEqual(stats['comments'], 2)
+        self.assertEqual(stats['by_priority'], {1: 2, 2: 2, 3: 2})
+        self.assertEqual(stats['by_assignee'], [{'assignee': self.worker.pk, 'tasks': 6, 'open': 6}])
+        self.assertWithinQueryBudget(ProjectViewSet, 'stats', self.client.get, f'/api/projects/{self.project.pk}/stats/')
+
+    def test_single_writes(self):
+        task = self.tasks[0]
+        task.status = 'done'
+        task.assignee = None
+        task.save()
+        Comment.objects.create(task=task, author=self.owner, content='c')
+        self.tasks[2].comments.create(author=self.owner, content='c').delete()
+        self.tasks[3].delete()
+        stats = self.stats()
+        self.assertEqual((stats['tasks'], stats['open'], stats['comments']), (5, 4, 3))
+        self.assertEqual(stats['by_status']['done'], 1)
+        self.assertNoDrift()
+
+        self.project.delete()
+        self.assertFalse(TaskRollup.objects.exists())
+
+    def test_bulk_writes_and_user_deletion(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/bulk-status/', {'ids': [self.tasks[4].pk], 'status': 'done'}, format='json')
+        self.assertEqual(self.stats()['by_status']['done'], 1)
+        self.worker.delete()
+        self.assertEqual(self.stats()['by_assignee'], [{'assignee': None, 'tasks': 6, 'open': 5}])
+        self.assertNoDrift()
+
+    def test_workload(self):
+        self.client.force_authenticate(self.worker)
+        response = self.client.get('/api/tasks/workload/')
+        self.assertEqual(response.data['by_project'], [{'project': self.project.pk, 'tasks': 6, 'open': 6}])
+        self.assertEqual(response.data['overdue'], 1)
+        self.assertWithinQueryBudget(TaskViewSet, 'workload', self.client.get, '/api/tasks/workload/')
+        self.assertEqual(self.client.get(f'/api/tasks/workload/?user={self.owner.pk}').status_code, 403)
+
+    def test_rebuild_command(self):
+        TaskRollup.objects.update(tasks=0)
+        out = StringIO()
+        call_command('rebuild_task_rollups', '--check', stdout=out)
+        self.assertIn(f'drifted={self.project.pk}', out.getvalue())
+        call_command('rebuild_task_rollups', stdout=StringIO())
+        self.assertNoDrift()
+
+
+class ETagTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.outsider = make_user('outsider')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.task = Task.objects.create(project=cls.project, title='t')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def assertChangedBy(self, url, write):
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        write()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_not_modified_is_one_query(self):
+        url = f'/api/projects/{self.project.pk}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertNotEqual(self.client.get(f'/api/tasks/?project={self.project.pk}')['ETag'], etag)
+
+    def test_permission_checked_before_304(self):
+        etag = self.client.get(f'/api/projects/{self.project.pk}/')['ETag']
+        self.client.force_authenticate(self.outsider)
+        response = self.client.get(f'/api/projects/{self.project.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+
+    def test_writes_change_the_etag(self):
+        url = f'/api/tasks/?project={self.project.pk}'
+        self.assertChangedBy(url, lambda: Task.objects.create(project=self.project, title='u'))
+        self.assertChangedBy(url, lambda: self.task.tags.add('x'))
+        self.assertChangedBy(url, lambda: Comment.objects.create(task=self.task, author=self.owner, content='c'))
+        self.assertChangedBy(url, lambda: self.project.members.add(self.outsider))
+        self.assertChangedBy(url, lambda: membership.objects.create(project=self.project, user=self.owner))
+
+        def bulk():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post('/api/tasks/bulk-status/', {'ids': [self.task.pk], 'status': 'done'}, format='json')
+        self.assertChangedBy(url, bulk)
+
+    def test_moving_a_task_changes_both_projects(self):
+        other = Project.objects.create(name='q', owner=self.owner)
+
+        def move():
+            self.task.project = other
+            self.task.save()
+        self.assertChangedBy(f'/api/projects/{self.project.pk}/', move)
+        self.project.refresh_from_db()
+        self.project.name = 'renamed'
+        self.project.save()
+        self.assertEqual(Project.objects.get(pk=self.project.pk).version, self.project.version)
+
+    def test_saves_never_write_a_stale_version(self):
+        stale = Project.objects.get(pk=self.project.pk)
+        Task.objects.create(project=self.project, title='u')
+        current = Project.objects.get(pk=self.project.pk).version
+        stale.name = 'renamed'
+        stale.save()
+        self.assertEqual(stale.version, current + 1)
+
+        light = Project.objects.only('id', 'name').get(pk=self.project.pk)
+        light.name = 'again'
+        with CaptureQueriesContext(connection) as ctx:
+            light.save()
+        # Only the search index reads anything, for the description it indexes.
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertEqual(len(selects), 1)
+        self.assertNotIn('version', selects[0])
+        self.assertEqual(Project.objects.get(pk=self.project.pk).version, current + 2)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('user')
+
+    def authenticate(self):
+        token = RefreshToken.for_user(self.user).access_token
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return authentication.CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_hot_path_is_query_free(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(user, self.user)
+        self.assertIsNot(user, self.authenticate())
+        # A process whose local copy expired still skips the database.
+        authentication._local.clear()
+        with self.assertNumQueries(0):
+            self.authenticate()
+
+    def test_saving_the_user_invalidates(self):
+        self.authenticate()
+        self.user.first_name = 'Ada'
+        self.user.save()
+        self.assertEqual(self.authenticate().first_name, 'Ada')
+
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user(self):
+        self.authenticate()
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_password_change_reaches_the_cache(self):
+        self.authenticate()
+        self.user.set_password('changed')
+        self.user.save()
+        self.assertTrue(self.authenticate().check_password('changed'))
+
+    def test_password_hash_is_not_cached(self):
+        user = self.authenticate()
+        self.assertIn('password', user.get_deferred_fields())
+        shared = cache.get(f'authuser:{self.user.pk}:{authentication._generation(self.user.pk)}')
+        self.assertNotIn(self.user.password, shared)
+
+    @mock.patch.object(authentication.api_settings, 'CHECK_REVOKE_TOKEN', True)
+    def test_revoked_by_password_change(self):
+        token = RefreshToken.for_user(self.user).access_token
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        backend = authentication.CachedJWTAuthentication()
+        self.assertEqual(backend.authenticate(request)[0], self.user)
+        self.user.set_password('changed')
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            backend.authenticate(request)
+
+
+@mock.patch.object(events, 'HEARTBEAT', 0.05)
+@mock.patch.object(events, 'MAX_SECONDS', 5)
+class ProjectEventTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.outsider = make_user('outsider')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.task = Task.objects.create(project=cls.project, title='t')
+
+    def headers(self, user):
+        return {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+    async def read(self, response, count):
+        chunks = []
+        async for chunk in response.streaming_content:
+            chunks.append(chunk.decode())
+            if len(chunks) == count:
+                break
+        await response.streaming_content.aclose()
+        return chunks
+
+    async def test_resume_from_last_event_id(self):
+        response = await self.async_client.get(
+            f'/api/projects/{self.project.pk}/events/', headers={**self.headers(self.owner), 'Last-Event-ID': '0'},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        retry, created = await self.read(response, 2)
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn('event: task.created', created)
+        self.assertIn('"title": "t"', created)
+
+    async def test_live_changes(self):
+        response = await self.async_client.get(f'/api/projects/{self.project.pk}/events/', headers=self.headers(self.owner))
+
+        def write():
+            with self.captureOnCommitCallbacks(execute=True):
+                Comment.objects.create(task=self.task, author=self.owner, content='c')
+            self.task.delete()
+        await sync_to_async(write)()
+        chunks = await self.read(response, 4)
+        events_seen = [line for chunk in chunks for line in chunk.splitlines() if line.startswith('event:')]
+        self.assertEqual(events_seen, ['event: comment.created', 'event: comment.deleted', 'event: task.deleted'])
+
+    async def test_members_only(self):
+        url = f'/api/projects/{self.project.pk}/events/'
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        self.assertEqual((await self.async_client.get(url, headers=self.headers(self.outsider))).status_code, 403)
+
+    async def test_local_backend_wakes_subscribers(self):
+        backend = events.LocalEventBackend()
+        subscription = backend.subscribe(self.project.pk)
+        threading.Thread(target=backend.publish, args=(self.project.pk,)).start()
+        await asyncio.wait_for(subscription.wait(10), 1)
+        subscription.close()
+        self.assertEqual(dict(backend._subscriptions), {})
+
+    def test_cascade_and_purge(self):
+        other = Project.objects.create(name='q', owner=self.owner)
+        Task.objects.create(project=other, title='u').comments.create(author=self.owner, content='c')
+        other.delete()
+        self.assertFalse(ProjectEvent.objects.filter(project_id=other.pk).exists())
+
+        ProjectEvent.objects.update(created_at=timezone.now() - timedelta(days=8))
+        out = StringIO()
+        call_command('purge_project_events', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'deleted=1')
+
+    async def test_late_commit_below_the_last_id_is_streamed(self):
+        late = await ProjectEvent.objects.acreate(project=self.project, kind='task', action='updated', object_id=1, payload={})
+        last = await ProjectEvent.objects.acreate(project=self.project, kind='task', action='updated', object_id=2, payload={})
+        # As if ``late`` took its id first but committed after ``last`` was streamed.
+        late_id = late.pk
+        await late.adelete()
+
+        async def allowed():
+            return True
+        lines = events.stream(self.project.pk, last.pk, allowed, resume=False)
+        self.assertTrue((await anext(lines)).startswith('retry:'))
+        self.assertEqual(await anext(lines), ': keep-alive\n\n')
+        await ProjectEvent.objects.acreate(pk=late_id, project=self.project, kind='task', action='updated', object_id=1, payload={})
+        self.assertTrue((await anext(lines)).startswith(f'id: {late_id}\n'))
+        self.assertEqual(await anext(lines), ': keep-alive\n\n')
+        await lines.aclose()
+
+    async def test_access_is_rechecked_while_events_flow(self):
+        allowed = True
+
+        async def still_allowed():
+            return allowed
+        lines = events.stream(self.project.pk, await events.alatest_id(self.project.pk), still_allowed, resume=False)
+        self.assertTrue((await anext(lines)).startswith('retry:'))
+        await ProjectEvent.objects.acreate(project=self.project, kind='task', action='updated', object_id=1, payload={})
+        self.assertIn('event: task.updated', await anext(lines))
+        allowed = False
+        await asyncio.sleep(events.HEARTBEAT)
+        await ProjectEvent.objects.acreate(project=self.project, kind='task', action='updated', object_id=1, payload={})
+        with self.assertRaises(StopAsyncIteration):
+            await anext(lines)
+
+    def test_bulk_writes_record_events_in_their_transaction(self):
+        other = Project.objects.create(name='q', owner=self.owner)
+        ProjectEvent.objects.all().delete()
+        self.client.force_authenticate(self.owner)
+        response = self.client.patch(
+            '/api/tasks/bulk/', [{'id': self.task.pk, 'project': other.pk}], format='json',
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            sorted(ProjectEvent.objects.values_list('project_id', 'action', 'payload__moved_to')),
+            sorted([(other.pk, 'updated', None), (self.project.pk, 'deleted', other.pk)]),
+        )
+
+
+class MetricsTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        Task.objects.create(project=cls.project, title='t')
+
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+        self.client.force_authenticate(self.owner)
+
+    def sample(self, body, name):
+        for line in body.splitlines():
+            if line.startswith(name + ' '):
+                return float(line.rsplit(' ', 1)[1])
+        self.fail(f"{name} not in:\n{body}")
+
+    def test_prometheus_output(self):
+        self.client.get('/api/tasks/')
+        self.client.get('/api/tasks/')
+        response = self.client.get('/metrics')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        labels = '{view="tasks-list",method="GET"'
+        self.assertEqual(self.sample(body, 'http_requests_total' + labels + ',status="200"}'), 2)
+        self.assertEqual(self.sample(body, 'http_request_duration_seconds_count' + labels + '}'), 2)
+        self.assertEqual(self.sample(body, 'http_request_db_queries_sum' + labels + '}'), 4)
+        self.assertGreater(self.sample(body, 'http_request_serializer_seconds_sum' + labels + '}'), 0)
+        self.assertGreater(self.sample(body, 'http_response_size_bytes_sum' + labels + '}'), 0)
+
+    @override_settings(METRICS_SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_queries(self):
+        with self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.client.get(f'/api/projects/{self.project.pk}/')
+        self.assertIn('projects-detail', logs.output[0])
+        self.assertIn('core_project', logs.output[0])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+class SeedAndBenchmarkTests(APITestCase):
+    def test_seed_data_keeps_derived_tables_in_step(self):
+        out = StringIO()
+        call_command('seed_data', '--users', '8', '--projects', '2', '--members', '3', '--tasks', '40',
+                     '--tags', '5', '--comments', '30', '--otps', '4', stdout=out)
+        self.assertIn('users=8 projects=2 tasks=40 tags=5 comments=30 otps=4', out.getvalue())
+        self.assertEqual(Task.objects.filter(tags__isnull=False).distinct().count(), 40)
+        self.assertEqual(SearchEntry.objects.filter(kind='comment').count(), 30)
+        self.assertEqual(rollups.drift(), [])
+        self.assertEqual(tagindex.drift(), [])
+        self.assertTrue(self.client.login(username='seed-user0', password='password'))
+
+        with self.assertRaises(CommandError):
+            call_command('seed_data', '--users', '1', '--projects', '1', stdout=StringIO())
+
+    def test_endpoints_within_baseline_queries(self):
+        out = StringIO()
+        call_command('benchmark', 'endpoints', '--tasks', '40', '--repeat', '2', '--check', stdout=out)
+        self.assertIn('checked=', out.getvalue())
+
+    def test_check_baselines(self):
+        results = {'GET /api/tasks/': {'queries': 3, 'p95_ms': 10.0}}
+        self.assertEqual(check_baselines(results, {'GET /api/tasks/': {'queries': 3, 'p95_ms': 1.0}}), [])
+        self.assertEqual(check_baselines(results, {'GET /api/tasks/': {'queries': 3, 'p95_ms': 5.0}}, 1.0), [])
+        baselines = {
+            'GET /api/tasks/': {'queries': 2, 'p95_ms': 4.0},
+            'GET /api/users/': {'queries': 1, 'p95_ms': 1.0},
+        }
+        self.assertEqual(check_baselines(results, baselines), [
+            'GET /api/tasks/: 3 queries, baseline 2',
+            'GET /api/users/: no result',
+        ])
+        self.assertEqual(check_baselines(results, baselines, 1.0), [
+            'GET /api/tasks/: 3 queries, baseline 2',
+            'GET /api/tasks/: p95 10.0ms, limit 8.0ms',
+            'GET /api/users/: no result',
+        ])
+
+
+@override_settings(DATABASE_REPLICAS=['default'])
+class ReplicaRoutingTests(APITestCase):
+    # 'default' stands in for the replica; the test spies on the choice of one.
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = make_user('reader')
+        cls.project = Project.objects.create(name='p', owner=cls.user)
+        cls.task = Task.objects.create(project=cls.project, title='t')
+
+    def setUp(self):
+        super().setUp()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        patcher = mock.patch.object(routers.random, 'choice', side_effect=lambda aliases: aliases[0])
+        self.choice = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_a_replica(self):
+        self.assertEqual(self.client.get('/api/tasks/').status_code, 200)
+        self.assertEqual(self.choice.call_count, 1)
+        self.assertEqual(routers.ReplicaRouter().db_for_read(Task), 'default')
+
+    def test_writer_is_pinned_to_the_primary(self):
+        response = self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'new'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(routers.is_pinned(self.user.pk))
+        self.client.get('/api/tasks/')
+        self.choice.assert_not_called()
+
+        cache.delete(routers._pin_key(self.user.pk))
+        self.client.get('/api/tasks/')
+        self.assertEqual(self.choice.call_count, 1)
+
+    def test_unauthenticated_and_unsafe_requests_stay_on_the_primary(self):
+        self.client.credentials()
+        self.client.get('/api/tasks/')
+        self.client.post('/api/auth/login/', {'username': 'reader', 'password': 'x'}, format='json')
+        self.choice.assert_not_called()
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'new'}, format='json')
+        self.client.get('/api/tasks/')
+        self.choice.assert_not_called()
+        self.assertFalse(routers.is_pinned(self.user.pk))
+
+
+class AuditLogTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = make_user('admin', is_staff=True)
+        cls.owner = make_user('owner')
+        cls.outsider = make_user('outsider')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.task = Task.objects.create(project=cls.project, title='t')
+
+    def test_request_changes_are_diffed_with_their_actor(self):
+        self.client.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/tasks/{self.task.pk}/', {'title': 'new', 'priority': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        log = AuditLog.objects.get()
+        self.assertEqual((log.actor_id, log.project_id, log.model, log.object_id, log.action),
+                         (self.owner.pk, self.project.pk, 'task', self.task.pk, 'updated'))
+        self.assertEqual(log.changes, {'title': ['t', 'new']})
+        self.assertEqual(log.period, audit.period_of(log.created_at))
+
+    def test_batch_writes_committed_entries_once(self):
+        with audit.batch():
+            with self.captureOnCommitCallbacks(execute=True):
+                task = Task.objects.create(project=self.project, title='a')
+                task.status = 'done'
+                task.save()
+                with transaction.atomic():
+                    Comment.objects.create(task=task, author=self.owner, content='c')
+                try:
+                    with transaction.atomic():
+                        Task.objects.filter(pk=self.task.pk).get().delete()
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            self.assertFalse(AuditLog.objects.exists())
+        entries = list(AuditLog.objects.order_by('id').values_list('model', 'action', 'changes'))
+        self.assertEqual(entries[1], ('task', 'updated', {'status': ['todo', 'done']}))
+        self.assertEqual([entry[:2] for entry in entries], [('task', 'created'), ('task', 'updated'), ('comment', 'created')])
+
+    def test_instance_not_loaded_from_the_database_is_diffed_against_the_stored_row(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Task(pk=self.task.pk, project=self.project, title='renamed').save(update_fields=['title'])
+        self.assertEqual(AuditLog.objects.get().changes, {'title': ['t', 'renamed']})
+
+    def test_bulk_writes_are_audited(self):
+        self.client.force_authenticate(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/bulk-status/', {'ids': [self.task.pk], 'status': 'done'}, format='json')
+        log = AuditLog.objects.get()
+        self.assertEqual((log.actor_id, log.changes), (self.owner.pk, {'status': ['todo', 'done']}))
+
+    def test_api_filters_and_visibility(self):
+        other = Project.objects.create(name='other', owner=self.outsider)
+        moment = timezone.now()
+        for project in (self.project, other):
+            AuditLog.objects.create(
+                period=audit.period_of(moment), created_at=moment, actor=self.admin, project=project,
+                model='project', object_id=project.pk, action='updated', changes={'name': ['a', 'b']},
+            )
+        self.client.force_authenticate(self.owner)
+        response = self.assertWithinQueryBudget(AuditLogViewSet, 'list', self.client.get, '/api/audit/')
+        self.assertEqual([row['project'] for row in response.data['results']], [self.project.pk])
+
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(len(self.client.get('/api/audit/').data['results']), 2)
+        since = (moment + timedelta(seconds=1)).isoformat()
+        self.assertEqual(self.client.get('/api/audit/', {'since': since}).data['results'], [])
+        self.assertEqual(len(self.client.get('/api/audit/', {'until': since, 'project': other.pk}).data['results']), 1)
+
+    def test_bounds_in_other_offsets_pick_the_utc_period(self):
+        for moment in (datetime(2026, 3, 31, 23, 30, tzinfo=dt_timezone.utc), datetime(2026, 4, 1, 0, 30, tzinfo=dt_timezone.utc)):
+            AuditLog.objects.create(
+                period=audit.period_of(moment), created_at=moment, project=self.project,
+                model='task', object_id=1, action='deleted', changes={},
+            )
+        self.client.force_authenticate(self.admin)
+        # 23:00 UTC on March 31st is already April at +02:00, 02:00 UTC on April 1st still March at -05:00.
+        response = self.client.get('/api/audit/', {'since': '2026-04-01T01:00:00+02:00'})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get('/api/audit/', {'until': '2026-03-31T21:00:00-05:00'})
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_purge_drops_old_periods(self):
+        old = timezone.now() - timedelta(days=400)
+        AuditLog.objects.create(
+            period=audit.period_of(old), created_at=old, project=self.project,
+            model='task', object_id=1, action='deleted', changes={},
+        )
+        out = StringIO()
+        call_command('purge_audit_log', '--months', '12', stdout=out)
+        self.assertIn('deleted=1', out.getvalue())
+
+
+class HierarchyTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def task(self, title, parent=None):
+        return Task.objects.create(project=self.project, title=title, parent=parent)
+
+    def test_subtree_is_one_query_at_any_depth(self):
+        root = self.task('root')
+        node = root
+        for depth in range(6):
+            node = self.task(f'level{depth}', parent=node)
+        self.task('sibling', parent=root)
+        response = self.assertWithinQueryBudget(TaskViewSet, 'subtree', self.client.get, f'/api/tasks/{root.pk}/subtree/')
+        titles = [child['title'] for child in response.data['subtasks']]
+        self.assertEqual(sorted(titles), ['level0', 'sibling'])
+        leaf = response.data
+        while leaf['subtasks']:
+            leaf = leaf['subtasks'][0]
+        self.assertEqual(leaf['title'], 'level5')
+
+    def test_moving_a_task_rewrites_its_subtree_paths(self):
+        a, b = self.task('a'), self.task('b')
+        child = self.task('child', parent=a)
+        grandchild = self.task('grandchild', parent=child)
+        response = self.client.patch(f'/api/tasks/{child.pk}/', {'parent': b.pk}, format='json')
+        self.assertEqual(response.status_code, 200)
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.path, f'{b.pk}/{child.pk}/')
+        self.assertEqual(hierarchy.tree(a)['subtasks'], [])
+
+    @mock.patch.object(hierarchy, 'MAX_PATH_LENGTH', 40)
+    def test_nesting_past_the_path_length_is_a_400(self):
+        chain = [self.task('root')]
+        while True:
+            response = self.client.post('/api/tasks/', {'project': self.project.pk, 'title': 'sub', 'parent': chain[-1].pk}, format='json')
+            if response.status_code != 201:
+                break
+            chain.append(Task.objects.get(pk=response.data['id']))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+        self.assertLessEqual(max(len(task.path) for task in chain), 40)
+
+        # Moving the root of a two-level subtree under the deepest task.
+        top = self.task('top')
+        self.task('leaf', parent=self.task('middle', parent=top))
+        response = self.client.patch(f'/api/tasks/{top.pk}/', {'parent': chain[-2].pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+
+    def test_task_cannot_move_under_its_own_subtask(self):
+        a = self.task('a')
+        child = self.task('child', parent=a)
+        response = self.client.patch(f'/api/tasks/{a.pk}/', {'parent': child.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+
+    def test_dependency_cycle_is_rejected(self):
+        a, b, c = self.task('a'), self.task('b'), self.task('c')
+        self.assertEqual(self.client.post(f'/api/tasks/{a.pk}/dependencies/', {'blocker': b.pk}, format='json').status_code, 201)
+        self.assertEqual(self.client.post(f'/api/tasks/{b.pk}/dependencies/', {'blocker': c.pk}, format='json').status_code, 201)
+        response = self.client.post(f'/api/tasks/{c.pk}/dependencies/', {'blocker': a.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TaskDependency.objects.filter(task=c).exists())
+        for body in ([a.pk], {'blocker': 'x'}, {'blocker': True}):
+            response = self.client.post(f'/api/tasks/{c.pk}/dependencies/', body, format='json')
+            self.assertEqual(response.status_code, 400)
+
+        response = self.assertWithinQueryBudget(TaskViewSet, 'dependencies', self.client.get, f'/api/tasks/{a.pk}/dependencies/')
+        self.assertEqual([(row['id'], row['direct']) for row in response.data['blocked_by']], [(b.pk, True), (c.pk, False)])
+
+    def test_closure_survives_removing_one_side_of_a_diamond(self):
+        top, left, right, bottom = (self.task(title) for title in ('top', 'left', 'right', 'bottom'))
+        for task, blocker in ((top, left), (top, right), (left, bottom), (right, bottom)):
+            hierarchy.add_dependency(task, blocker)
+        self.assertEqual(TaskDependencyClosure.objects.get(task=top, blocker=bottom).paths, 2)
+        response = self.client.delete(f'/api/tasks/{top.pk}/dependencies/?blocker={left.pk}')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(TaskDependencyClosure.objects.get(task=top, blocker=bottom).paths, 1)
+        self.assertFalse(TaskDependencyClosure.objects.filter(task=top, blocker=left).exists())
+
+    def test_finishing_a_blocker_unblocks_dependents(self):
+        blocker, other = self.task('blocker'), self.task('other')
+        waiting = self.task('waiting')
+        hierarchy.add_dependency(waiting, blocker)
+        hierarchy.add_dependency(waiting, other)
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.open_blockers, 2)
+
+        self.client.patch(f'/api/tasks/{blocker.pk}/', {'status': 'done'}, format='json')
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.open_blockers, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/bulk-status/', {'ids': [other.pk], 'status': 'done'}, format='json')
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.open_blockers, 0)
+
+    def test_task_with_dependencies_cannot_change_project(self):
+        other = Project.objects.create(name='q', owner=self.owner)
+        waiting, blocker = self.task('waiting'), self.task('blocker')
+        hierarchy.add_dependency(waiting, blocker)
+        for task in (waiting, blocker):
+            response = self.client.patch(f'/api/tasks/{task.pk}/', {'project': other.pk}, format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('project', response.data)
+        response = self.client.patch('/api/tasks/bulk/', [{'id': blocker.pk, 'project': other.pk}], format='json')
+        self.assertEqual(response.data['errors'][0]['index'], 0)
+        self.assertFalse(Task.objects.filter(project=other).exists())
+
+    def test_deleting_a_task_removes_its_chains(self):
+        a, b, c = self.task('a'), self.task('b'), self.task('c')
+        hierarchy.add_dependency(a, b)
+        hierarchy.add_dependency(b, c)
+        b.delete()
+        self.assertFalse(TaskDependencyClosure.objects.exists())
+        a.refresh_from_db()
+        self.assertEqual(a.open_blockers, 0)
+
+
+class BoardTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.outsider = make_user('outsider')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.project.members.add(cls.owner)
+        soon = timezone.now() + timedelta(days=1)
+        cls.todo = [
+            Task.objects.create(project=cls.project, title=f't{i}', priority=1 + i % 3,
+                                due_date=soon + timedelta(days=i) if i % 2 else None)
+            for i in range(7)
+        ]
+        cls.done = Task.objects.create(project=cls.project, title='d', status='done')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def expected_order(self):
+        far = timezone.now() + timedelta(days=3650)
+        return [task.pk for task in sorted(self.todo, key=lambda task: (task.priority, task.due_date or far, task.pk))]
+
+    def test_columns_hold_totals_and_first_cards_in_one_query(self):
+        response = self.assertWithinQueryBudget(
+            ProjectViewSet, 'board', self.client.get, f'/api/projects/{self.project.pk}/board/', {'cards': 3},
+        )
+        self.assertEqual(response.status_code, 200)
+        columns = {column['status']: column for column in response.data['columns']}
+        self.assertEqual(list(columns), ['todo', 'in_progress', 'done'])
+        self.assertEqual([columns[status]['total'] for status in columns], [7, 0, 1])
+        self.assertEqual([card['id'] for card in columns['todo']['cards']], self.expected_order()[:3])
+        self.assertIsNotNone(columns['todo']['next'])
+        self.assertIsNone(columns['done']['next'])
+        self.assertEqual(columns['in_progress']['cards'], [])
+
+    def test_load_more_follows_the_column_cursor(self):
+        url = f'/api/projects/{self.project.pk}/board/'
+        cursor = self.client.get(url, {'cards': 3}).data['columns'][0]['next']
+        seen = []
+        while cursor:
+            page = self.client.get(url, {'cards': 3, 'column': 'todo', 'cursor': cursor}).data
+            seen += [card['id'] for card in page['cards']]
+            cursor = page['next']
+        self.assertEqual(seen, self.expected_order()[3:])
+
+        self.assertEqual(self.client.get(url, {'column': 'todo', 'cursor': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'column': 'nope'}).status_code, 400)
+
+    def test_outsider_cannot_see_the_board(self):
+        self.client.force_authenticate(self.outsider)
+        self.assertEqual(self.client.get(f'/api/projects/{self.project.pk}/board/').status_code, 403)
+
+
+class TimelineTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.project.members.add(cls.owner)
+        cls.start = timezone.now().replace(microsecond=0) - timedelta(days=30)
+        cls.tasks = {}
+        for name, offset, days in (('a', 0, 1), ('b', 1, 2), ('c', 1, 1), ('d', 3, None)):
+            task = Task.objects.create(project=cls.project, title=name)
+            created = cls.start + timedelta(days=offset)
+            due = created + timedelta(days=days) if days is not None else None
+            Task.objects.filter(pk=task.pk).update(created_at=created, due_date=due)
+            cls.tasks[name] = task
+        for name, blocker in (('b', 'a'), ('c', 'a'), ('d', 'b'), ('d', 'c')):
+            hierarchy.add_dependency(cls.tasks[name], cls.tasks[blocker])
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def rows(self, **params):
+        response = self.client.get(f'/api/projects/{self.project.pk}/timeline/', params)
+        self.assertEqual(response.status_code, 200)
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_timeline_streams_bars_overlapping_the_window_in_start_order(self):
+        self.assertEqual([row['title'] for row in self.rows()], ['a', 'b', 'c', 'd'])
+        window = {'start': (self.start + timedelta(days=2, hours=12)).isoformat(),
+                  'end': (self.start + timedelta(days=3)).isoformat()}
+        self.assertEqual([row['title'] for row in self.rows(**window)], ['b'])
+        response = self.client.get(f'/api/projects/{self.project.pk}/timeline/', {'start': 'soon'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_critical_path_and_slack(self):
+        response = self.assertWithinQueryBudget(
+            ProjectViewSet, 'critical_path', self.client.get, f'/api/projects/{self.project.pk}/critical-path/',
+        )
+        day = 24 * 60 * 60
+        tasks = self.tasks
+        self.assertEqual(response.data['length'], 3 * day)
+        self.assertEqual(response.data['critical_path'], [tasks['a'].pk, tasks['b'].pk, tasks['d'].pk])
+        self.assertEqual(response.data['slack'][tasks['c'].pk], day)
+        self.assertEqual(response.data['slack'][tasks['d'].pk], 0)
+
+    def test_result_is_cached_until_the_project_changes(self):
+        url = f'/api/projects/{self.project.pk}/critical-path/'
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertFalse(any('core_taskdependency' in query['sql'] for query in ctx.captured_queries))
+
+        self.client.delete(f"/api/tasks/{self.tasks['d'].pk}/dependencies/?blocker={self.tasks['b'].pk}")
+        path = self.client.get(url).data['critical_path']
+        self.assertEqual(path, [self.tasks['a'].pk, self.tasks['b'].pk])
+
+
+class FakeClock:
+    def __init__(self, moment):
+        self.moment = moment
+
+    def __call__(self):
+        return self.moment
+
+    def advance(self, **delta):
+        self.moment += timedelta(**delta)
+
+
+class ReminderTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = make_user('alice')
+        cls.bob = make_user('bob')
+        cls.project = Project.objects.create(name='p', owner=cls.alice)
+
+    def setUp(self):
+        self.clock = FakeClock(timezone.now().replace(microsecond=0))
+
+    def task(self, title, due_in, assignee, **extra):
+        return Task.objects.create(
+            project=self.project, title=title, assignee=assignee, due_date=self.clock() + due_in, **extra,
+        )
+
+    def scheduler(self):
+        return reminders.ReminderScheduler(clock=self.clock, lead=timedelta(hours=24), horizon=timedelta(hours=1))
+
+    def test_digest_per_assignee_over_one_connection(self):
+        self.task('late', -timedelta(hours=2), self.alice)
+        self.task('soon', timedelta(hours=3), self.alice)
+        self.task('theirs', timedelta(hours=5), self.bob)
+        self.task('finished', timedelta(hours=1), self.alice, status='done')
+        self.task('later', timedelta(days=3), self.alice)
+        scheduler = self.scheduler()
+        with mock.patch('core.reminders.get_connection', wraps=reminders.get_connection) as get_connection:
+            self.assertEqual(scheduler.tick(), (2, 3))
+        get_connection.assert_called_once()
+        messages = {message.to[0]: message for message in mail.outbox}
+        self.assertEqual(messages['alice@example.com'].subject, '2 task reminders')
+        body = messages['alice@example.com'].body
+        self.assertLess(body.index('Overdue:\n- late'), body.index('Due soon:\n- soon'))
+        self.assertNotIn('finished', body)
+
+        # Nothing twice, even from a new scheduler.
+        self.assertEqual(scheduler.tick(), (0, 0))
+        self.assertEqual(self.scheduler().tick(), (0, 0))
+
+    def test_reminders_fire_as_the_clock_advances(self):
+        task = self.task('soon', timedelta(hours=30), self.alice)
+        scheduler = self.scheduler()
+        self.assertEqual(scheduler.tick(), (0, 0))
+        self.clock.advance(hours=6, minutes=30)
+        self.assertEqual(scheduler.tick(), (1, 1))
+        self.clock.advance(hours=24)
+        self.assertEqual(scheduler.tick(), (1, 1))
+        self.assertEqual(sorted(SentReminder.objects.filter(task=task).values_list('kind', flat=True)),
+                         ['overdue', 'upcoming'])
+
+    def test_changed_tasks_are_rescheduled_without_a_full_scan(self):
+        task = self.task('moved', timedelta(hours=10), self.alice)
+        scheduler = self.scheduler()
+        scheduler.tick()
+        mail.outbox.clear()
+        # Moved later: the queued reminder no longer matches and is dropped.
+        self.clock.advance(minutes=1)
+        task.due_date = self.clock() + timedelta(days=5)
+        task.save()
+        with CaptureQueriesContext(connection) as ctx:
+            scheduler.tick()
+        self.assertTrue(any('"updated_at" >=' in query['sql'] for query in ctx.captured_queries))
+        self.assertEqual(mail.outbox, [])
+
+        # Moved back inside the window: picked up from the change feed.
+        self.clock.advance(minutes=1)
+        Task.objects.filter(pk=task.pk).update(due_date=self.clock() + timedelta(hours=2), updated_at=self.clock())
+        self.assertEqual(scheduler.tick(), (1, 1))
+
+    def test_failed_send_is_retried(self):
+        self.task('soon', timedelta(hours=3), self.alice)
+        scheduler = self.scheduler()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError), \
+                self.assertLogs('core.reminders', 'ERROR'):
+            self.assertEqual(scheduler.tick(), (0, 0))
+        self.assertFalse(SentReminder.objects.exists())
+        self.clock.advance(minutes=10)
+        self.assertEqual(scheduler.tick(), (1, 1))
+
+
+class CommentThreadTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.member = make_user('member.one')
+        cls.outsider = make_user('outsider')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.project.members.add(cls.owner, cls.member)
+        cls.task = Task.objects.create(project=cls.project, title='t')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def post(self, content, parent=None, task=None):
+        body = {'task': (task or self.task).pk, 'content': content}
+        if parent is not None:
+            body['parent'] = parent
+        return self.client.post('/api/comments/', body, format='json')
+
+    def test_thread_is_one_query_in_display_order(self):
+        root = self.post('root').data['id']
+        first = self.post('first', root).data['id']
+        second = self.post('second', root).data['id']
+        nested = self.post('nested', first).data['id']
+        self.post('other thread')
+        response = self.assertWithinQueryBudget(
+            CommentViewSet, 'thread', self.client.get, f'/api/comments/{nested}/thread/',
+        )
+        self.assertEqual([row['id'] for row in response.data], [root, first, nested, second])
+        self.assertEqual(self.client.get(f'/api/comments/{nested}/thread/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        listed = self.client.get('/api/comments/', {'task': self.task.pk, 'ordering': 'path'}).data['results']
+        self.assertEqual([row['content'] for row in listed], ['root', 'first', 'nested', 'second', 'other thread'])
+
+    def test_reply_must_stay_on_its_parents_task(self):
+        root = self.post('root').data['id']
+        other = Task.objects.create(project=self.project, title='other')
+        response = self.post('stray', root, task=other)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('parent', response.data)
+        reply = self.post('reply', root).data['id']
+        response = self.client.patch(f'/api/comments/{reply}/', {'task': other.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_mentions_resolve_members_once_and_follow_edits(self):
+        with CaptureQueriesContext(connection) as ctx:
+            comment_id = self.post('ping @member.one, @outsider and @nobody. Also @owner').data['id']
+        self.assertEqual(sum('"username" IN' in query['sql'] for query in ctx.captured_queries), 1)
+        self.assertEqual(list(Mention.objects.values_list('user_id', flat=True)), [self.member.pk])
+
+        self.client.force_authenticate(self.member)
+        response = self.assertWithinQueryBudget(MentionViewSet, 'list', self.client.get, '/api/mentions/')
+        self.assertEqual([(row['comment'], row['author']) for row in response.data['results']],
+                         [(comment_id, 'owner')])
+        for body in ([1], {'ids': [True]}):
+            self.assertEqual(self.client.post('/api/mentions/read/', body, format='json').status_code, 400)
+        self.assertEqual(self.client.post('/api/mentions/read/', {}, format='json').data, {'updated': 1})
+        self.assertEqual(self.client.get('/api/mentions/', {'unread': 'true'}).data['results'], [])
+
+        self.client.force_authenticate(self.owner)
+        self.client.patch(f'/api/comments/{comment_id}/', {'content': 'never mind'}, format='json')
+        self.assertFalse(Mention.objects.exists())
+
+    def test_extract(self):
+        self.assertEqual(mentions.extract('@a.b: hi @c+d, mail x@example.com @a.b.'), ['a.b', 'c+d'])
+
+
+class TagIndexTests(QueryBudgetMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = make_user('owner')
+        cls.project = Project.objects.create(name='p', owner=cls.owner)
+        cls.other = Project.objects.create(name='q', owner=cls.owner)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.owner)
+
+    def task(self, title, *tags, project=None):
+        response = self.client.post('/api/tasks/', {
+            'project': (project or self.project).pk, 'title': title, 'tags': list(tags),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def titles(self, **params):
+        return sorted(row['title'] for row in self.client.get('/api/tasks/', params).data['results'])
+
+    def test_any_and_all_tag_filters(self):
+        self.task('a', 'ui', 'bug')
+        self.task('b', 'ui')
+        self.task('c', 'api', 'bug')
+        self.task('d')
+        self.task('elsewhere', 'ui', 'bug', project=self.other)
+        self.assertEqual(self.titles(tags='bug'), ['a', 'c', 'elsewhere'])
+        self.assertEqual(self.titles(project=self.project.pk, tags='ui, api'), ['a', 'b', 'c'])
+        self.assertEqual(self.titles(project=self.project.pk, tags_all='ui,bug'), ['a'])
+        self.assertEqual(self.titles(tags_all='bug,bug,api'), ['c'])
+        self.assertEqual(self.titles(tags='nope'), [])
+        self.assertEqual(len(self.titles(tags=' , ')), 5)
+
+    def test_index_follows_tag_and_project_changes(self):
+        task_id = self.task('a', 'ui', 'bug')
+        task = Task.objects.get(pk=task_id)
+        task.tags.remove('bug')
+        task.tags.add('api')
+        self.assertCountEqual(
+            TaskTag.objects.filter(task_id=task_id).values_list('tag__name', flat=True), ['ui', 'api'],
+        )
+        self.client.patch(f'/api/tasks/{task_id}/', {'project': self.other.pk}, format='json')
+        self.assertEqual(set(TaskTag.objects.values_list('project_id', flat=True)), {self.other.pk})
+        task.tags.clear()
+        self.assertFalse(TaskTag.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/tasks/bulk/', [
+                {'project': self.project.pk, 'title': f't{i}', 'tags': ['bulk', f'n{i % 2}']} for i in range(4)
+            ], format='json')
+        ids = [row['id'] for row in response.data['results']]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch('/api/tasks/bulk/', [
+                {'id': ids[0], 'tags': ['solo']}, {'id': ids[1], 'project': self.other.pk},
+            ], format='json')
+        self.assertEqual(tagindex.drift(), [])
+        self.assertEqual(self.titles(project=self.other.pk, tags='bulk'), ['t1'])
+
+    def test_tag_counts(self):
+        for title in ('a', 'b', 'c'):
+            self.task(title, 'ui', *(['bug'] if title != 'c' else []))
+        self.task('d', 'api')
+        self.task('elsewhere', 'api', project=self.other)
+        url = f'/api/projects/{self.project.pk}/tags/'
+        response = self.assertWithinQueryBudget(ProjectViewSet, 'tags', self.client.get, url)
+        self.assertEqual([(tag['name'], tag['tasks']) for tag in response.data['tags']],
+                         [('ui', 3), ('bug', 2), ('api', 1)])
+        self.assertEqual(len(self.client.get(url, {'limit': 1}).data['tags']), 1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_rebuild_command(self):
+        self.task('a', 'ui')
+        TaskTag.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_task_tags', '--check', stdout=out)
+        self.assertIn(f'drifted={self.project.pk}', out.getvalue())
+        call_command('rebuild_task_tags', stdout=StringIO())
+        self.assertEqual(tagindex.drift(), [])
@@ -0,0 +1,60 @@
+"""
+Reply threads on task comments.
+
+``Comment.path`` holds the zero-padded ids from the thread's root down to the
+comment itself, so sorting a task's comments by path lists every thread in
+display order (each reply under its parent, siblings oldest first) and a whole
+thread is one prefix range of ``comment_task_path_idx`` (on PostgreSQL, of
+``comment_task_path_like_idx``, whose pattern operators serve the prefix match
+in any collation). The path includes the comment's own id, which is only known
+after the insert; ``place`` fills it in with one UPDATE right after.
+"""
+from .hierarchy import under
+from .models import Comment
+
+WIDTH = 10
+MAX_DEPTH = Comment._meta.get_field('path').max_length // (WIDTH + 1)
+
+
+class ThreadError(Exception):
+    pass
+
+
+def segment(comment_id):
+    return f'{comment_id:0{WIDTH}d}/'
+
+
+def depth(comment):
+    return comment.path.count('/')
+
+
+def check_parent(comment, parent, task_id):
+    """Raise ``ThreadError`` unless a comment on ``task_id`` may reply to ``parent``."""
+    if parent is None:
+        return
+    if parent.task_id != task_id:
+        raise ThreadError("A reply must be on its parent's task.")
+    if depth(parent) >= MAX_DEPTH:
+        raise ThreadError(f"Replies nest at most {MAX_DEPTH} deep.")
+    if comment is not None and comment.pk is not None and parent.path.startswith(comment.path):
+        raise ThreadError("A comment can't reply to itself or one of its replies.")
+
+
+def place(comment):
+    """``post_save`` of a new comment: store its path under its parent's."""
+    if comment.path:
+        return
+    parent_path = ''
+    if comment.parent_id is not None and Comment.parent.is_cached(comment):
+        parent_path = comment.parent.path
+    elif comment.parent_id is not None:
+        parent_path = Comment.objects.filter(pk=comment.parent_id).values_list('path', flat=True).first() or ''
+    comment.path = parent_path + segment(comment.pk)
+    Comment.objects.filter(pk=comment.pk).update(path=comment.path)
+
+
+def thread(comment, queryset=None):
+    """Every comment in ``comment``'s thread, root first and in display order, read with one query."""
+    root_path = comment.path[:WIDTH + 1]
+    queryset = Comment.objects.all() if queryset is None else queryset
+    return queryset.filter(under(root_path), task_id=comment.task_id).order_by('path')
@@ -0,0 +1,126 @@
+"""
+Schedule views of a project: a streamed timeline and its critical path.
+
+Each task is a bar from ``created_at`` to ``due_date`` (a point when it has
+no due date, or one already past). The timeline streams the bars overlapping
+a window in start order from ``task_project_created_idx``, as plain rows.
+
+The critical path runs over the dependency graph (``TaskDependency``): a task
+starts once all its blockers have finished. One pass in topological order
+(Kahn's algorithm) gives every task's earliest start, one pass in reverse its
+latest start, each linear in tasks plus edges; the difference is its slack
+and the zero-slack chain is the critical path. The result is cached under the
+project's ``version``, which every task and dependency change bumps, so stale
+entries are simply never read again.
+"""
+from collections import deque
+
+from django.core.cache import cache
+from django.db.models import DurationField, ExpressionWrapper, F, Q
+from django.db.models.functions import Coalesce
+
+from .models import Task, TaskDependency
+
+CHUNK_SIZE = 2000
+TIMELINE_FIELDS = ('id', 'title', 'status', 'priority', 'assignee_id', 'parent_id', 'open_blockers')
+CACHE_TIMEOUT = 24 * 60 * 60
+
+
+def timeline(project_id, start=None, end=None, chunk_size=CHUNK_SIZE):
+    """Rows of the tasks whose bars overlap ``[start, end)``, by start then id."""
+    tasks = Task.objects.filter(project_id=project_id)
+    if end is not None:
+        tasks = tasks.filter(created_at__lt=end)
+    if start is not None:
+        tasks = tasks.filter(Q(due_date__gte=start) | Q(created_at__gte=start))
+    rows = (
+        tasks.order_by('created_at', 'id')
+        .annotate(start=F('created_at'), end=Coalesce('due_date', 'created_at'))
+        .values(*TIMELINE_FIELDS, 'start', 'end')
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        if row['end'] < row['start']:
+            row['end'] = row['start']
+        yield row
+
+
+def _cache_key(project_id, version):
+    return f'critical_path:{project_id}:{version}'
+
+
+def critical_path(project_id, version):
+    """``analyze`` of the project, cached for its current ``version``."""
+    return cache.get_or_set(_cache_key(project_id, version), lambda: analyze(project_id), CACHE_TIMEOUT)
+
+
+def analyze(project_id):
+    """
+    Schedule the project as early as its dependencies allow, in seconds from
+    its start: ``length`` of the whole schedule, the ``critical_path`` task
+    ids in order and each task's ``slack``.
+    """
+    # The database subtracts; converting two datetimes per row costs more.
+    spans = Task.objects.filter(project_id=project_id).annotate(
+        span=ExpressionWrapper(F('due_date') - F('created_at'), output_field=DurationField()),
+    ).values_list('id', 'span')
+    durations = {
+        task_id: max(int(span.total_seconds()), 0) if span is not None else 0
+        for task_id, span in spans.iterator(chunk_size=CHUNK_SIZE)
+    }
+
+    blockers, dependents = {}, {}
+    for task_id, blocker_id in TaskDependency.objects.filter(task__project_id=project_id).values_list(
+        'task_id', 'blocker_id',
+    ).iterator(chunk_size=CHUNK_SIZE):
+        blockers.setdefault(task_id, []).append(blocker_id)
+        dependents.setdefault(blocker_id, []).append(task_id)
+
+    # Kahn's algorithm: a task is placed once every blocker has been, and
+    # pushes its finish to the tasks waiting on it.
+    waiting = {task_id: len(ids) for task_id, ids in blockers.items()}
+    ready = deque(task_id for task_id in durations if task_id not in waiting)
+    earliest = dict.fromkeys(durations, 0)
+    order = []
+    while ready:
+        task_id = ready.popleft()
+        order.append(task_id)
+        finish = earliest[task_id] + durations[task_id]
+        for dependent in dependents.get(task_id, ()):
+            if finish > earliest[dependent]:
+                earliest[dependent] = finish
+            waiting[dependent] -= 1
+            if not waiting[dependent]:
+                ready.append(dependent)
+
+    length = max((earliest[task_id] + durations[task_id] for task_id in order), default=0)
+    # Backwards: a blocker has to finish by the latest start of each task waiting on it.
+    latest_finish = dict.fromkeys(order, length)
+    for task_id in reversed(order):
+        start = latest_finish[task_id] - durations[task_id]
+        for blocker_id in blockers.get(task_id, ()):
+            if start < latest_finish[blocker_id]:
+                latest_finish[blocker_id] = start
+    slack = {task_id: latest_finish[task_id] - durations[task_id] - earliest[task_id] for task_id in order}
+
+    # Walk back from the last critical task to finish (the latest to start,
+    # so zero-length milestones at the end are kept).
+    path = []
+    current = min(
+        (task_id for task_id in order if not slack[task_id] and earliest[task_id] + durations[task_id] == length),
+        key=lambda task_id: (-earliest[task_id], task_id), default=None,
+    )
+    while current is not None:
+        path.append(current)
+        current = min(
+            (blocker_id for blocker_id in blockers.get(current, ())
+             if not slack[blocker_id] and earliest[blocker_id] + durations[blocker_id] == earliest[current]),
+            default=None,
+        )
+    path.reverse()
+
+    return {
+        'project': project_id,
+        'length': length,
+        'critical_path': path,
+        'slack': slack,
+    }
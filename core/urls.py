@@ -3,6 +3,8 @@ from rest_framework.routers import DefaultRouter
 from .views import RegisterView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from .views import ProjectViewSet, TaskViewSet, LoginView, CommentViewSet, UserViewSet, MembershipViewSet, VerifyOTPView
+from .views import AuditLogViewSet, MentionViewSet, SearchView
+from . import async_views
 
 
 router = DefaultRouter()
@@ -11,6 +13,8 @@ router.register(r'tasks', TaskViewSet, basename='tasks')
 router.register(r'comments', CommentViewSet, basename='comments')
 router.register(r'users', UserViewSet, basename='users')
 router.register(r'memberships', MembershipViewSet, basename='memberships')
+router.register(r'audit', AuditLogViewSet, basename='audit')
+router.register(r'mentions', MentionViewSet, basename='mentions')
 
 
 urlpatterns = [
@@ -18,5 +22,10 @@ urlpatterns = [
 
     path('auth/login/', LoginView.as_view(), name='two_factor_login'),  
     path('auth/verify-otp/', VerifyOTPView.as_view(), name='verify_otp'),       
+    # Same contracts as the two above, as native async views for ASGI workers.
+    path('auth/async/login/', async_views.login, name='async_login'),
+    path('auth/async/verify-otp/', async_views.verify_otp, name='async_verify_otp'),
     path('auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('projects/<int:project_id>/events/', async_views.project_events, name='project_events'),
 ] + router.urls
\ No newline at end of file
@@ -1,22 +1,16 @@
-import random
-from django.core.mail import send_mail
-from django.utils.timezone import now
-from datetime import timedelta
-from .models import OTP
+from django.db import transaction
+from .otp_store import get_otp_store, OTP_TTL
+from .outbox import enqueue_email
 
 def generate_otp(user):
-    code = str(random.randint(100000, 999999))
-    otp = OTP.objects.create(
-        user=user,
-        code=code,
-        expires_at=now() + timedelta(minutes=5)
-    )
-
-    send_mail(
-        "Your Login OTP",
-        f"Your OTP is {code}. It expires in 5 minutes.",
-        "noreply@example.com",
-        [user.email],
-        fail_silently=False,
-    )
-    return otp
\ No newline at end of file
+    # The email is queued in the same transaction as the code and sent by
+    # `manage.py deliver_outbox`, so login never waits on the mail server.
+    with transaction.atomic():
+        code = get_otp_store().issue(user)
+        enqueue_email(
+            "Your Login OTP",
+            f"Your OTP is {code}. It expires in {OTP_TTL // 60} minutes.",
+            user.email,
+            from_email="noreply@example.com",
+        )
+    return code
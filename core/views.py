@@ -1,16 +1,33 @@
+from functools import partial
+
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework import viewsets, generics, status
-from .models import User, Project, Task, Comment, membership
+from rest_framework.decorators import action
+from .models import User, Project, Task, Comment, Mention, membership, AuditLog
 from .serializers import UserSerializer, RegisterSerializer, ProjectSerializer, TaskSerializer, CommentSerializer, MembershipSerializer
+from .serializers import user_only_fields, user_deferred_fields, AuditLogSerializer, MentionSerializer
+from .membership import is_project_member
+from .pagination import KeysetPagination
+from . import board as board_ops
+from . import bulk as bulk_ops
+from . import exports
+from .etags import ProjectETagMixin
+from . import rollups
+from . import audit, etags, hierarchy, search, tagindex, threads, timeline
+from .search import FullTextSearchFilter
 from .permissions import IsProjectOwnerOrAdmin, IsTaskAssignerOrReadOnly, IsAdminOrProjectOwnerForMembership, IsProjectMemberForTaskComments
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, DateFromToRangeFilter
+from django_filters.rest_framework import CharFilter, DjangoFilterBackend, FilterSet, DateFromToRangeFilter, IsoDateTimeFilter
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import LoginSerializer, VerifyOTPSerializer
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
@@ -26,6 +43,20 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = []  
 
 
+class ExportMixin:
+    """Adds ``GET <list>/export/?format=csv|ndjson`` streaming every row that passes the list filters."""
+    export_rows = None
+    export_columns = None
+
+    @action(detail=False, methods=['get'], renderer_classes=[exports.CSVRenderer, exports.NDJSONRenderer])
+    def export(self, request):
+        queryset = self.filter_queryset(self.queryset.all())
+        return exports.streaming_export(
+            self.export_rows(queryset), self.export_columns,
+            request.accepted_renderer, self.basename,
+        )
+
+
 class UserViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -35,13 +66,38 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ProjectETagMixin, ExportMixin, viewsets.ModelViewSet):
     queryset = Project.objects.all()
+    export_rows = staticmethod(exports.export_projects)
+    export_columns = exports.PROJECT_COLUMNS
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated, IsProjectOwnerOrAdmin] 
     filterset_fields = ['status']
-    search_fields = ['name', 'description']
+    search_kind = 'project'
     ordering_fields = ['created_at', 'name']
+    # retrieve reads the version counter first; a 304 stops there.
+    # critical_path is counted on a cold cache.
+    query_budget = {'list': 2, 'retrieve': 4, 'stats': 3, 'board': 3, 'timeline': 2, 'critical_path': 5, 'tags': 3}
+
+    def get_queryset(self):
+        if self.action in ('stats', 'board', 'timeline', 'critical_path', 'tags'):
+            return Project.objects.only('id', 'owner_id', 'version')
+        # Owner is joined and members are prefetched in one extra query, both
+        # restricted to the columns UserSerializer renders.
+        return (
+            Project.objects
+            .select_related('owner')
+            .defer(*user_deferred_fields('owner__'))
+            .prefetch_related(
+                Prefetch('members', queryset=User.objects.only(*user_only_fields()))
+            )
+        )
+
+    def check_project_etag(self, project):
+        self.check_object_permissions(self.request, project)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, kwargs['pk'], partial(super().retrieve, request, *args, **kwargs))
 
     def perform_create(self, serializer):
         if not self.request.user.is_staff:
@@ -59,21 +115,157 @@ class ProjectViewSet(viewsets.ModelViewSet):
             raise PermissionDenied("Only admins can delete projects.")
         instance.delete()            
 
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Task counts by status, priority and assignee, read from the rollup table."""
+        return Response(rollups.project_stats(self.get_object().pk))
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('cards', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f'Cards per column (default {board_ops.DEFAULT_CARDS}, at most {board_ops.MAX_CARDS})'),
+        openapi.Parameter('column', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='Only this status column, from `cursor` on'),
+        openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="A column's `next` value"),
+    ])
+    @action(detail=True, methods=['get'])
+    def board(self, request, pk=None):
+        """Cards by status: each column's total and first cards, or the next cards of one column."""
+        return self.conditional(request, pk, partial(self._board, request))
+
+    def _board(self, request):
+        project = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('cards', board_ops.DEFAULT_CARDS)), 1), board_ops.MAX_CARDS)
+        except ValueError:
+            limit = board_ops.DEFAULT_CARDS
+        # Not ``status``: that filters projects by their own status.
+        column = request.query_params.get('column')
+        if column is None:
+            return Response(board_ops.board(project.pk, limit))
+        try:
+            return Response(board_ops.column(project.pk, column, request.query_params.get('cursor'), limit))
+        except board_ops.BoardError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                          description='Only bars ending at or after this time'),
+        openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                          description='Only bars starting before this time'),
+    ])
+    @action(detail=True, methods=['get'], renderer_classes=[exports.NDJSONRenderer])
+    def timeline(self, request, pk=None):
+        """Streams the task bars (``created_at`` to ``due_date``) overlapping the window, as NDJSON in start order."""
+        project = self.get_object()
+        window = {}
+        for name in ('start', 'end'):
+            value = request.query_params.get(name)
+            if value is None:
+                continue
+            try:
+                window[name] = parse_datetime(value)
+            except ValueError:
+                window[name] = None
+            if window[name] is None:
+                return Response({name: ["Enter a valid date/time."]}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(window[name]):
+                window[name] = timezone.make_aware(window[name])
+        return StreamingHttpResponse(
+            exports.ndjson_lines(timeline.timeline(project.pk, **window)), content_type=exports.NDJSONRenderer.media_type,
+        )
+
+    @action(detail=True, methods=['get'], url_path='critical-path')
+    def critical_path(self, request, pk=None):
+        """Earliest schedule over the task dependencies: its length, critical path and each task's slack, in seconds."""
+        return self.conditional(request, pk, partial(self._critical_path, request))
+
+    def _critical_path(self, request):
+        project = self.get_object()
+        return Response(timeline.critical_path(project.pk, project.version))
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description=f'Most used tags to return (default {tagindex.DEFAULT_TAGS}, at most {tagindex.MAX_TAGS})'),
+    ])
+    @action(detail=True, methods=['get'])
+    def tags(self, request, pk=None):
+        """The project's tags with how many of its tasks carry each, most used first."""
+        return self.conditional(request, pk, partial(self._tags, request))
+
+    def _tags(self, request):
+        project = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get('limit', tagindex.DEFAULT_TAGS)), 1), tagindex.MAX_TAGS)
+        except ValueError:
+            limit = tagindex.DEFAULT_TAGS
+        return Response(tagindex.tag_counts(project.pk, limit))
+
 class TaskFilter(FilterSet):
     due_date = DateFromToRangeFilter()
+    # Comma-separated tag names, looked up in the tag index (core.tagindex).
+    tags = CharFilter(field_name='tags__name', method='filter_any_tags', label='Any of these tags')
+    tags_all = CharFilter(field_name='tags__name', method='filter_all_tags', label='All of these tags')
 
     class Meta:
         model = Task
-        fields = ['status', 'priority', 'assignee']
+        fields = ['project', 'status', 'priority', 'assignee']
+
+    def filter_any_tags(self, queryset, name, value):
+        return self._filter_tags(queryset, tagindex.tasks_with_any, value)
+
+    def filter_all_tags(self, queryset, name, value):
+        return self._filter_tags(queryset, tagindex.tasks_with_all, value)
 
+    def _filter_tags(self, queryset, match, value):
+        names = tagindex.parse_names(value)
+        if not names:
+            return queryset
+        # Within one project the index is read by (project, tag).
+        project = getattr(self.form, 'cleaned_data', {}).get('project')
+        return queryset.filter(pk__in=match(names, project.pk if project is not None else None))
 
-class TaskViewSet(viewsets.ModelViewSet):
+
+class TaskViewSet(ProjectETagMixin, ExportMixin, viewsets.ModelViewSet):
             queryset = Task.objects.all()
+            export_rows = staticmethod(exports.export_tasks)
+            export_columns = exports.TASK_COLUMNS
             serializer_class = TaskSerializer
-            filter_backends = [DjangoFilterBackend]
+            filter_backends = [DjangoFilterBackend, FullTextSearchFilter]
             filterset_class = TaskFilter
-            search_fields = ['title', 'description']
+            pagination_class = KeysetPagination
+            search_kind = 'task'
+            ordering = ['created_at']
             ordering_fields = ['created_at', 'due_date', 'priority']
+            # list with ?project= reads the version counter first.
+            query_budget = {'list': 3, 'retrieve': 2, 'workload': 2, 'subtree': 2, 'dependencies': 3}
+            # Checked by `manage.py explain_filters` alongside each single filter.
+            filter_combinations = [
+                ('project', 'status'),
+                ('project', 'priority'),
+                ('project', 'due_date'),
+                ('assignee', 'status'),
+                ('project', 'tags'),
+            ]
+
+            def get_queryset(self):
+                if self.action in ('subtree', 'dependencies', 'remove_dependency'):
+                    return Task.objects.all()
+                # Assignees are joined; tags for every task on the page come
+                # from one batched query keyed by object id.
+                return (
+                    Task.objects
+                    .select_related('assignee')
+                    .defer(*user_deferred_fields('assignee__'))
+                    .prefetch_related('tags')
+                )
+
+            def list(self, request, *args, **kwargs):
+                handler = partial(super().list, request, *args, **kwargs)
+                project_id = request.query_params.get('project')
+                if project_id is None:
+                    return handler()
+                return self.conditional(request, project_id, handler)
 
             def perform_create(self, serializer):
                 project = serializer.validated_data.get('project')
@@ -97,15 +289,180 @@ class TaskViewSet(viewsets.ModelViewSet):
                     raise PermissionDenied("Only admins or the project owner can delete tasks.")
                 instance.delete()
 
-class CommentViewSet(viewsets.ModelViewSet):
+            @swagger_auto_schema(manual_parameters=[
+                openapi.Parameter('user', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                                  description='Another assignee (admins only); defaults to you'),
+            ])
+            @action(detail=False, methods=['get'])
+            def workload(self, request):
+                user_id = request.user.pk
+                if request.query_params.get('user'):
+                    if not request.user.is_staff:
+                        raise PermissionDenied("Only admins can view another user's workload.")
+                    try:
+                        user_id = int(request.query_params['user'])
+                    except ValueError:
+                        return Response({'detail': "user must be an id."}, status=status.HTTP_400_BAD_REQUEST)
+                return Response(rollups.workload(user_id))
+
+            @action(detail=True, methods=['get'])
+            def subtree(self, request, pk=None):
+                """The task with all its subtasks nested under ``subtasks``."""
+                return Response(hierarchy.tree(self.get_object()))
+
+            def _check_can_change(self, task):
+                if not (self.request.user.is_staff or Project.objects.filter(pk=task.project_id, owner=self.request.user).exists()):
+                    raise PermissionDenied("Only admins or the project owner can change dependencies.")
+
+            @swagger_auto_schema(
+                method='post',
+                request_body=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={'blocker': openapi.Schema(type=openapi.TYPE_INTEGER, description='Task that must be done first')},
+                    required=['blocker'],
+                ),
+            )
+            @action(detail=True, methods=['get', 'post'])
+            def dependencies(self, request, pk=None):
+                """What the task transitively waits on (``blocked_by``) and what waits on it (``blocking``)."""
+                task = self.get_object()
+                if request.method == 'GET':
+                    return Response(hierarchy.dependencies(task))
+
+                self._check_can_change(task)
+                blocker_id, = self._body_fields('blocker')
+                blocker = None
+                if not isinstance(blocker_id, bool):
+                    try:
+                        blocker = Task.objects.filter(pk=int(blocker_id)).first()
+                    except (TypeError, ValueError):
+                        pass
+                if blocker is None:
+                    return Response({'blocker': ["Task not found."]}, status=status.HTTP_400_BAD_REQUEST)
+                try:
+                    created = hierarchy.add_dependency(task, blocker)
+                except hierarchy.HierarchyError as exc:
+                    return Response({'blocker': [str(exc)]}, status=status.HTTP_400_BAD_REQUEST)
+                if created:
+                    etags.bump_projects([task.project_id])
+                return Response(hierarchy.dependencies(task), status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+            @dependencies.mapping.delete
+            def remove_dependency(self, request, pk=None):
+                """``DELETE ?blocker=<id>`` stops the task waiting on that blocker."""
+                task = self.get_object()
+                self._check_can_change(task)
+                blocker_id = request.query_params.get('blocker', '')
+                if not blocker_id.isdigit() or not hierarchy.remove_dependency(task.pk, int(blocker_id), task.project_id):
+                    return Response({'blocker': ["No such dependency."]}, status=status.HTTP_404_NOT_FOUND)
+                etags.bump_projects([task.project_id])
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+            def _bulk_response(self, operation, *args, success_status=status.HTTP_200_OK):
+                try:
+                    results, errors = operation(self.request.user, *args)
+                except bulk_ops.BulkError as exc:
+                    return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+                if errors and not results:
+                    return Response({'results': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+                return Response({'results': results, 'errors': errors}, status=success_status)
+
+            def _body_fields(self, *names):
+                # Anything but a JSON object (a list, say) has none of the
+                # fields, and the caller rejects the missing values.
+                data = self.request.data if isinstance(self.request.data, dict) else {}
+                return [data.get(name) for name in names]
+
+            @swagger_auto_schema(
+                method='post',
+                request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                responses={201: "Created task ids and per-item errors"},
+            )
+            @swagger_auto_schema(
+                method='patch',
+                request_body=openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                responses={200: "Updated task ids and per-item errors"},
+            )
+            @action(detail=False, methods=['post', 'patch'], url_path='bulk')
+            def bulk(self, request):
+                if request.method == 'POST':
+                    return self._bulk_response(bulk_ops.bulk_create, request.data, success_status=status.HTTP_201_CREATED)
+                return self._bulk_response(bulk_ops.bulk_update, request.data)
+
+            @swagger_auto_schema(
+                method='post',
+                request_body=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                        'status': openapi.Schema(type=openapi.TYPE_STRING, enum=[c[0] for c in Task.STATUS_CHOICES]),
+                    },
+                    required=['ids', 'status'],
+                ),
+            )
+            @action(detail=False, methods=['post'], url_path='bulk-status')
+            def bulk_status(self, request):
+                return self._bulk_response(bulk_ops.bulk_set_status, *self._body_fields('ids', 'status'))
+
+            @swagger_auto_schema(
+                method='post',
+                request_body=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+                        'assignee': openapi.Schema(type=openapi.TYPE_INTEGER, description='User id, or null to unassign'),
+                    },
+                    required=['ids', 'assignee'],
+                ),
+            )
+            @action(detail=False, methods=['post'], url_path='bulk-assign')
+            def bulk_assign(self, request):
+                return self._bulk_response(bulk_ops.bulk_assign, *self._body_fields('ids', 'assignee'))
+
+class CommentViewSet(ProjectETagMixin, ExportMixin, viewsets.ModelViewSet):
       queryset = Comment.objects.all()
+      export_rows = staticmethod(exports.export_comments)
+      export_columns = exports.COMMENT_COLUMNS
       serializer_class = CommentSerializer
       permission_classes = [IsAuthenticated, IsProjectMemberForTaskComments]
+      pagination_class = KeysetPagination
+      filterset_fields = ['task']
+      search_kind = 'comment'
+      ordering = ['created_at']
+      # ?ordering=path lists a task's threads in display order.
+      ordering_fields = ['created_at', 'path']
+      # The ?task= filter validates its value with one lookup; thread reads
+      # the comment, the version counter, then the whole thread.
+      query_budget = {'list': 2, 'thread': 3}
+
+      def get_queryset(self):
+           if self.action == 'thread':
+               return Comment.objects.select_related('task').only('id', 'task_id', 'path', 'task__project_id')
+           return (
+               Comment.objects
+               .select_related('author')
+               .defer(*user_deferred_fields('author__'))
+           )
+
+      def check_project_etag(self, project):
+           if not is_project_member(self.request.user, project):
+               raise PermissionDenied()
+
+      @action(detail=True, methods=['get'])
+      def thread(self, request, pk=None):
+           """The comment's whole thread, root first, replies under their parents."""
+           comment = self.get_object()
+           return self.conditional(request, comment.task.project_id, partial(self._thread, comment))
+
+      def _thread(self, comment):
+           comments = threads.thread(
+               comment, Comment.objects.select_related('author').defer(*user_deferred_fields('author__')),
+           )
+           return Response(CommentSerializer(comments, many=True).data)
 
       def perform_create(self, serializer):
            task = serializer.validated_data['task']
-           project = task.project
-           if not (self.request.user == project.owner or self.request.user in project.members.all()):
+           if not is_project_member(self.request.user, task.project_id):
                raise PermissionDenied("You must be a member of the project to comment.")
            serializer.save(author=self.request.user)
 
@@ -113,6 +470,17 @@ class MembershipViewSet(viewsets.ModelViewSet):
     queryset = membership.objects.all()
     serializer_class = MembershipSerializer
     permission_classes = [IsAuthenticated, IsAdminOrProjectOwnerForMembership]
+    pagination_class = KeysetPagination
+    filterset_fields = ['project', 'user']
+    ordering = ['joined_at']
+    query_budget = {'list': 1}
+
+    def get_queryset(self):
+        return (
+            membership.objects
+            .select_related('user')
+            .defer(*user_deferred_fields('user__'))
+        )
 
     def perform_create(self, serializer):
         if not self.request.user.is_staff:
@@ -120,6 +488,114 @@ class MembershipViewSet(viewsets.ModelViewSet):
         serializer.save() 
 
 
+class AuditLogFilter(FilterSet):
+    since = IsoDateTimeFilter(field_name='created_at', lookup_expr='gte', method='filter_since')
+    until = IsoDateTimeFilter(field_name='created_at', lookup_expr='lt', method='filter_until')
+
+    class Meta:
+        model = AuditLog
+        fields = ['project', 'actor']
+
+    # Each bound also bounds the period, so only the partitions in range are read.
+    def filter_since(self, queryset, name, value):
+        return queryset.filter(period__gte=audit.period_of(value), created_at__gte=value)
+
+    def filter_until(self, queryset, name, value):
+        return queryset.filter(period__lte=audit.period_of(value), created_at__lt=value)
+
+
+class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Audit trail, newest first: every entry for admins, entries of their own projects for owners."""
+    queryset = AuditLog.objects.all()
+    serializer_class = AuditLogSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = AuditLogFilter
+    ordering = ['-created_at']
+    query_budget = {'list': 1}
+
+    def filter_queryset(self, queryset):
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(project__in=Project.objects.filter(owner=self.request.user).values('pk'))
+        return super().filter_queryset(queryset)
+
+
+class MentionViewSet(viewsets.ReadOnlyModelViewSet):
+    """The user's mentions inbox, newest first; ``?unread=true`` keeps the unread ones."""
+    queryset = Mention.objects.all()
+    serializer_class = MentionSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = []
+    ordering = ['-created_at']
+    query_budget = {'list': 1}
+
+    def get_queryset(self):
+        return Mention.objects.select_related('comment__author').only(
+            'id', 'comment_id', 'task_id', 'created_at', 'read_at', 'comment__content', 'comment__author__username',
+        )
+
+    def filter_queryset(self, queryset):
+        queryset = queryset.filter(user=self.request.user)
+        if self.request.query_params.get('unread', '').lower() in ('1', 'true'):
+            queryset = queryset.filter(read_at__isnull=True)
+        return queryset
+
+    @swagger_auto_schema(
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                                              description='Mentions to mark; all unread ones when left out')},
+        ),
+    )
+    @action(detail=False, methods=['post'])
+    def read(self, request):
+        """Mark mentions read."""
+        if not isinstance(request.data, dict):
+            return Response({'detail': "Expected a JSON object."}, status=status.HTTP_400_BAD_REQUEST)
+        mentions = Mention.objects.filter(user=request.user, read_at__isnull=True)
+        ids = request.data.get('ids')
+        if ids is not None:
+            # JSON true and false arrive as bools, which isinstance counts as ints.
+            if not isinstance(ids, list) or not all(type(i) is int for i in ids):
+                return Response({'ids': ["Expected a list of ids."]}, status=status.HTTP_400_BAD_REQUEST)
+            mentions = mentions.filter(pk__in=ids)
+        return Response({'updated': mentions.update(read_at=timezone.now())})
+
+
+class SearchView(APIView):
+    """Ranked full-text search across tasks, projects and comments the user can see."""
+    permission_classes = [IsAuthenticated]
+    titles = {
+        'task': (Task, 'title'),
+        'project': (Project, 'name'),
+        'comment': (Comment, 'content'),
+    }
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                          description='Words to search for; each is prefix-matched'),
+        openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='Comma-separated subset of task,project,comment'),
+    ])
+    def get(self, request):
+        kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind in self.titles]
+        hits = search.search(request.user, request.query_params.get('q', ''), kinds or None)
+
+        titles = {}
+        for kind, (model, field) in self.titles.items():
+            ids = [object_id for hit_kind, object_id, _ in hits if hit_kind == kind]
+            if ids:
+                titles[kind] = dict(model.objects.filter(pk__in=ids).values_list('pk', field))
+        results = [
+            {'type': kind, 'id': object_id, 'project': project_id, 'title': titles[kind][object_id][:200]}
+            for kind, object_id, project_id in hits
+            if object_id in titles.get(kind, {})
+        ]
+        return Response({'results': results})
+
+
 class LoginView(APIView):
     permission_classes = [AllowAny]
 